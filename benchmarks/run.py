@@ -0,0 +1,436 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+
+import utils.monitor as monitor
+from utils.cache import market_data_cache
+from utils.constants import SUBGRAPH_URLS
+from utils.explorer import EXPLORER_URLS
+from utils.monitor import (calculate_wallet_exposure, get_glp_price_history, get_historical_mint_prices,
+                           get_historical_mint_prices_via_api, get_wallet_transfer_histories_via_api, run_monitor_tick,
+                           sync_mint_index)
+from utils.abi import SLIM_GLP_ABI_PATH, load_glp_abi
+from utils.log_index import MintLogIndex
+from utils.report import run_report
+from utils.web3_utils import load_contract, setup_web3
+
+from .stand_in import CHAIN_IDS, SERVICES, StandInProcess, balance_of, wallet
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GLP_ABI_PATH = os.path.join(REPO_ROOT, SLIM_GLP_ABI_PATH)
+STREAMLIT_APP_PATH = os.path.join(REPO_ROOT, 'streamlit_app.py')
+
+GLP_ADDRESSES = {
+    'arbitrum': '0x1aDDD80E6039594eE970E5872D247bf0414C8903',
+    'avalanche': '0x9e295B5B976a184B14aD8cd72413aD846C299660',
+}
+
+DEFAULT_WALLET_COUNTS = [10, 100, 1000]
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.2  # relative slowdown or growth reported as a regression
+STREAMLIT_TIMEOUT = 120
+COST_BASIS_TRANSFERS = 100  # synthetic transfers per wallet
+
+SCENARIOS = {}
+
+logger = logging.getLogger(__name__)
+
+
+def scenario(scales=True):
+    """
+    Register a benchmark scenario.
+
+    The decorated function is called with the stand-in and the watched
+    addresses and does its setup; it returns the callable that is measured.
+    Scenarios that do not scale with the watchlist run once per sweep.
+    """
+    def register(setup):
+        SCENARIOS[setup.__name__] = (setup, scales)
+        return setup
+    return register
+
+
+def _glp_contracts(stand_in):
+    glp_abi = load_glp_abi(GLP_ABI_PATH)
+    return {network: load_contract(setup_web3(stand_in.url('rpc', network)), GLP_ADDRESSES[network], glp_abi)
+            for network in CHAIN_IDS}
+
+
+@scenario()
+def monitor_tick(stand_in, user_addresses):
+    contracts = _glp_contracts(stand_in)
+    # A warm Mint log index, as a long-running monitor has after its first tick
+    index = MintLogIndex(':memory:')
+    for contract in contracts.values():
+        sync_mint_index(contract.w3, contract, index)
+    return lambda: run_monitor_tick(contracts, user_addresses, index=index)
+
+
+@scenario()
+def wallet_exposure(stand_in, user_addresses):
+    def run():
+        for user_address in user_addresses:
+            for network in CHAIN_IDS:
+                calculate_wallet_exposure(balance_of(user_address) / 10 ** 18, network)
+    return run
+
+
+@scenario()
+def wallet_transfer_histories(stand_in, user_addresses):
+    return lambda: get_wallet_transfer_histories_via_api(GLP_ADDRESSES['arbitrum'], '', user_addresses, 'arbitrum')
+
+
+@scenario()
+def bulk_report(stand_in, user_addresses):
+    contracts = _glp_contracts(stand_in)
+    directory = tempfile.mkdtemp(prefix='glp-bench-report-')
+    addresses_path = os.path.join(directory, 'wallets.txt')
+    with open(addresses_path, 'w') as address_file:
+        address_file.write('\n'.join(user_addresses) + '\n')
+
+    def run():
+        try:
+            return run_report(contracts, addresses_path, os.path.join(directory, 'report.ndjson'), api_key='')
+        finally:
+            os.remove(os.path.join(directory, 'report.ndjson'))
+    return run
+
+
+def _synthetic_transfers(user_addresses, unit=10 ** 19):
+    # The default unit gives amounts of 10-70 GLP, past int64 in wei as real positions are
+    rows = []
+    for number, user_address in enumerate(user_addresses):
+        for step in range(COST_BASIS_TRANSFERS):
+            amount = (step % 7 + 1) * unit + number if step % 4 else -(step % 5 + 1) * unit
+            rows.append({'wallet': user_address, 'timeStamp': step, 'amount': amount, 'price': 1.0 + step / 100})
+    return rows
+
+
+@scenario()
+def cost_basis(stand_in, user_addresses):
+    import pandas as pd
+    from utils.cost_basis import compute_cost_basis
+
+    transfers = pd.DataFrame(_synthetic_transfers(user_addresses))
+    return lambda: compute_cost_basis(transfers, current_prices=1.0)
+
+
+@scenario()
+def cost_basis_int64(stand_in, user_addresses):
+    import pandas as pd
+    from utils.cost_basis import compute_cost_basis
+
+    # Small enough that the amounts of every wallet together fit int64
+    transfers = pd.DataFrame(_synthetic_transfers(user_addresses, unit=10 ** 9))
+    return lambda: compute_cost_basis(transfers, current_prices=1.0)
+
+
+@scenario()
+def cost_basis_python_fifo(stand_in, user_addresses):
+    """The per-transfer FIFO loop that :func:`compute_cost_basis` replaces, as its baseline."""
+    rows = _synthetic_transfers(user_addresses)
+
+    def run():
+        lots, realized = {}, {}
+        for row in rows:
+            wallet_lots = lots.setdefault(row['wallet'], deque())
+            if row['amount'] > 0:
+                wallet_lots.append([row['amount'], row['price']])
+                continue
+            remaining = -row['amount']
+            pnl = remaining / 10 ** 18 * row['price']
+            while remaining and wallet_lots:
+                used = min(remaining, wallet_lots[0][0])
+                pnl -= used / 10 ** 18 * wallet_lots[0][1]
+                wallet_lots[0][0] -= used
+                remaining -= used
+                if not wallet_lots[0][0]:
+                    wallet_lots.popleft()
+            realized[row['wallet']] = realized.get(row['wallet'], 0.0) + pnl
+        return lots, realized
+    return run
+
+
+@scenario(scales=False)
+def historical_mint_prices_rpc(stand_in, user_addresses):
+    contract = _glp_contracts(stand_in)['arbitrum']
+    return lambda: get_historical_mint_prices(contract.w3, contract)
+
+
+@scenario(scales=False)
+def historical_mint_prices_api(stand_in, user_addresses):
+    return lambda: get_historical_mint_prices_via_api(GLP_ADDRESSES['arbitrum'], '', 'arbitrum')
+
+
+@scenario(scales=False)
+def glp_price_history(stand_in, user_addresses):
+    return lambda: get_glp_price_history('arbitrum')
+
+
+@scenario(scales=False)
+def streamlit_render(stand_in, user_addresses):
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    # The app reads config.yaml and the ABI from its working directory
+    workdir = tempfile.mkdtemp(prefix='glp-bench-')
+    os.makedirs(os.path.join(workdir, 'contracts'))
+    shutil.copy(GLP_ABI_PATH, os.path.join(workdir, 'contracts'))
+    with open(os.path.join(workdir, 'config.yaml'), 'w') as config_file:
+        json.dump({
+            'arb_provider_url': stand_in.url('rpc', 'arbitrum'),
+            'avax_provider_url': stand_in.url('rpc', 'avalanche'),
+            'arb_glp_contract_address': GLP_ADDRESSES['arbitrum'],
+            'avax_glp_contract_address': GLP_ADDRESSES['avalanche'],
+            'api_key': '',
+            'user_addresses': [],
+        }, config_file)
+
+    def run():
+        # A cold render: nothing cached from earlier runs
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            app = AppTest.from_file(STREAMLIT_APP_PATH, default_timeout=STREAMLIT_TIMEOUT).run()
+            app.text_input[0].input(user_addresses[0]).run()
+            if app.exception:
+                raise RuntimeError(f"Streamlit render failed: {app.exception[0].message}")
+        finally:
+            os.chdir(cwd)
+    return run
+
+
+def configure_endpoints(stand_in):
+    """
+    Point the explorer, subgraph and CoinGecko clients at the stand-in.
+
+    Args:
+        stand_in (StandInServer or StandInProcess): The running stand-in.
+    """
+    for network in CHAIN_IDS:
+        SUBGRAPH_URLS[network] = stand_in.url('subgraph', network)
+        EXPLORER_URLS[network] = stand_in.url('explorer', network)
+    monitor.COINGECKO_API_URL = stand_in.url('coingecko') + '/api/v3/simple/price'
+
+
+class _ErrorCounter(logging.Handler):
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+def measure(stand_in, run, repeat=DEFAULT_REPEAT):
+    """
+    Time a callable, count the upstream requests it sends and trace its peak memory.
+
+    Every run starts with an empty market-data cache. The timed runs are not
+    traced; one extra run under ``tracemalloc`` reports the peak memory.
+
+    Args:
+        stand_in (StandInServer or StandInProcess): The stand-in the callable talks to.
+        run (callable): The measured work.
+        repeat (int): The number of timed runs.
+
+    Returns:
+        dict: 'wall_time' (min, median and max seconds), 'calls' (per service and
+        JSON-RPC method, of the last timed run), 'upstream_calls', 'errors'
+        (records logged at ERROR or above per run) and 'peak_memory_bytes'.
+    """
+    errors = _ErrorCounter()
+    logging.getLogger().addHandler(errors)
+    try:
+        times = []
+        for _ in range(repeat):
+            market_data_cache.clear()
+            stand_in.reset_counts()
+            errors.count = 0
+            started = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - started)
+        calls = stand_in.counts()
+        error_count = errors.count
+
+        market_data_cache.clear()
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    finally:
+        logging.getLogger().removeHandler(errors)
+
+    return {
+        'wall_time': {'min': min(times), 'median': statistics.median(times), 'max': max(times)},
+        'calls': calls,
+        'upstream_calls': sum(calls.get(service, 0) for service in SERVICES),
+        'errors': error_count,
+        'peak_memory_bytes': peak,
+    }
+
+
+def run_benchmarks(stand_in, scenarios=None, wallet_counts=None, repeat=DEFAULT_REPEAT):
+    """
+    Run scenarios against the stand-in, sweeping the scaling ones over wallet counts.
+
+    Args:
+        stand_in (StandInServer or StandInProcess): The running stand-in.
+        scenarios (list, optional): Scenario names. Defaults to all of ``SCENARIOS``.
+        wallet_counts (list, optional): The watchlist sizes to sweep. Defaults to ``DEFAULT_WALLET_COUNTS``.
+        repeat (int): The number of timed runs per measurement.
+
+    Returns:
+        list: One result per scenario and wallet count, as returned by :func:`measure`
+        plus 'scenario' and 'wallets' (None for scenarios that do not scale).
+    """
+    configure_endpoints(stand_in)
+    wallet_counts = wallet_counts or DEFAULT_WALLET_COUNTS
+    results = []
+
+    for name in scenarios or list(SCENARIOS):
+        setup, scales = SCENARIOS[name]
+        for count in (wallet_counts if scales else [None]):
+            user_addresses = [wallet(number) for number in range(count or 1)]
+            result = {'scenario': name, 'wallets': count}
+            result.update(measure(stand_in, setup(stand_in, user_addresses), repeat))
+            logger.info(f"{name} ({count or '-'} wallets): {result['wall_time']['median']:.3f}s, "
+                         f"{result['upstream_calls']} calls, {result['peak_memory_bytes'] / 2 ** 20:.1f} MiB")
+            results.append(result)
+
+    return results
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Find the results that regressed against a baseline run.
+
+    Args:
+        results (list): The results of :func:`run_benchmarks`.
+        baseline (list): Earlier results to compare with.
+        threshold (float): The relative growth in median wall time or peak memory
+            tolerated before a result counts as a regression. Any growth in
+            upstream calls counts.
+
+    Returns:
+        list: Human-readable descriptions of the regressions.
+    """
+    previous = {(result['scenario'], result['wallets']): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result['scenario'], result['wallets']))
+        if before is None:
+            continue
+        label = f"{result['scenario']} ({result['wallets'] or '-'} wallets)"
+        if result['wall_time']['median'] > before['wall_time']['median'] * (1 + threshold):
+            regressions.append(f"{label}: median wall time {before['wall_time']['median']:.3f}s -> "
+                               f"{result['wall_time']['median']:.3f}s")
+        if result['upstream_calls'] > before['upstream_calls']:
+            regressions.append(f"{label}: upstream calls {before['upstream_calls']} -> {result['upstream_calls']}")
+        if result['peak_memory_bytes'] > before['peak_memory_bytes'] * (1 + threshold):
+            regressions.append(f"{label}: peak memory {before['peak_memory_bytes']} -> {result['peak_memory_bytes']} bytes")
+    return regressions
+
+
+def _per_service(value, option):
+    """Parse ``0.05`` or ``rpc=0.05,explorer=0.2`` into per-service floats."""
+    if not value:
+        return {}
+    if '=' not in value:
+        return dict.fromkeys(SERVICES, float(value))
+    settings = {}
+    for item in value.split(','):
+        service, _, number = item.partition('=')
+        if service not in SERVICES:
+            raise argparse.ArgumentTypeError(f"{option}: unknown service {service!r}")
+        settings[service] = float(number)
+    return settings
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the GLP monitor against a local stand-in of its upstreams.")
+    parser.add_argument('--wallets', default=','.join(map(str, DEFAULT_WALLET_COUNTS)),
+                        help="comma-separated watchlist sizes to sweep (default: %(default)s)")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help="comma-separated scenarios to run (default: all)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="timed runs per measurement")
+    parser.add_argument('--latency', default='', help="seconds added per request: one value or service=value pairs")
+    parser.add_argument('--rate-limit', default='', help="requests per second: one value or service=value pairs")
+    parser.add_argument('--output', help="write the JSON results here instead of stdout")
+    parser.add_argument('--compare', help="a previous output file to check for regressions")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown or memory growth counted as a regression")
+    parser.add_argument('--verbose', action='store_true', help="show the monitor's own log output")
+    args = parser.parse_args(argv)
+
+    args.wallets = [int(count) for count in args.wallets.split(',') if count]
+    args.scenarios = [name for name in args.scenarios.split(',') if name]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    try:
+        args.latency = _per_service(args.latency, '--latency')
+        args.rate_limit = _per_service(args.rate_limit, '--rate-limit')
+    except (argparse.ArgumentTypeError, ValueError) as e:
+        parser.error(str(e))
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    if not args.verbose:
+        # Errors still reach the per-result counter, but are not printed
+        for handler in logging.getLogger().handlers:
+            handler.setLevel(logging.CRITICAL)
+    # Progress goes to stderr whatever the monitor's log level is
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(logging.StreamHandler(sys.stderr))
+
+    with StandInProcess(latency=args.latency, rate_limits=args.rate_limit) as stand_in:
+        results = run_benchmarks(stand_in, args.scenarios, args.wallets, args.repeat)
+
+    report = {
+        'meta': {
+            'created': int(time.time()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'latency': args.latency,
+            'rate_limits': args.rate_limit,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+    if args.compare:
+        with open(args.compare, 'r') as baseline_file:
+            regressions = compare_results(results, json.load(baseline_file)['results'], args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,10 @@
+import asyncio
 import logging
-import json
 from utils.config_loader import load_config
+from utils.cache import configure_cache
+from utils.http_client import configure_http
+from utils.metrics import start_metrics_server, DEFAULT_METRICS_ADDRESS
 from utils.monitor import monitor_glp
-from web3 import Web3
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -17,11 +19,17 @@ def validate_address(address):
     Returns:
         bool: True if the address is valid, False otherwise.
     """
-    return Web3.isAddress(address)
+    # web3 takes about a second to import, so it is only loaded when an address is typed in
+    from web3 import Web3
+    return Web3.is_address(address)
 
 def main():
     # Load configuration
     config = load_config()
+    configure_cache(config.get('cache_ttls'), config.get('cache_maxsize'))
+    configure_http(**config.get('http', {}))
+    if config.get('metrics_port'):
+        start_metrics_server(config['metrics_port'], config.get('metrics_address', DEFAULT_METRICS_ADDRESS))
 
     # Ask the user for their wallet address if not provided in config
     if not config['user_addresses']:
@@ -30,13 +38,13 @@ def main():
             raise ValueError("Invalid wallet address provided.")
         config['user_addresses'].append(user_address)
 
-    # Load the ABI
-    with open('contracts/glp_abi.json', 'r') as abi_file:
-        glp_abi = json.load(abi_file)
-        config['glp_abi'] = glp_abi
-
     # Start monitoring the user's GLP holdings, rewards, and fees
-    monitor_glp(config)
+    # Events and ledger modes follow Transfer logs, which the synchronous engine polls
+    if config.get('async_engine') and config.get('refresh_mode') not in ('events', 'ledger'):
+        from utils.async_fetch import monitor_glp_async
+        asyncio.run(monitor_glp_async(config))
+    else:
+        monitor_glp(config)
 
 if __name__ == "__main__":
     main()
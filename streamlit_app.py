@@ -1,7 +1,7 @@
 import asyncio
 import streamlit as st
 
-from utils.constants import ARBITRUM_TOKEN_ADDRESS_MAP, AVALANCHE_TOKEN_ADDRESS_MAP, DECIMALS
+from utils.constants import ARBITRUM_TOKEN_ADDRESS_MAP, AVALANCHE_TOKEN_ADDRESS_MAP, CHAIN_IDS, DECIMALS
 
 # Create and set an event loop
 loop = asyncio.new_event_loop()
@@ -9,36 +9,193 @@ asyncio.set_event_loop(loop)
 
 # Now we can import web3 and other modules
 from utils.config_loader import load_config
-from utils.web3_utils import setup_web3, load_contract
-from utils.monitor import calculate_average_mint_price, fetch_glp_data, get_total_supply, get_user_glp_balance, calculate_prices_via_api, get_glp_transactions, get_token_composition_scraping, calculate_wallet_exposure
+from utils.cache import configure_cache
+from utils.http_client import configure_http
+from utils.rate_limit import PRIORITY_INTERACTIVE, request_priority
+from utils.web3_utils import setup_async_web3, load_contract
+from utils.monitor import calculate_cost_basis, get_glp_price_history, calculate_prices_via_api, get_glp_transactions, get_token_composition_scraping, calculate_wallet_exposure
+from utils.async_fetch import fetch_all_chains_async, DEFAULT_MAX_CONCURRENCY
+from utils.abi import load_glp_abi
 from datetime import datetime
-import pandas as pd
-import matplotlib.pyplot as plt
-import json
+import io
+import os
+import threading
 
-def plot_token_composition(token_composition, network_name, token_address_map):
-    token_address_map = {k.lower(): v for k, v in token_address_map.items()}
-    
-    tokens = [token_address_map.get(token, token) for token in token_composition.keys()]
-    weights = [weight * 100 for weight in token_composition.values()]
+# Seconds per-address data stays cached between reruns
+ADDRESS_DATA_TTL = 60
+
+@st.cache_resource
+def load_app_config():
+    config = load_config()
+    configure_cache(config.get('cache_ttls'), config.get('cache_maxsize'))
+    configure_http(**config.get('http', {}))
+    return config
+
+@st.cache_resource
+def get_background_loop():
+    # Every rerun creates a new loop above; the cached clients need one that outlives them
+    background_loop = asyncio.new_event_loop()
+    threading.Thread(target=background_loop.run_forever, daemon=True).start()
+    return background_loop
+
+def run_async(coro):
+    return asyncio.run_coroutine_threadsafe(coro, get_background_loop()).result()
+
+@st.cache_resource
+def get_glp_contracts(arb_provider_url, avax_provider_url, arb_contract_address, avax_contract_address):
+    pool_options = load_app_config().get('rpc_failover', {})
+    glp_abi = load_glp_abi()
+    return {
+        'arbitrum': load_contract(setup_async_web3(arb_provider_url, **pool_options), arb_contract_address, glp_abi),
+        'avalanche': load_contract(setup_async_web3(avax_provider_url, **pool_options), avax_contract_address, glp_abi)
+    }
 
-    fig, ax = plt.subplots(figsize=(6, 4))  # Increased the figure size here
+class IncompleteSnapshots(Exception):
+    # Raised out of load_snapshots so st.cache_data does not keep a load with failed reads
+    def __init__(self, snapshots):
+        super().__init__("some GLP reads failed")
+        self.snapshots = snapshots
+
+@st.cache_data(ttl=ADDRESS_DATA_TTL, show_spinner=False)
+def load_snapshots(user_address):
+    config = load_app_config()
+    glp_contracts = get_glp_contracts(config['arb_provider_url'], config['avax_provider_url'],
+                                      config['arb_glp_contract_address'], config['avax_glp_contract_address'])
+    snapshots = run_async(fetch_all_chains_async(glp_contracts, [user_address], config.get('max_concurrency', DEFAULT_MAX_CONCURRENCY)))
+    if any(snapshot['glp_data'] is None or snapshot['errors'] for snapshot in snapshots.values()):
+        raise IncompleteSnapshots(snapshots)
+    return snapshots
+
+def get_snapshots(user_address):
+    # A failed load is shown once and read again on the next rerun
+    try:
+        return load_snapshots(user_address)
+    except IncompleteSnapshots as e:
+        return e.snapshots
+
+def chain_market(snapshot, network_name):
+    # Without subgraph data the chain's price, market cap and supply are unknown, not zero
+    if snapshot['errors']:
+        st.warning(f"Some {network_name} balances could not be read; they are shown as 0.")
+    glp_data = snapshot['glp_data']
+    if glp_data is None:
+        st.warning(f"{network_name} GLP data could not be loaded; its price, market cap and supply are unavailable.")
+        return None, None, None
+    return glp_data['aum_in_usdg'] / (10 ** DECIMALS), glp_data['glp_supply'] / (10 ** DECIMALS), glp_data['price']
+
+def value_of(balance, price):
+    return None if price is None else balance * price
+
+def format_amount(value, unit):
+    return 'n/a' if value is None else f"{value:.2f} {unit}"
+
+@st.cache_data(ttl=ADDRESS_DATA_TTL, show_spinner=False)
+def load_transactions(contract_address, user_address, api_key, network):
+    return get_glp_transactions(contract_address, user_address, api_key, network=network)
+
+@st.cache_data(ttl=ADDRESS_DATA_TTL, show_spinner=False)
+def load_exposure(glp_balance, network):
+    return calculate_wallet_exposure(glp_balance, network=network)
+
+@st.cache_data(ttl=ADDRESS_DATA_TTL, show_spinner=False)
+def load_cost_basis(contract_address, user_address, api_key, network, glp_price):
+    transactions = load_transactions(contract_address, user_address, api_key, network)
+    return calculate_cost_basis(transactions, user_address, get_glp_price_history(network), glp_price)
+
+@st.cache_data(ttl=ADDRESS_DATA_TTL, show_spinner=False)
+def load_token_composition(network):
+    return get_token_composition_scraping(network=network)
+
+@st.cache_data(ttl=ADDRESS_DATA_TTL, show_spinner=False)
+def load_history(store_path, user_address, resolution):
+    # Only the rollups are read, so long histories never load raw ticks
+    from utils.timeseries import TimeSeriesStore
+    store = TimeSeriesStore(store_path)
+    balances = store.rollup('balances', resolution, address=user_address)
+    chains = store.rollup('chains', resolution)
+    return balances, chains
+
+@st.cache_data(ttl=ADDRESS_DATA_TTL, show_spinner=False)
+def load_backfill(cache_path, user_address):
+    # Served from the backfill cache only; filling it is left to python -m utils.backfill
+    import pandas as pd
+    from utils.backfill import BackfillCache
+    cache = BackfillCache(cache_path)
+    try:
+        prices, exposure = [], []
+        for network, chain_id in CHAIN_IDS.items():
+            prices.extend(dict(point, network=network) for point in cache.price_series(chain_id))
+            exposure.extend(dict(point, network=network) for point in cache.exposure_series(chain_id, user_address))
+    finally:
+        cache.close()
+    return pd.DataFrame(prices), pd.DataFrame(exposure)
+
+def transactions_frame(transactions):
+    # The Arrow-backed columns are handed over as is; amounts and dates are only converted for display
+    import pandas as pd
+    df = transactions.to_pandas()
+    return pd.DataFrame({
+        'Transaction Hash': df['hash'],
+        'From': df['from'],
+        'To': df['to'],
+        'Value (GLP)': transactions.glp_values(),
+        'Date': pd.to_datetime(transactions.table.column('timeStamp').to_numpy(), unit='s'),
+    })
+
+# Composition keys are lowercase addresses, so the maps are lowercased once
+TOKEN_ADDRESS_MAPS = {
+    'Arbitrum': {address.lower(): token for address, token in ARBITRUM_TOKEN_ADDRESS_MAP.items()},
+    'Avalanche': {address.lower(): token for address, token in AVALANCHE_TOKEN_ADDRESS_MAP.items()},
+}
+
+# Rendered composition charts kept per server; each is a small PNG
+COMPOSITION_CHART_ENTRIES = 32
+
+def label_token_composition(token_composition, network_name):
+    token_address_map = TOKEN_ADDRESS_MAPS[network_name]
+    return tuple((token_address_map.get(token, token), weight * 100) for token, weight in token_composition.items())
+
+@st.cache_data(max_entries=COMPOSITION_CHART_ENTRIES, show_spinner=False)
+def render_token_composition(labelled_weights, network_name):
+    # matplotlib is the slowest import of the app, so it waits for this tab.
+    # A Figure built without pyplot is not tracked globally and is freed once rendered.
+    from matplotlib.figure import Figure
+
+    tokens = [token for token, _ in labelled_weights]
+    weights = [weight for _, weight in labelled_weights]
+
+    fig = Figure(figsize=(6, 4))
+    ax = fig.subplots()
     wedges, texts, autotexts = ax.pie(weights, labels=tokens, autopct='%1.1f%%', startangle=90)
     ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-    plt.title(f"{network_name.capitalize()} Token Composition")
-    
+    ax.set_title(f"{network_name} Token Composition")
+
     # Adding legend outside the pie chart
     ax.legend(wedges, tokens, title="Tokens", loc="center left", bbox_to_anchor=(1, 0, 0.5, 1))
 
     # Styling the text
-    plt.setp(autotexts, size=10, weight="bold")
-    plt.setp(texts, size=10)
+    for text in texts + autotexts:
+        text.set_size(10)
+    for text in autotexts:
+        text.set_weight("bold")
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight')
+    return buffer.getvalue()
 
-    st.pyplot(fig)
+def plot_token_composition(token_composition, network_name, chart='matplotlib'):
+    labelled_weights = label_token_composition(token_composition, network_name)
+
+    if chart == 'native':
+        import pandas as pd
+        st.bar_chart(pd.Series(dict(labelled_weights), name='Weight (%)'))
+    else:
+        # Cached by the composition itself, so reruns reuse the rendered image
+        st.image(render_token_composition(labelled_weights, network_name))
 
     st.markdown("### Token Composition Details")
-    for token, weight in token_composition.items():
-        st.markdown(f"**{token_address_map.get(token, token)}:** {weight * 100:.2f}%")
+    for token, weight in labelled_weights:
+        st.markdown(f"**{token}:** {weight:.2f}%")
 
 def main():
     st.set_page_config(page_title="GLP Holdings Monitor", layout="centered")
@@ -95,21 +252,10 @@ def main():
 
     st.markdown('<div class="header">GLP Holdings Monitor</div>', unsafe_allow_html=True)
 
-    # Load configuration
-    config = load_config()
+    # Clients, ABI and configuration are built once per server process
+    config = load_app_config()
     api_key = config['api_key']  # Ensure your API key is in the config file
 
-    # Load the ABI
-    with open('contracts/glp_abi.json', 'r') as abi_file:
-        glp_abi = json.load(abi_file)
-
-    # Setup Web3 connections
-    arb_web3 = setup_web3(config['arb_provider_url'])
-    avax_web3 = setup_web3(config['avax_provider_url'])
-
-    arb_glp_contract = load_contract(arb_web3, config['arb_glp_contract_address'], glp_abi)
-    avax_glp_contract = load_contract(avax_web3, config['avax_glp_contract_address'], glp_abi)
-
     # Main container
     st.markdown('<div class="main-container">', unsafe_allow_html=True)
     
@@ -118,19 +264,16 @@ def main():
 
     if user_address:
         st.markdown('<div class="metric-container">', unsafe_allow_html=True)
-        arb_user_balance = get_user_glp_balance(arb_glp_contract, user_address)
-        avax_user_balance = get_user_glp_balance(avax_glp_contract, user_address)
-
-        # Fetch GLP data
-        arb_glp_data = fetch_glp_data('arbitrum')
-        avax_glp_data = fetch_glp_data('avalanche')
+        # Fetch balances and GLP data for both chains concurrently
+        snapshots = get_snapshots(user_address)
+        arb_user_balance = snapshots['arbitrum']['balances'][user_address]
+        avax_user_balance = snapshots['avalanche']['balances'][user_address]
 
-        arb_aum_in_usdg = arb_glp_data['aum_in_usdg'] / (10 ** DECIMALS)
-        avax_aum_in_usdg = avax_glp_data['aum_in_usdg'] / (10 ** DECIMALS)
-        arb_glp_supply = arb_glp_data['glp_supply'] / (10 ** DECIMALS)
-        avax_glp_supply = avax_glp_data['glp_supply'] / (10 ** DECIMALS)
-        arb_glp_price = arb_glp_data['price']
-        avax_glp_price = avax_glp_data['price']
+        arb_aum_in_usdg, arb_glp_supply, arb_glp_price = chain_market(snapshots['arbitrum'], 'Arbitrum')
+        avax_aum_in_usdg, avax_glp_supply, avax_glp_price = chain_market(snapshots['avalanche'], 'Avalanche')
+        arb_glp_value = value_of(arb_user_balance, arb_glp_price)
+        avax_glp_value = value_of(avax_user_balance, avax_glp_price)
+        total_glp_value = None if arb_glp_value is None or avax_glp_value is None else arb_glp_value + avax_glp_value
 
         # Summary Section
         st.markdown('<div class="subheader">Summary</div>', unsafe_allow_html=True)
@@ -146,7 +289,7 @@ def main():
             </div>
             <div class="metric">
                 <label>Arbitrum GLP Value</label>
-                <span>{arb_user_balance * arb_glp_price:.2f} USD</span>
+                <span>{format_amount(arb_glp_value, 'USD')}</span>
             </div>
             <div class="metric">
                 <label>Avalanche GLP Balance</label>
@@ -154,11 +297,11 @@ def main():
             </div>
             <div class="metric">
                 <label>Avalanche GLP Value</label>
-                <span>{avax_user_balance * avax_glp_price:.2f} USD</span>
+                <span>{format_amount(avax_glp_value, 'USD')}</span>
             </div>
             <div class="metric">
                 <label>Total GLP Value</label>
-                <span>{arb_user_balance * arb_glp_price + avax_user_balance * avax_glp_price:.2f} USD</span>
+                <span>{format_amount(total_glp_value, 'USD')}</span>
             </div>
         </div>
         """, unsafe_allow_html=True)
@@ -167,27 +310,27 @@ def main():
         <div class="metric-container">
             <div class="metric">
                 <label>Arbitrum GLP Price</label>
-                <span>{arb_glp_price:.2f} USD</span>
+                <span>{format_amount(arb_glp_price, 'USD')}</span>
             </div>
             <div class="metric">
                 <label>Arbitrum Market Cap</label>
-                <span>{arb_aum_in_usdg:.2f} USD</span>
+                <span>{format_amount(arb_aum_in_usdg, 'USD')}</span>
             </div>
             <div class="metric">
                 <label>Arbitrum Total Supply</label>
-                <span>{arb_glp_supply:.2f} GLP</span>
+                <span>{format_amount(arb_glp_supply, 'GLP')}</span>
             </div>
             <div class="metric">
                 <label>Avalanche GLP Price</label>
-                <span>{avax_glp_price:.2f} USD</span>
+                <span>{format_amount(avax_glp_price, 'USD')}</span>
             </div>
             <div class="metric">
                 <label>Avalanche Market Cap</label>
-                <span>{avax_aum_in_usdg:.2f} USD</span>
+                <span>{format_amount(avax_aum_in_usdg, 'USD')}</span>
             </div>
             <div class="metric">
                 <label>Avalanche Total Supply</label>
-                <span>{avax_glp_supply:.2f} GLP</span>
+                <span>{format_amount(avax_glp_supply, 'GLP')}</span>
             </div>
         </div>
         """, unsafe_allow_html=True)
@@ -200,93 +343,125 @@ def main():
         # st.write(f"Avalanche - Price: **{avax_glp_price:.2f} USD**, Market Cap: **{avax_aum_in_usdg:.2f} USD**, Supply: **{avax_glp_supply:.2f} GLP**")
 
 
-        tabs = st.tabs(["Arbitrum GLP", "Avalanche GLP", "GLP Value", "Token Composition"])
+        # Only the open tab runs, so its data is fetched when the tab is first opened
+        tabs = st.tabs(["Arbitrum GLP", "Avalanche GLP", "GLP Value", "Token Composition", "History"], key='glp_tab', on_change='rerun')
         with tabs[0]:
-            st.markdown('<div class="subheader">Arbitrum GLP Holdings</div>', unsafe_allow_html=True)
-            col1, col2 = st.columns(2)  # Define the columns layout
-            with col1:
-                st.markdown(f'<div class="metric"><label>Total Supply</label><span>{arb_glp_supply:.2f} GLP</span></div>', unsafe_allow_html=True)
-                st.markdown(f'<div class="metric"><label>User Balance</label><span>{arb_user_balance:.2f} GLP</span></div>', unsafe_allow_html=True)
-            with col2:
-                st.markdown(f'<div class="metric"><label>Mint Price</label><span>{arb_glp_price:.2f} USD</span></div>', unsafe_allow_html=True)
-                st.markdown(f'<div class="metric"><label>Market Cap</label><span>{arb_aum_in_usdg:.2f} USD</span></div>', unsafe_allow_html=True)
-
-            st.markdown('<div class="subheader">Arbitrum GLP Transactions</div>', unsafe_allow_html=True)
-            arb_transactions = get_glp_transactions(config['arb_glp_contract_address'], user_address, api_key, network='arbitrum')
-            if arb_transactions:
-                df_arb = pd.DataFrame(arb_transactions)
-                df_arb['timeStamp'] = pd.to_datetime(df_arb['timeStamp'], unit='s')
-                df_arb['value'] = df_arb['value'].astype(float) / 10**18
-                df_arb = df_arb.rename(columns=({'hash': 'Transaction Hash', 'from': 'From', 'to': 'To', 'value': 'Value (GLP)', 'timeStamp': 'Date'}))
-                st.dataframe(df_arb[['Transaction Hash', 'From', 'To', 'Value (GLP)', 'Date']])
-
-            # Display user's exposure to underlying tokens
-            st.markdown('<div class="subheader">Arbitrum GLP Token Exposure</div>', unsafe_allow_html=True)
-            arb_exposure = calculate_wallet_exposure(arb_user_balance, network='arbitrum')
-            for token, exposure in arb_exposure.items():
-                st.write(f"**{token}:** {exposure:.2f} USD")
+            if tabs[0].open:
+                st.markdown('<div class="subheader">Arbitrum GLP Holdings</div>', unsafe_allow_html=True)
+                col1, col2 = st.columns(2)  # Define the columns layout
+                with col1:
+                    st.markdown(f'<div class="metric"><label>Total Supply</label><span>{format_amount(arb_glp_supply, "GLP")}</span></div>', unsafe_allow_html=True)
+                    st.markdown(f'<div class="metric"><label>User Balance</label><span>{arb_user_balance:.2f} GLP</span></div>', unsafe_allow_html=True)
+                with col2:
+                    st.markdown(f'<div class="metric"><label>Mint Price</label><span>{format_amount(arb_glp_price, "USD")}</span></div>', unsafe_allow_html=True)
+                    st.markdown(f'<div class="metric"><label>Market Cap</label><span>{format_amount(arb_aum_in_usdg, "USD")}</span></div>', unsafe_allow_html=True)
+
+                st.markdown('<div class="subheader">Arbitrum GLP Transactions</div>', unsafe_allow_html=True)
+                arb_transactions = load_transactions(config['arb_glp_contract_address'], user_address, api_key, 'arbitrum')
+                if arb_transactions:
+                    st.dataframe(transactions_frame(arb_transactions))
+
+                # Display user's exposure to underlying tokens
+                st.markdown('<div class="subheader">Arbitrum GLP Token Exposure</div>', unsafe_allow_html=True)
+                arb_exposure = load_exposure(arb_user_balance, 'arbitrum')
+                for token, exposure in arb_exposure.items():
+                    st.write(f"**{token}:** {exposure:.2f} USD")
 
         with tabs[1]:
-            st.markdown('<div class="subheader">Avalanche GLP Holdings</div>', unsafe_allow_html=True)
-            col1, col2 = st.columns(2)  # Define the columns layout
-            with col1:
-                st.markdown(f'<div class="metric"><label>Total Supply</label><span>{avax_glp_supply:.2f} GLP</span></div>', unsafe_allow_html=True)
-                st.markdown(f'<div class="metric"><label>User Balance</label><span>{avax_user_balance:.2f} GLP</span></div>', unsafe_allow_html=True)
-            with col2:
-                st.markdown(f'<div class="metric"><label>Mint Price</label><span>{avax_glp_price:.2f} USD</span></div>', unsafe_allow_html=True)
-                st.markdown(f'<div class="metric"><label>Market Cap</label><span>{avax_aum_in_usdg:.2f} USD</span></div>', unsafe_allow_html=True)
-
-            st.markdown('<div class="subheader">Avalanche GLP Transactions</div>', unsafe_allow_html=True)
-            avax_transactions = get_glp_transactions(config['avax_glp_contract_address'], user_address, api_key, network='avalanche')
-            if avax_transactions:
-                df_avax = pd.DataFrame(avax_transactions)
-                df_avax['timeStamp'] = pd.to_datetime(df_avax['timeStamp'], unit='s')
-                df_avax['value'] = df_avax['value'].astype(float) / 10**18
-                df_avax = df_avax.rename(columns=({'hash': 'Transaction Hash', 'from': 'From', 'to': 'To', 'value': 'Value (GLP)', 'timeStamp': 'Date'}))
-                st.dataframe(df_avax[['Transaction Hash', 'From', 'To', 'Value (GLP)', 'Date']])
-
-            # Display user's exposure to underlying tokens
-            st.markdown('<div class="subheader">Avalanche GLP Token Exposure</div>', unsafe_allow_html=True)
-            avax_exposure = calculate_wallet_exposure(avax_user_balance, network='avalanche')
-            for token, exposure in avax_exposure.items():
-                st.write(f"**{token}:** {exposure:.2f} USD")
+            if tabs[1].open:
+                st.markdown('<div class="subheader">Avalanche GLP Holdings</div>', unsafe_allow_html=True)
+                col1, col2 = st.columns(2)  # Define the columns layout
+                with col1:
+                    st.markdown(f'<div class="metric"><label>Total Supply</label><span>{format_amount(avax_glp_supply, "GLP")}</span></div>', unsafe_allow_html=True)
+                    st.markdown(f'<div class="metric"><label>User Balance</label><span>{avax_user_balance:.2f} GLP</span></div>', unsafe_allow_html=True)
+                with col2:
+                    st.markdown(f'<div class="metric"><label>Mint Price</label><span>{format_amount(avax_glp_price, "USD")}</span></div>', unsafe_allow_html=True)
+                    st.markdown(f'<div class="metric"><label>Market Cap</label><span>{format_amount(avax_aum_in_usdg, "USD")}</span></div>', unsafe_allow_html=True)
+
+                st.markdown('<div class="subheader">Avalanche GLP Transactions</div>', unsafe_allow_html=True)
+                avax_transactions = load_transactions(config['avax_glp_contract_address'], user_address, api_key, 'avalanche')
+                if avax_transactions:
+                    st.dataframe(transactions_frame(avax_transactions))
+
+                # Display user's exposure to underlying tokens
+                st.markdown('<div class="subheader">Avalanche GLP Token Exposure</div>', unsafe_allow_html=True)
+                avax_exposure = load_exposure(avax_user_balance, 'avalanche')
+                for token, exposure in avax_exposure.items():
+                    st.write(f"**{token}:** {exposure:.2f} USD")
 
         with tabs[2]:
-            st.markdown('<div class="subheader">GLP Value</div>', unsafe_allow_html=True)
-            arb_glp_value = arb_user_balance * arb_glp_price  # Updated calculation using arb_glp_price
-            avax_glp_value = avax_user_balance * avax_glp_price  # Updated calculation using avax_glp_price
-            total_glp_value = arb_glp_value + avax_glp_value
-
-            # Calculate average mint price
-            avg_arb_mint_price = calculate_average_mint_price(arb_transactions)
-            avg_avax_mint_price = calculate_average_mint_price(avax_transactions)
-
-            # Calculate PnL
-            arb_pnl = (arb_glp_price - avg_arb_mint_price) * arb_user_balance
-            avax_pnl = (avax_glp_price - avg_avax_mint_price) * avax_user_balance
-            total_pnl = arb_pnl + avax_pnl
-
-            st.markdown('<div class="metric-container">', unsafe_allow_html=True)
-            st.markdown(f'<div class="metric"><label>Arbitrum GLP Value</label><span>{arb_glp_value:.2f} USD</span></div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="metric"><label>Avalanche GLP Value</label><span>{avax_glp_value:.2f} USD</span></div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="metric"><label>Total GLP Value</label><span>{total_glp_value:.2f} USD</span></div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="metric"><label>Average Arbitrum Mint Price</label><span>{avg_arb_mint_price:.2f} USD</span></div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="metric"><label>Average Avalanche Mint Price</label><span>{avg_avax_mint_price:.2f} USD</span></div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="metric"><label>Total PnL</label><span>{total_pnl:.2f} USD</span></div>', unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
+            if tabs[2].open:
+                st.markdown('<div class="subheader">GLP Value</div>', unsafe_allow_html=True)
+                # FIFO cost basis of each chain's transfers, priced from the daily GLP price history
+                arb_cost_basis = load_cost_basis(config['arb_glp_contract_address'], user_address, api_key, 'arbitrum', arb_glp_price)
+                avax_cost_basis = load_cost_basis(config['avax_glp_contract_address'], user_address, api_key, 'avalanche', avax_glp_price)
+                avg_arb_mint_price = arb_cost_basis['average_cost'] if arb_cost_basis else 0
+                avg_avax_mint_price = avax_cost_basis['average_cost'] if avax_cost_basis else 0
+
+                # Calculate PnL
+                arb_pnl = arb_cost_basis['realized_pnl'] + arb_cost_basis['unrealized_pnl'] if arb_cost_basis else 0
+                avax_pnl = avax_cost_basis['realized_pnl'] + avax_cost_basis['unrealized_pnl'] if avax_cost_basis else 0
+                total_pnl = arb_pnl + avax_pnl
+
+                st.markdown('<div class="metric-container">', unsafe_allow_html=True)
+                st.markdown(f'<div class="metric"><label>Arbitrum GLP Value</label><span>{format_amount(arb_glp_value, "USD")}</span></div>', unsafe_allow_html=True)
+                st.markdown(f'<div class="metric"><label>Avalanche GLP Value</label><span>{format_amount(avax_glp_value, "USD")}</span></div>', unsafe_allow_html=True)
+                st.markdown(f'<div class="metric"><label>Total GLP Value</label><span>{format_amount(total_glp_value, "USD")}</span></div>', unsafe_allow_html=True)
+                st.markdown(f'<div class="metric"><label>Average Arbitrum Mint Price</label><span>{avg_arb_mint_price:.2f} USD</span></div>', unsafe_allow_html=True)
+                st.markdown(f'<div class="metric"><label>Average Avalanche Mint Price</label><span>{avg_avax_mint_price:.2f} USD</span></div>', unsafe_allow_html=True)
+                st.markdown(f'<div class="metric"><label>Total PnL</label><span>{total_pnl:.2f} USD</span></div>', unsafe_allow_html=True)
+                st.markdown('</div>', unsafe_allow_html=True)
 
         with tabs[3]:
-            st.markdown('<div class="subheader">Token Composition</div>', unsafe_allow_html=True)
-            arb_token_composition = get_token_composition_scraping(network='arbitrum')
-            avax_token_composition = get_token_composition_scraping(network='avalanche')
+            if tabs[3].open:
+                st.markdown('<div class="subheader">Token Composition</div>', unsafe_allow_html=True)
+                arb_token_composition = load_token_composition('arbitrum')
+                avax_token_composition = load_token_composition('avalanche')
             
-            st.markdown('<div class="subheader">Arbitrum Token Composition</div>', unsafe_allow_html=True)
-            plot_token_composition(arb_token_composition, 'Arbitrum', ARBITRUM_TOKEN_ADDRESS_MAP)
+                st.markdown('<div class="subheader">Arbitrum Token Composition</div>', unsafe_allow_html=True)
+                plot_token_composition(arb_token_composition, 'Arbitrum', config.get('composition_chart', 'matplotlib'))
             
-            st.markdown('<div class="subheader">Avalanche Token Composition</div>', unsafe_allow_html=True)
-            plot_token_composition(avax_token_composition, 'Avalanche', AVALANCHE_TOKEN_ADDRESS_MAP)
+                st.markdown('<div class="subheader">Avalanche Token Composition</div>', unsafe_allow_html=True)
+                plot_token_composition(avax_token_composition, 'Avalanche', config.get('composition_chart', 'matplotlib'))
+
+        with tabs[4]:
+            if tabs[4].open:
+                st.markdown('<div class="subheader">History</div>', unsafe_allow_html=True)
+                if not config.get('timeseries_path'):
+                    st.write("Set `timeseries_path` in the configuration to record monitor history.")
+                else:
+                    import pandas as pd
+                    from utils.timeseries import ROLLUPS
+                    resolution = st.selectbox("Resolution", list(ROLLUPS), index=list(ROLLUPS).index('1h'))
+                    balance_history, chain_history = load_history(config['timeseries_path'], user_address, resolution)
+                    if balance_history.empty:
+                        st.write("No recorded history for this address yet.")
+                    else:
+                        balance_history['bucket'] = pd.to_datetime(balance_history['bucket'], unit='s')
+                        st.markdown("**GLP Balance**")
+                        st.line_chart(balance_history.pivot(index='bucket', columns='network', values='balance_close'))
+                    if not chain_history.empty:
+                        chain_history['bucket'] = pd.to_datetime(chain_history['bucket'], unit='s')
+                        st.markdown("**GLP Price (USD)**")
+                        st.line_chart(chain_history.pivot(index='bucket', columns='network', values='glp_price_close'))
+                        st.markdown("**GLP Supply**")
+                        st.line_chart(chain_history.pivot(index='bucket', columns='network', values='total_supply_close'))
+                backfill_path = config.get('backfill', {}).get('cache_path')
+                if backfill_path and os.path.exists(backfill_path):
+                    import pandas as pd
+                    price_backfill, exposure_backfill = load_backfill(backfill_path, user_address)
+                    if not price_backfill.empty:
+                        price_backfill['date'] = pd.to_datetime(price_backfill['timestamp'], unit='s')
+                        st.markdown("**Backfilled GLP Price (USD)**")
+                        st.line_chart(price_backfill.pivot(index='date', columns='network', values='price'))
+                    if not exposure_backfill.empty:
+                        exposure_backfill['date'] = pd.to_datetime(exposure_backfill['timestamp'], unit='s')
+                        st.markdown("**Backfilled GLP Value (USD)**")
+                        st.line_chart(exposure_backfill.pivot(index='date', columns='network', values='value'))
     st.markdown('</div>', unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
+    # Lookups made for a visitor go ahead of the monitor's background requests
+    with request_priority(PRIORITY_INTERACTIVE):
+        main()
 
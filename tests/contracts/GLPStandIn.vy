@@ -0,0 +1,30 @@
+# pragma version ~=0.4.0
+# Minimal ERC20 stand-in for the GLP token, used by the local-chain tests.
+
+event Transfer:
+    sender: indexed(address)
+    receiver: indexed(address)
+    value: uint256
+
+event Mint:
+    account: indexed(address)
+    amount: uint256
+
+balanceOf: public(HashMap[address, uint256])
+totalSupply: public(uint256)
+
+
+@external
+def mint(receiver: address, amount: uint256):
+    self.balanceOf[receiver] += amount
+    self.totalSupply += amount
+    log Transfer(sender=empty(address), receiver=receiver, value=amount)
+    log Mint(account=receiver, amount=amount)
+
+
+@external
+def transfer(receiver: address, amount: uint256) -> bool:
+    self.balanceOf[msg.sender] -= amount
+    self.balanceOf[receiver] += amount
+    log Transfer(sender=msg.sender, receiver=receiver, value=amount)
+    return True
@@ -0,0 +1,24 @@
+# pragma version ~=0.4.0
+# ABI-compatible subset of Multicall3 (aggregate3 only) for the local-chain tests.
+
+struct Call3:
+    target: address
+    allowFailure: bool
+    callData: Bytes[1024]
+
+struct Result:
+    success: bool
+    returnData: Bytes[1024]
+
+
+@external
+@view
+def aggregate3(calls: DynArray[Call3, 1024]) -> DynArray[Result, 1024]:
+    results: DynArray[Result, 1024] = []
+    for call: Call3 in calls:
+        success: bool = False
+        response: Bytes[1024] = b""
+        success, response = raw_call(call.target, call.callData, max_outsize=1024, is_static_call=True, revert_on_failure=False)
+        assert success or call.allowFailure, "Multicall3: call failed"
+        results.append(Result(success=success, returnData=response))
+    return results
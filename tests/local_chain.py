@@ -0,0 +1,54 @@
+import json
+import os
+
+from web3 import Web3, AsyncWeb3, EthereumTesterProvider
+from web3.providers.eth_tester import AsyncEthereumTesterProvider
+
+COMPILED_PATH = os.path.join(os.path.dirname(__file__), 'contracts', 'compiled.json')
+
+
+def setup_local_web3():
+    """
+    Setup a Web3 instance backed by an in-process eth-tester (py-evm) chain.
+
+    Returns:
+        Web3: An instance of Web3 connected to the local chain.
+    """
+    return Web3(EthereumTesterProvider())
+
+
+def deploy_contract(web3, name):
+    """
+    Deploy one of the stand-in contracts from ``tests/contracts``.
+
+    The bytecode in ``compiled.json`` is produced with ``vyper -f abi,bytecode <name>.vy``.
+
+    Args:
+        web3 (Web3): The local Web3 instance.
+        name (str): The contract name ('GLPStandIn' or 'Multicall3').
+
+    Returns:
+        Contract: The deployed contract instance.
+    """
+    with open(COMPILED_PATH, 'r') as compiled_file:
+        compiled = json.load(compiled_file)[name]
+
+    factory = web3.eth.contract(abi=compiled['abi'], bytecode=compiled['bytecode'])
+    tx_hash = factory.constructor().transact({'from': web3.eth.accounts[0]})
+    receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
+    return web3.eth.contract(address=receipt.contractAddress, abi=compiled['abi'])
+
+
+def setup_local_async_web3(web3):
+    """
+    Setup an AsyncWeb3 instance that shares the chain of a local Web3 instance.
+
+    Args:
+        web3 (Web3): The local Web3 instance from :func:`setup_local_web3`.
+
+    Returns:
+        AsyncWeb3: An AsyncWeb3 instance reading the same eth-tester chain.
+    """
+    provider = AsyncEthereumTesterProvider()
+    provider.ethereum_tester = web3.provider.ethereum_tester
+    return AsyncWeb3(provider)
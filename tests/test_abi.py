@@ -0,0 +1,28 @@
+import json
+import os
+import tempfile
+import unittest
+from utils.abi import GLP_ABI_NAMES, GLP_ABI_PATH, build_slim_abi, load_glp_abi, slim_abi
+
+
+class TestAbi(unittest.TestCase):
+    def test_slim_abi_is_current(self):
+        with open(GLP_ABI_PATH) as abi_file:
+            full_abi = json.load(abi_file)
+        self.assertEqual(load_glp_abi(), slim_abi(full_abi))
+        self.assertEqual(sorted(entry['name'] for entry in load_glp_abi()), sorted(GLP_ABI_NAMES))
+
+    def test_missing_names_are_rejected(self):
+        with self.assertRaises(ValueError):
+            slim_abi(load_glp_abi(), ('balanceOf', 'stake'))
+
+    def test_build_writes_the_slim_abi(self):
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, 'glp_abi.slim.json')
+            build_slim_abi(target=target, names=('balanceOf',))
+            with open(target) as abi_file:
+                self.assertEqual([entry['name'] for entry in json.load(abi_file)], ['balanceOf'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+from local_chain import setup_local_web3, setup_local_async_web3, deploy_contract
+from utils import async_fetch, monitor
+from utils.cache import market_data_cache
+from utils.subgraph import SubgraphError
+from utils.async_fetch import (fetch_all_chains_async, fetch_glp_data_async, get_total_supply_async,
+                               get_user_glp_balance_async)
+
+
+class SlowCall:
+    def __init__(self, tracker, value):
+        self.tracker = tracker
+        self.value = value
+
+    async def call(self):
+        self.tracker['in_flight'] += 1
+        self.tracker['peak'] = max(self.tracker['peak'], self.tracker['in_flight'])
+        await asyncio.sleep(0.01)
+        self.tracker['in_flight'] -= 1
+        return self.value
+
+
+class SlowContract:
+    def __init__(self, tracker):
+        self.functions = self
+        self.tracker = tracker
+
+    def balanceOf(self, user_address):
+        return SlowCall(self.tracker, 10 ** 18)
+
+
+class TestAsyncFetch(unittest.TestCase):
+    def setUp(self):
+        self.web3 = setup_local_web3()
+        self.async_web3 = setup_local_async_web3(self.web3)
+        self.multicall = deploy_contract(self.web3, 'Multicall3')
+        self.users = self.web3.eth.accounts[1:4]
+        self.contracts = {}
+        for network, amount in (('arbitrum', 1), ('avalanche', 2)):
+            token = deploy_contract(self.web3, 'GLPStandIn')
+            for user in self.users:
+                token.functions.mint(user, amount * 10 ** 18).transact({'from': self.web3.eth.accounts[0]})
+            self.contracts[network] = self.async_web3.eth.contract(address=token.address, abi=token.abi)
+
+    def test_single_reads(self):
+        contract = self.contracts['avalanche']
+        self.assertEqual(asyncio.run(get_total_supply_async(contract)), 6)
+        self.assertEqual(asyncio.run(get_user_glp_balance_async(contract, self.users[0])), 2)
+
+    def test_fetch_all_chains(self):
+        snapshots = asyncio.run(fetch_all_chains_async(self.contracts, self.users, batch_size=2,
+                                                       multicall_address=self.multicall.address, include_glp_data=False))
+        self.assertEqual(snapshots['arbitrum']['total_supply'], 3)
+        self.assertEqual(snapshots['avalanche']['balances'], {user: 2 for user in self.users})
+        self.assertEqual(snapshots['avalanche']['errors'], {})
+
+    def test_semaphore_bounds_concurrency(self):
+        tracker = {'in_flight': 0, 'peak': 0}
+        contract = SlowContract(tracker)
+
+        async def run():
+            semaphore = asyncio.Semaphore(3)
+            return await asyncio.gather(*(get_user_glp_balance_async(contract, str(i), semaphore) for i in range(12)))
+
+        self.assertEqual(asyncio.run(run()), [1] * 12)
+        self.assertEqual(tracker['peak'], 3)
+
+    def test_chains_fetched_concurrently(self):
+        async def slow_chain(contract, user_addresses, semaphore, batch_size, multicall_address):
+            await asyncio.sleep(0.2)
+            return {'total_supply': 0, 'balances': {}, 'errors': {}}
+
+        with patch.object(async_fetch, 'get_batched_glp_balances_async', slow_chain):
+            start = time.perf_counter()
+            asyncio.run(fetch_all_chains_async(self.contracts, self.users, include_glp_data=False))
+            elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.35)
+
+    def test_fetch_glp_data_async(self):
+        market_data_cache.clear()
+        self.addCleanup(market_data_cache.clear)
+        stats = {'glpStats': [{'aumInUsdg': '200', 'glpSupply': '100'}]}
+        with patch.object(monitor, 'query_subgraph', return_value=stats) as query_subgraph:
+            data = asyncio.run(fetch_glp_data_async('avalanche'))
+            self.assertEqual(asyncio.run(fetch_glp_data_async('avalanche')), data)
+        self.assertEqual(data, {'aum_in_usdg': 200.0, 'glp_supply': 100.0, 'price': 2.0})
+        # The second read is served by the shared market data cache
+        self.assertEqual(query_subgraph.call_count, 1)
+        self.assertEqual(query_subgraph.call_args.args[0], 'avalanche')
+
+    def test_subgraph_failure_keeps_the_chain_snapshot(self):
+        market_data_cache.clear()
+        self.addCleanup(market_data_cache.clear)
+        with patch.object(monitor, 'query_subgraph', side_effect=SubgraphError('HTTP 502')):
+            with self.assertLogs(level='ERROR'):
+                snapshots = asyncio.run(fetch_all_chains_async(
+                    self.contracts, self.users, batch_size=2, multicall_address=self.multicall.address))
+        self.assertIsNone(snapshots['arbitrum']['glp_data'])
+        self.assertEqual(snapshots['avalanche']['balances'], {user: 2.0 for user in self.users})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+from unittest.mock import patch
+from web3 import Web3
+from benchmarks.stand_in import TOTAL_SUPPLY, StandInServer, aum_in_usdg, balance_of
+from utils.backfill import BackfillCache, backfill, block_grid, glp_price
+from utils.rate_limit import PRIORITY_BACKFILL, current_priority
+from utils.web3_utils import setup_web3
+
+GLP_CONTRACT_ADDRESS = '0x1aDDD80E6039594eE970E5872D247bf0414C8903'
+USERS = [Web3.to_checksum_address(address) for address in (
+    '0x00000000000000000000000000000000000a0001', '0x00000000000000000000000000000000000b0002')]
+
+
+class TestBlockGrid(unittest.TestCase):
+    def test_samples_sit_on_multiples_of_the_step(self):
+        self.assertEqual(block_grid(150, 520, 100), [200, 300, 400, 500])
+        self.assertEqual(block_grid(200, 200, 100), [200])
+        self.assertEqual(block_grid(201, 299, 100), [])
+
+
+class TestBackfill(unittest.TestCase):
+    def setUp(self):
+        self.stand_in = StandInServer().start()
+        self.addCleanup(self.stand_in.stop)
+        self.web3 = setup_web3(self.stand_in.url('rpc', 'arbitrum'))
+        self.cache = BackfillCache(':memory:')
+        self.addCleanup(self.cache.close)
+
+    def run_backfill(self, start_block, end_block, users=USERS, **kwargs):
+        kwargs.setdefault('multicall_block', 0)
+        return backfill(self.web3, self.cache, 'arbitrum', start_block, end_block, users,
+                        balance_token_address=GLP_CONTRACT_ADDRESS, step=1000, **kwargs)
+
+    def eth_calls(self):
+        return self.stand_in.counts().get('rpc:eth_call', 0)
+
+    def test_points_hold_the_state_at_their_block(self):
+        self.assertEqual(self.run_backfill(1000, 3500), 3)
+        chain_id = self.web3.eth.chain_id
+
+        prices = self.cache.price_series(chain_id)
+        self.assertEqual([point['block'] for point in prices], [1000, 2000, 3000])
+        self.assertAlmostEqual(prices[1]['price'], glp_price(aum_in_usdg(2000), TOTAL_SUPPLY))
+        self.assertEqual(prices[1]['timestamp'], self.web3.eth.get_block(2000)['timestamp'])
+
+        exposure = self.cache.exposure_series(chain_id, USERS[0].lower())
+        self.assertEqual(len(exposure), 3)
+        self.assertAlmostEqual(exposure[2]['balance'], balance_of(USERS[0]) / 10 ** 18)
+        self.assertAlmostEqual(exposure[2]['value'], exposure[2]['balance'] * prices[2]['price'])
+
+    def test_cached_points_are_never_fetched_again(self):
+        self.run_backfill(1000, 3000)
+        calls = self.eth_calls()
+
+        self.assertEqual(self.run_backfill(1000, 3000), 0)
+        self.assertEqual(self.eth_calls(), calls)
+        self.assertEqual(self.run_backfill(2000, 4000), 1)
+        self.assertEqual(self.eth_calls(), calls + 1)
+
+    def test_new_addresses_refetch_their_blocks(self):
+        self.run_backfill(1000, 2000, users=USERS[:1])
+        self.assertEqual(self.run_backfill(1000, 2000), 2)
+        self.assertEqual(len(self.cache.exposure_series(self.web3.eth.chain_id, USERS[1])), 2)
+
+    def test_blocks_before_multicall3_are_read_with_plain_calls(self):
+        with self.assertLogs(level='WARNING') as logs:
+            self.assertEqual(self.run_backfill(1000, 3000, multicall_block=2500), 3)
+        self.assertEqual(len([line for line in logs.output if 'predate Multicall3' in line]), 1)
+        # Two blocks at one eth_call per value, then one multicall
+        self.assertEqual(self.eth_calls(), 2 * (2 + len(USERS)) + 1)
+
+        chain_id = self.web3.eth.chain_id
+        prices = self.cache.price_series(chain_id)
+        self.assertEqual(prices[0]['timestamp'], self.web3.eth.get_block(1000)['timestamp'])
+        self.assertAlmostEqual(prices[0]['price'], glp_price(aum_in_usdg(1000), TOTAL_SUPPLY))
+        self.assertAlmostEqual(self.cache.exposure_series(chain_id, USERS[0])[0]['balance'], balance_of(USERS[0]) / 10 ** 18)
+
+    def test_chunks_run_in_parallel_with_backfill_priority(self):
+        chunks = []
+        original = self.cache.add_points
+
+        def add_points(chain_id, points):
+            chunks.append(len(points))
+            original(chain_id, points)
+
+        self.cache.add_points = add_points
+        self.assertEqual(self.run_backfill(1000, 20000, workers=4, chunk_size=3), 20)
+        self.assertEqual(sorted(chunks), [2] + [3] * 6)
+        self.assertEqual(len(self.cache.price_series(self.web3.eth.chain_id)), 20)
+
+        priorities = []
+        original_call = self.web3.eth.call
+
+        def call(*args, **kwargs):
+            priorities.append(current_priority())
+            return original_call(*args, **kwargs)
+
+        with patch.object(self.web3.eth, 'call', side_effect=call):
+            self.run_backfill(21000, 22000)
+        self.assertEqual(priorities, [PRIORITY_BACKFILL, PRIORITY_BACKFILL])
+
+
+if __name__ == '__main__':
+    unittest.main()
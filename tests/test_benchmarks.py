@@ -0,0 +1,60 @@
+import json
+import unittest
+from unittest.mock import patch
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import utils.monitor as monitor
+from benchmarks.run import compare_results, configure_endpoints, monitor_tick, run_benchmarks
+from benchmarks.stand_in import StandInServer, balance_of, wallet
+from utils.constants import SUBGRAPH_URLS
+from utils.explorer import EXPLORER_URLS
+
+
+class TestBenchmarks(unittest.TestCase):
+    def setUp(self):
+        self.stand_in = StandInServer(rate_limits={'coingecko': 1}).start()
+        self.addCleanup(self.stand_in.stop)
+        for patcher in (patch.dict(SUBGRAPH_URLS), patch.dict(EXPLORER_URLS),
+                        patch.object(monitor, 'COINGECKO_API_URL', monitor.COINGECKO_API_URL)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        configure_endpoints(self.stand_in)
+
+    def test_monitor_tick_reads_each_chain_in_one_call(self):
+        user_addresses = [wallet(number) for number in range(3)]
+        snapshots = monitor_tick(self.stand_in, user_addresses)()
+
+        self.assertEqual(snapshots['arbitrum']['balances'][user_addresses[0]], balance_of(user_addresses[0]) / 10 ** 18)
+        self.assertEqual(self.stand_in.counts()['rpc:eth_call'], 2)
+
+    def test_throttled_requests_are_counted(self):
+        url = self.stand_in.url('coingecko') + '/api/v3/simple/price?ids=ethereum'
+        with urlopen(url) as response:
+            self.assertEqual(json.load(response), {'ethereum': {'usd': 3000.0}})
+        with self.assertRaises(HTTPError) as raised:
+            urlopen(url)
+        self.assertEqual(raised.exception.code, 429)
+        self.assertEqual(self.stand_in.counts()['throttled:coingecko'], 1)
+
+    def test_sweep_records_every_scaling_point_once(self):
+        results = run_benchmarks(self.stand_in, ['glp_price_history', 'wallet_transfer_histories'], [1, 2], repeat=1)
+
+        self.assertEqual([(result['scenario'], result['wallets']) for result in results],
+                         [('glp_price_history', None), ('wallet_transfer_histories', 1), ('wallet_transfer_histories', 2)])
+        self.assertEqual(results[0]['calls'], {'subgraph': 1})
+        self.assertEqual(results[1]['upstream_calls'], 2)
+        self.assertGreater(results[0]['peak_memory_bytes'], 0)
+
+    def test_compare_results_flags_regressions(self):
+        baseline = [{'scenario': 'monitor_tick', 'wallets': 10, 'wall_time': {'median': 1.0},
+                     'upstream_calls': 4, 'peak_memory_bytes': 1000}]
+        results = [dict(baseline[0], wall_time={'median': 1.5}, upstream_calls=6)]
+
+        regressions = compare_results(results, baseline, threshold=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertEqual(compare_results(baseline, baseline), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
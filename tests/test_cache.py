@@ -0,0 +1,148 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from utils import cache
+from utils.cache import TTLCache, cached, market_data_cache
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_fresh_value_is_cached(self):
+        ttl_cache = TTLCache()
+        calls = []
+        loader = lambda: calls.append(1) or len(calls)
+        self.assertEqual(ttl_cache.get_or_load('key', loader, ttl=60), 1)
+        self.assertEqual(ttl_cache.get_or_load('key', loader, ttl=60), 1)
+        self.assertEqual((ttl_cache.hits, ttl_cache.misses), (1, 1))
+
+    def test_stale_value_served_while_single_refresh_runs(self):
+        ttl_cache = TTLCache()
+        ttl_cache.get_or_load('key', lambda: 'old', ttl=0.01)
+        time.sleep(0.02)
+
+        started = threading.Event()
+        release = threading.Event()
+        refreshes = []
+
+        def slow_loader():
+            refreshes.append(1)
+            started.set()
+            release.wait(1)
+            return 'new'
+
+        for _ in range(5):
+            self.assertEqual(ttl_cache.get_or_load('key', slow_loader, ttl=0.01, max_stale=60), 'old')
+        started.wait(1)
+        release.set()
+        for _ in range(100):
+            if ttl_cache.get_or_load('key', slow_loader, ttl=60) == 'new':
+                break
+            time.sleep(0.01)
+        self.assertEqual(ttl_cache.get_or_load('key', slow_loader, ttl=60), 'new')
+        self.assertEqual(len(refreshes), 1)
+
+    def test_failed_refresh_keeps_stale_value(self):
+        ttl_cache = TTLCache()
+        ttl_cache.get_or_load('key', lambda: 'old', ttl=0.01)
+        time.sleep(0.02)
+
+        def failing_loader():
+            raise ConnectionError('rate limited')
+
+        self.assertEqual(ttl_cache.get_or_load('key', failing_loader, ttl=0.01, max_stale=60), 'old')
+        for _ in range(100):
+            if ttl_cache.refresh_errors:
+                break
+            time.sleep(0.01)
+        self.assertEqual(ttl_cache.refresh_errors, 1)
+        self.assertEqual(ttl_cache.get_or_load('key', failing_loader, ttl=0.01, max_stale=60), 'old')
+
+    def test_expired_value_reloads_synchronously(self):
+        ttl_cache = TTLCache()
+        ttl_cache.get_or_load('key', lambda: 'old', ttl=0.01)
+        time.sleep(0.02)
+        self.assertEqual(ttl_cache.get_or_load('key', lambda: 'new', ttl=0.01, max_stale=0), 'new')
+
+    def test_lru_eviction(self):
+        ttl_cache = TTLCache(maxsize=2)
+        ttl_cache.get_or_load('a', lambda: 1, ttl=60)
+        ttl_cache.get_or_load('b', lambda: 2, ttl=60)
+        ttl_cache.get_or_load('a', lambda: 1, ttl=60)
+        ttl_cache.get_or_load('c', lambda: 3, ttl=60)
+        self.assertEqual(len(ttl_cache), 2)
+        self.assertEqual(ttl_cache.get_or_load('a', lambda: 'reloaded', ttl=60), 1)
+        self.assertEqual(ttl_cache.get_or_load('b', lambda: 'reloaded', ttl=60), 'reloaded')
+
+    def test_concurrent_misses_share_one_load(self):
+        ttl_cache = TTLCache()
+        calls = []
+
+        def slow_loader():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'value'
+
+        threads = [threading.Thread(target=ttl_cache.get_or_load, args=('key', slow_loader, 60)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+
+
+class TestCachedDecorator(unittest.TestCase):
+    def setUp(self):
+        market_data_cache.clear()
+
+    def test_defaults_share_one_entry(self):
+        calls = []
+
+        @cached('subgraph')
+        def fetch(network='arbitrum'):
+            calls.append(network)
+            return network
+
+        self.assertEqual(fetch(), 'arbitrum')
+        self.assertEqual(fetch('arbitrum'), 'arbitrum')
+        self.assertEqual(fetch(network='arbitrum'), 'arbitrum')
+        self.assertEqual(fetch('avalanche'), 'avalanche')
+        self.assertEqual(calls, ['arbitrum', 'avalanche'])
+        self.assertEqual(fetch.uncached('arbitrum'), 'arbitrum')
+
+    def test_ttl_read_per_call(self):
+        calls = []
+
+        @cached('coingecko')
+        def prices():
+            calls.append(1)
+            return len(calls)
+
+        with patch.dict(cache.CACHE_TTLS, {'coingecko': 0}), patch.object(cache, 'STALE_FACTOR', 0):
+            prices()
+            time.sleep(0.01)
+            prices()
+        self.assertEqual(len(calls), 2)
+
+    def test_failed_loads_are_not_cached(self):
+        results = [ValueError('down'), ['good'], ValueError('down'), ValueError('down')]
+
+        @cached('subgraph', errors=(ValueError,), fallback=list)
+        def history():
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        with patch.dict(cache.CACHE_TTLS, {'subgraph': 0.05}):
+            self.assertEqual(history(), [])
+            self.assertEqual(history(), ['good'])
+            time.sleep(0.06)
+            # The failed refresh keeps serving the last good value
+            self.assertEqual(history(), ['good'])
+            time.sleep(0.02)
+            self.assertEqual(history(), ['good'])
+        self.assertEqual(results, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import pandas as pd
+from utils.cost_basis import compute_cost_basis, get_open_lots, transfers_from_transactions
+from utils.monitor import calculate_average_mint_price, calculate_cost_basis
+
+WEI = 10 ** 18
+USER = '0x00000000000000000000000000000000000000aa'
+OTHER = '0x00000000000000000000000000000000000000bb'
+
+
+def transfer(wallet, time_stamp, amount, price):
+    return {'wallet': wallet, 'timeStamp': time_stamp, 'amount': amount, 'price': price}
+
+
+def reference_fifo(rows):
+    """Plain-Python FIFO used to check the vectorized engine."""
+    lots, realized = [], 0.0
+    for row in rows:
+        if row['amount'] > 0:
+            lots.append([row['amount'], row['price']])
+            continue
+        remaining = -row['amount']
+        realized += remaining / WEI * row['price']
+        while remaining and lots:
+            used = min(remaining, lots[0][0])
+            realized -= used / WEI * lots[0][1]
+            lots[0][0] -= used
+            remaining -= used
+            if not lots[0][0]:
+                lots.pop(0)
+    return lots, realized
+
+
+class TestCostBasis(unittest.TestCase):
+    def test_fifo_realized_and_unrealized_pnl(self):
+        transfers = pd.DataFrame([
+            transfer(USER, 1, 10 * WEI, 1.0),
+            transfer(USER, 2, 10 * WEI, 2.0),
+            transfer(USER, 3, -15 * WEI, 3.0),
+        ])
+        result = compute_cost_basis(transfers, current_prices=4.0).loc[USER]
+
+        self.assertEqual(result['balance'], 5 * WEI)
+        self.assertEqual(result['open_amount'], 5 * WEI)
+        self.assertAlmostEqual(result['open_cost'], 10.0)
+        self.assertAlmostEqual(result['average_cost'], 2.0)
+        self.assertAlmostEqual(result['average_entry_price'], 1.5)
+        # 45 USD of proceeds against 10 * 1.0 + 5 * 2.0 of cost
+        self.assertAlmostEqual(result['realized_pnl'], 25.0)
+        self.assertAlmostEqual(result['unrealized_pnl'], 10.0)
+
+    def test_amounts_stay_exact_beyond_int64(self):
+        amount = 10 ** 30 + 1
+        transfers = pd.DataFrame([transfer(USER, 1, amount, 1.0), transfer(USER, 2, -1, 1.0)])
+        result = compute_cost_basis(transfers).loc[USER]
+        self.assertEqual(result['balance'], 10 ** 30)
+        self.assertEqual(result['total_bought'], amount)
+
+    def test_many_wallets_match_reference(self):
+        rows = {USER: [], OTHER: []}
+        for step in range(40):
+            wallet = USER if step % 3 else OTHER
+            amount = (step % 7 + 1) * WEI + step if step % 4 else -(step % 5 + 1) * WEI
+            rows[wallet].append(transfer(wallet, step, amount, 1.0 + step / 10))
+        transfers = pd.DataFrame(rows[USER] + rows[OTHER]).sample(frac=1, random_state=1)
+
+        result = compute_cost_basis(transfers, {USER: 5.0, OTHER: 6.0})
+        lots = get_open_lots(transfers)
+        for wallet, wallet_rows in rows.items():
+            expected_lots, expected_realized = reference_fifo(wallet_rows)
+            wallet_lots = lots[lots['wallet'] == wallet]
+            self.assertEqual([[amount, price] for amount, price in zip(wallet_lots['amount'], wallet_lots['price'])],
+                             expected_lots)
+            self.assertEqual(result.loc[wallet, 'open_amount'], sum(lot[0] for lot in expected_lots))
+            self.assertAlmostEqual(result.loc[wallet, 'realized_pnl'], expected_realized)
+
+    def test_int64_and_exact_paths_agree(self):
+        rows = []
+        for step in range(30):
+            wallet = USER if step % 3 else OTHER
+            amount = (step % 7 + 1) * 1000 + step if step % 4 else -(step % 5 + 1) * 1000
+            rows.append(transfer(wallet, step, amount, 1.0 + step / 10))
+        small = pd.DataFrame(rows)
+        # One huge transfer on a third wallet forces the exact Python-int path
+        large = pd.DataFrame(rows + [transfer('0xcc', 0, 10 ** 30, 1.0)])
+
+        fast = compute_cost_basis(small, 5.0)
+        exact = compute_cost_basis(large, 5.0).drop('0xcc')
+        self.assertEqual(fast['open_amount'].dtype, 'int64')
+        self.assertEqual(exact['open_amount'].dtype, object)
+        pd.testing.assert_frame_equal(fast, exact, check_dtype=False)
+        pd.testing.assert_frame_equal(get_open_lots(small), get_open_lots(large).query("wallet != '0xcc'"),
+                                      check_dtype=False)
+
+    def test_sells_without_lots_have_no_cost(self):
+        transfers = pd.DataFrame([transfer(USER, 1, -2 * WEI, 3.0), transfer(USER, 2, 1 * WEI, 1.0)])
+        result = compute_cost_basis(transfers).loc[USER]
+        self.assertAlmostEqual(result['realized_pnl'], 6.0)
+        self.assertEqual(result['open_amount'], 1 * WEI)
+        self.assertEqual(result['balance'], -1 * WEI)
+
+    def test_transactions_are_signed_and_priced(self):
+        transactions = [
+            {'timeStamp': '100', 'blockNumber': '1', 'from': OTHER, 'to': USER.upper().replace('0X', '0x'), 'value': str(4 * WEI)},
+            {'timeStamp': '250', 'blockNumber': '2', 'from': USER, 'to': OTHER, 'value': str(WEI)},
+        ]
+        history = [(50, 1.0), (200, 2.0)]
+        rows = transfers_from_transactions(transactions, USER, history)
+        self.assertEqual(list(rows['amount']), [4 * WEI, -WEI])
+        self.assertEqual(list(rows['price']), [1.0, 2.0])
+
+        self.assertAlmostEqual(calculate_average_mint_price(transactions, USER, history), 1.0)
+        cost_basis = calculate_cost_basis(transactions, USER, history, current_price=3.0)
+        self.assertAlmostEqual(cost_basis['realized_pnl'], 1.0)
+        self.assertAlmostEqual(cost_basis['unrealized_pnl'], 6.0)
+        self.assertIsNone(calculate_cost_basis([], USER, history))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import patch
+from local_chain import setup_local_web3, deploy_contract
+from utils.event_watcher import TransferWatcher, topic_to_address
+from utils.log_fetcher import LogFetchError
+from utils.monitor import get_batched_glp_balances, refresh_changed_balances
+
+
+class TestTransferWatcher(unittest.TestCase):
+    def setUp(self):
+        self.web3 = setup_local_web3()
+        self.owner = self.web3.eth.accounts[0]
+        self.token = deploy_contract(self.web3, 'GLPStandIn')
+        self.multicall = deploy_contract(self.web3, 'Multicall3')
+        self.users = self.web3.eth.accounts[1:4]
+        self.outsider = self.web3.eth.accounts[5]
+        for user in self.users:
+            self.token.functions.mint(user, 10 ** 18).transact({'from': self.owner})
+
+    def test_topic_to_address(self):
+        topic = '0x' + '00' * 12 + 'ab' * 20
+        self.assertEqual(topic_to_address(topic), '0x' + 'ab' * 20)
+
+    def test_idle_chain_polls_only_the_block_filter(self):
+        watcher = TransferWatcher(self.token, self.users)
+        with patch.object(self.web3.eth, 'get_filter_changes', wraps=self.web3.eth.get_filter_changes) as changes:
+            self.assertEqual(watcher.poll(), (set(), False))
+        self.assertEqual(changes.call_count, 1)
+
+    def test_reports_only_watched_addresses_in_new_transfers(self):
+        watcher = TransferWatcher(self.token, self.users)
+        self.token.functions.transfer(self.outsider, 10 ** 17).transact({'from': self.users[0]})
+        self.token.functions.mint(self.outsider, 10 ** 18).transact({'from': self.owner})
+
+        changed, supply_changed = watcher.poll()
+        self.assertEqual(changed, {self.users[0]})
+        self.assertTrue(supply_changed)
+        self.assertEqual(watcher.poll(), (set(), False))
+
+    def test_refresh_updates_snapshot_in_place(self):
+        watcher = TransferWatcher(self.token, self.users)
+        snapshot = get_batched_glp_balances(self.token, self.users, multicall_address=self.multicall.address)
+        self.token.functions.transfer(self.users[1], 5 * 10 ** 17).transact({'from': self.users[0]})
+
+        with patch.object(self.web3.eth, 'call', wraps=self.web3.eth.call) as eth_call:
+            changed = refresh_changed_balances(watcher, self.token, snapshot, multicall_address=self.multicall.address)
+        self.assertEqual(changed, {self.users[0], self.users[1]})
+        self.assertEqual(eth_call.call_count, 1)
+        self.assertEqual(snapshot['balances'], {self.users[0]: 0.5, self.users[1]: 1.5, self.users[2]: 1})
+        self.assertEqual(snapshot['total_supply'], 3)
+
+    def test_lost_filter_is_reinstalled_and_gap_is_read(self):
+        watcher = TransferWatcher(self.token, self.users)
+        self.token.functions.transfer(self.outsider, 10 ** 17).transact({'from': self.users[2]})
+        self.web3.eth.uninstall_filter(watcher._block_filter.filter_id)
+
+        with self.assertLogs(level='ERROR'):
+            changed, _ = watcher.poll()
+        self.assertEqual(changed, {self.users[2]})
+
+        self.token.functions.transfer(self.outsider, 10 ** 17).transact({'from': self.users[1]})
+        self.assertEqual(watcher.poll(), ({self.users[1]}, False))
+
+    def test_polls_follow_the_head_without_transfers(self):
+        watcher = TransferWatcher(self.token, self.users)
+        self.token.functions.mint(self.outsider, 10 ** 18).transact({'from': self.owner})
+        self.web3.provider.ethereum_tester.mine_blocks(3)
+        self.assertEqual(watcher.poll(), (set(), True))
+        self.assertEqual(watcher.last_block, self.web3.eth.block_number)
+
+    def test_failed_gap_read_is_retried_on_the_next_poll(self):
+        watcher = TransferWatcher(self.token, self.users)
+        start = watcher.last_block
+        self.token.functions.transfer(self.outsider, 10 ** 17).transact({'from': self.users[0]})
+        self.web3.eth.uninstall_filter(watcher._block_filter.filter_id)
+
+        with patch.object(watcher.fetcher, 'get_logs', side_effect=LogFetchError(1, 2, 'node down')):
+            with self.assertRaises(LogFetchError), self.assertLogs(level='ERROR'):
+                watcher.poll()
+        with patch.object(watcher.fetcher, 'get_logs', wraps=watcher.fetcher.get_logs) as get_logs:
+            self.assertEqual(watcher.poll(), ({self.users[0]}, False))
+        self.assertEqual(get_logs.call_args.args[1:], (start + 1, self.web3.eth.block_number))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from utils import explorer
+from utils.explorer import ExplorerError, RateLimiter, iter_contract_logs, iter_token_transfers, pad_address_topic
+from utils.monitor import get_glp_transactions, get_historical_mint_prices_via_api, get_wallet_transfer_histories_via_api
+
+
+class FakeExplorer:
+    """Serves sorted records with page/offset paging and the explorer's result-window cap."""
+
+    def __init__(self, records, result_window, rate_limited=0):
+        self.records = records
+        self.result_window = result_window
+        self.rate_limited = rate_limited
+        self.requests = []
+
+    def __call__(self, url, params=None):
+        self.requests.append(params)
+        response = MagicMock()
+        if self.rate_limited:
+            self.rate_limited -= 1
+            response.json.return_value = {'status': '0', 'message': 'NOTOK', 'result': 'Max rate limit reached'}
+            return response
+
+        start = int(params.get('startblock', params.get('fromBlock')))
+        end = int(params.get('endblock', params.get('toBlock')))
+        page, offset = params['page'], params['offset']
+        if page * offset > self.result_window:
+            response.json.return_value = {'status': '0', 'message': 'NOTOK', 'result': 'Result window is too large'}
+            return response
+
+        matching = [record for record in self.records if start <= explorer.parse_block_number(record['blockNumber']) <= end]
+        result = matching[(page - 1) * offset:page * offset]
+        if result:
+            response.json.return_value = {'status': '1', 'message': 'OK', 'result': result}
+        else:
+            response.json.return_value = {'status': '0', 'message': 'No transactions found', 'result': []}
+        return response
+
+
+class FakeLogExplorer(FakeExplorer):
+    """Applies the topic1/topic2 filters of getLogs requests."""
+
+    def __call__(self, url, params=None):
+        records = self.records
+        self.records = [log for log in records if all(
+            log['topics'][position].lower() == params[f'topic{position}'] for position in (1, 2) if f'topic{position}' in params
+        )]
+        try:
+            return super().__call__(url, params)
+        finally:
+            self.records = records
+
+
+def make_transfer_log(block, sender, receiver, value):
+    return {'blockNumber': hex(block), 'timeStamp': hex(1700000000 + block), 'data': hex(value),
+            'topics': [explorer.TRANSFER_EVENT_TOPIC, pad_address_topic(sender), pad_address_topic(receiver)]}
+
+
+def make_records(blocks):
+    return [{'blockNumber': str(block), 'hash': f'0x{block:x}{i}', 'timeStamp': str(1700000000 + block), 'value': '1'}
+            for block, count in blocks for i in range(count)]
+
+
+class TestExplorer(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(explorer, 'RATE_LIMIT_BACKOFF', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stream(self, fake, **kwargs):
+        with patch.object(explorer, 'http_get', fake), patch.object(explorer, 'MAX_RESULT_WINDOW', fake.result_window):
+            return list(iter_token_transfers('0xglp', '0xuser', 'key', **kwargs))
+
+    def test_pages_through_windows_without_duplicates(self):
+        # Blocks 3 and 7 straddle window boundaries
+        records = make_records([(1, 2), (2, 1), (3, 4), (5, 1), (7, 3), (8, 2), (9, 1)])
+        fake = FakeExplorer(records, result_window=6)
+        streamed = self.stream(fake, page_size=2)
+        self.assertEqual(streamed, records)
+        self.assertTrue(all(params['page'] * params['offset'] <= 6 for params in fake.requests))
+        self.assertEqual(fake.requests[3]['startblock'], 3)
+
+    def test_is_lazy(self):
+        fake = FakeExplorer(make_records([(block, 1) for block in range(100)]), result_window=10000)
+        with patch.object(explorer, 'http_get', fake):
+            stream = iter_token_transfers('0xglp', '0xuser', 'key', page_size=10)
+            self.assertEqual(next(stream)['blockNumber'], '0')
+        self.assertEqual(len(fake.requests), 1)
+
+    def test_oversized_block_is_skipped(self):
+        records = make_records([(1, 1), (2, 5), (3, 1)])
+        fake = FakeExplorer(records, result_window=4)
+        with self.assertLogs(level='ERROR'):
+            streamed = self.stream(fake, page_size=2)
+        # Only the first result window of block 2 can be paged through
+        self.assertEqual([record['blockNumber'] for record in streamed], ['1', '2', '2', '2', '2', '3'])
+
+    def test_rate_limit_is_retried(self):
+        fake = FakeExplorer(make_records([(1, 1)]), result_window=10000, rate_limited=2)
+        self.assertEqual(len(self.stream(fake)), 1)
+        self.assertEqual(len(fake.requests), 3)
+
+    def test_errors_raise(self):
+        fake = FakeExplorer([], result_window=10000)
+        fake.result_window = 0
+        with self.assertRaises(ExplorerError):
+            self.stream(fake)
+        with self.assertRaises(ValueError):
+            list(iter_contract_logs('0xglp', 'key', network='optimism'))
+
+    def test_wallet_transfer_histories(self):
+        alice, bob, carol = '0x' + 'aa' * 20, '0x' + 'Bb' * 20, '0x' + 'cc' * 20
+        logs = [
+            make_transfer_log(1, carol, alice, 10 ** 18),
+            make_transfer_log(2, alice, bob, 2 * 10 ** 18),
+            make_transfer_log(3, carol, carol, 3 * 10 ** 18),
+            make_transfer_log(4, bob, alice, 4 * 10 ** 18),
+        ]
+        expected = {alice: [1, 2, 4], bob: [2, 4]}
+
+        for max_filtered_wallets, requests in ((25, 4), (1, 1)):
+            fake = FakeLogExplorer(logs, result_window=10000)
+            with patch.object(explorer, 'http_get', fake), \
+                    patch.object(explorer, 'SERVER_FILTER_MAX_WALLETS', max_filtered_wallets):
+                histories = get_wallet_transfer_histories_via_api('0xglp', 'key', [alice, bob])
+            self.assertEqual({wallet: [record['blockNumber'] for record in records] for wallet, records in histories.items()},
+                             expected)
+            self.assertEqual(len(fake.requests), requests)
+
+        fake = FakeLogExplorer(logs, result_window=10000)
+        with patch.object(explorer, 'http_get', fake):
+            history = get_historical_mint_prices_via_api('0xglp', 'key', user_address=carol)
+        # The self-transfer is reported once
+        self.assertEqual([record['amount'] for record in history], [1, 3])
+
+    def test_get_glp_transactions_collects_stream(self):
+        fake = FakeExplorer(make_records([(1, 2), (4, 1)]), result_window=10000)
+        with patch.object(explorer, 'http_get', fake):
+            transactions = get_glp_transactions('0xglp', '0xuser', 'key')
+        self.assertEqual(len(transactions), 3)
+        self.assertEqual(transactions[0]['methodId'], 'N/A')
+
+    def test_rate_limiter_spaces_calls(self):
+        limiter = RateLimiter(50)
+        start = time.monotonic()
+        for _ in range(4):
+            limiter.wait()
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import urlsplit
+from utils import http_client
+from utils.http_client import close_sessions, configure_http, connection_stats, http_get, http_post
+from utils.web3_utils import setup_web3
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    failures = 0
+    retry_after = None
+
+    def respond(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        if status != 200 and Handler.retry_after:
+            self.send_header('Retry-After', Handler.retry_after)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if Handler.failures:
+            Handler.failures -= 1
+            self.respond(503, {'error': 'busy'})
+        else:
+            self.respond(200, {'path': self.path})
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        payload = json.loads(self.rfile.read(length))
+        if 'method' in payload:
+            self.respond(200, {'jsonrpc': '2.0', 'id': payload['id'], 'result': '0xa4b1'})
+        else:
+            self.respond(200, payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpClient(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.settings = dict(http_client.HTTP_SETTINGS)
+        close_sessions()
+        configure_http(backoff=0)
+
+    def tearDown(self):
+        close_sessions()
+        http_client.HTTP_SETTINGS.update(self.settings)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        for i in range(3):
+            self.assertEqual(http_get(f'{self.url}/{i}').json(), {'path': f'/{i}'})
+        self.assertEqual(http_post(self.url, json={'query': 'x'}).json(), {'query': 'x'})
+
+        stats = connection_stats()
+        self.assertEqual(stats[self.url], {'requests': 4, 'new_connections': 1, 'reused_connections': 3})
+        self.assertEqual(stats['total']['reused_connections'], 3)
+
+    def test_web3_provider_shares_pool_across_threads(self):
+        web3 = setup_web3(f'{self.url}/rpc')
+        self.assertEqual(web3.eth.chain_id, 42161)
+        thread = threading.Thread(target=lambda: web3.eth.chain_id)
+        thread.start()
+        thread.join()
+        self.assertEqual(connection_stats()[self.url]['new_connections'], 1)
+
+    def test_retries_transient_statuses(self):
+        Handler.failures = 2
+        response = http_get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_gives_up_after_retries(self):
+        configure_http(retries=1)
+        Handler.failures = 5
+        self.assertEqual(http_get(self.url).status_code, 503)
+        Handler.failures = 0
+
+    def test_retries_take_a_token_and_honour_retry_after(self):
+        host = urlsplit(self.url).netloc
+        for patcher in (patch.dict(http_client.HTTP_SETTINGS['rate_limits'], {host: 100}),
+                        patch.dict(http_client._limiters, clear=True), patch.object(Handler, 'retry_after', '1')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        limiter = http_client.get_limiter(self.url)
+        Handler.failures = 1
+
+        started = time.monotonic()
+        with patch.object(limiter, 'acquire', wraps=limiter.acquire) as acquire:
+            self.assertEqual(http_get(self.url).status_code, 200)
+        self.assertEqual(acquire.call_count, 2)
+        self.assertGreaterEqual(time.monotonic() - started, 0.9)
+
+    def test_configure_http_accepts_yaml_lists(self):
+        configure_http(timeout=[1, 2])
+        self.assertEqual(http_client.HTTP_SETTINGS['timeout'], (1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
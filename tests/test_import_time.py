@@ -0,0 +1,34 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time allowed for the CLI entry point; about four times what it takes today
+CLI_IMPORT_BUDGET = 1.0  # seconds
+
+# Modules only needed by specific modes, tabs or tools
+HEAVY_MODULES = ['aiohttp', 'matplotlib', 'pandas', 'pyarrow', 'web3']
+
+
+def run_python(*args):
+    return subprocess.run([sys.executable, *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+
+
+class TestImportTime(unittest.TestCase):
+    def test_cli_import_skips_heavy_modules(self):
+        output = run_python('-c', f"import json, sys, main; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))")
+        self.assertEqual(json.loads(output.stdout), [])
+
+    def test_cli_import_time_budget(self):
+        # -X importtime lines read "import time: self [us] | cumulative | module"
+        output = run_python('-X', 'importtime', '-c', 'import main')
+        cumulative = {line.split('|')[2].strip(): int(line.split('|')[1]) for line in output.stderr.splitlines()
+                      if line.startswith('import time:') and line.split('|')[1].strip().isdigit()}
+        self.assertLess(cumulative['main'] / 1e6, CLI_IMPORT_BUDGET)
+
+
+if __name__ == '__main__':
+    unittest.main()
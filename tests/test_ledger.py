@@ -0,0 +1,122 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from local_chain import setup_local_web3, deploy_contract
+from utils.ledger import BalanceLedger
+
+
+class TestBalanceLedger(unittest.TestCase):
+    def setUp(self):
+        self.web3 = setup_local_web3()
+        self.owner = self.web3.eth.accounts[0]
+        self.token = deploy_contract(self.web3, 'GLPStandIn')
+        self.multicall = deploy_contract(self.web3, 'Multicall3')
+        self.users = self.web3.eth.accounts[1:4]
+        self.outsider = self.web3.eth.accounts[5]
+        for user in self.users:
+            self.token.functions.mint(user, 10 ** 18).transact({'from': self.owner})
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'arbitrum.json')
+
+    def ledger(self, **kwargs):
+        return BalanceLedger(self.token, self.users, self.path, **kwargs)
+
+    def test_first_sync_seeds_every_balance(self):
+        ledger = self.ledger()
+        self.assertEqual(ledger.sync(multicall_address=self.multicall.address), set(self.users))
+        self.assertEqual(ledger.snapshot(), {'total_supply': 3, 'balances': {user: 1 for user in self.users}, 'errors': {}})
+
+    def test_sync_applies_transfer_deltas_without_reading_balances(self):
+        ledger = self.ledger()
+        ledger.sync(multicall_address=self.multicall.address)
+        self.token.functions.transfer(self.outsider, 10 ** 17).transact({'from': self.users[0]})
+        self.token.functions.transfer(self.users[1], 2 * 10 ** 17).transact({'from': self.users[2]})
+        self.token.functions.mint(self.outsider, 10 ** 18).transact({'from': self.owner})
+
+        with patch.object(self.web3.eth, 'call', wraps=self.web3.eth.call) as eth_call:
+            changed = ledger.sync(multicall_address=self.multicall.address)
+        self.assertEqual(eth_call.call_count, 0)
+        self.assertEqual(changed, set(self.users))
+        self.assertEqual(ledger.balances[self.users[0].lower()], 9 * 10 ** 17)
+        self.assertEqual(ledger.balances[self.users[1].lower()], 12 * 10 ** 17)
+        self.assertEqual(ledger.total_supply, 4 * 10 ** 18)
+        self.assertEqual(ledger.sync(multicall_address=self.multicall.address), set())
+
+    def test_restart_resumes_from_the_persisted_block(self):
+        self.ledger().sync(multicall_address=self.multicall.address)
+        self.token.functions.transfer(self.outsider, 10 ** 17).transact({'from': self.users[0]})
+
+        ledger = self.ledger()
+        with patch.object(self.web3.eth, 'call', wraps=self.web3.eth.call) as eth_call:
+            self.assertEqual(ledger.sync(multicall_address=self.multicall.address), {self.users[0]})
+        self.assertEqual(eth_call.call_count, 0)
+        self.assertEqual(ledger.balances[self.users[0].lower()], 9 * 10 ** 17)
+
+    def test_quiet_syncs_persist_the_synced_block(self):
+        self.ledger().sync(multicall_address=self.multicall.address)
+        self.token.functions.mint(self.outsider, 10 ** 18).transact({'from': self.owner})
+        self.assertEqual(self.ledger(save_interval=0).sync(multicall_address=self.multicall.address), set())
+        self.assertEqual(self.ledger().last_block, self.web3.eth.block_number)
+
+    def test_deltas_are_written_once_per_save_interval(self):
+        ledger = self.ledger()
+        ledger.sync(multicall_address=self.multicall.address)
+        seeded_block = ledger.last_block
+        self.token.functions.transfer(self.outsider, 10 ** 17).transact({'from': self.users[0]})
+
+        with patch.object(ledger, 'save', wraps=ledger.save) as save:
+            ledger.sync(multicall_address=self.multicall.address)
+            save.assert_not_called()
+            self.assertEqual(self.ledger().last_block, seeded_block)
+
+            ledger.flush()
+            ledger.flush()
+        self.assertEqual(save.call_count, 1)
+        self.assertEqual(self.ledger().balances[self.users[0].lower()], 9 * 10 ** 17)
+
+    def test_failed_supply_read_is_retried_not_stored(self):
+        ledger = self.ledger()
+        read_balances = ledger.read_balances
+
+        def failing_supply(*args, **kwargs):
+            _, balances, errors = read_balances(*args, **kwargs)
+            return None, balances, dict(errors, totalSupply='execution reverted')
+
+        with patch.object(ledger, 'read_balances', failing_supply), self.assertLogs(level='ERROR'):
+            ledger.sync(multicall_address=self.multicall.address)
+        self.assertIsNone(ledger.total_supply)
+        self.assertEqual(ledger.snapshot()['errors'], {'totalSupply': 'execution reverted'})
+        self.assertIsNone(self.ledger().total_supply)
+
+        self.assertEqual(ledger.sync(multicall_address=self.multicall.address), set())
+        self.assertEqual(ledger.total_supply, 3 * 10 ** 18)
+        self.assertEqual(ledger.snapshot()['errors'], {})
+
+    def test_added_addresses_are_seeded_at_the_head(self):
+        self.ledger().sync(multicall_address=self.multicall.address)
+        self.token.functions.mint(self.outsider, 10 ** 18).transact({'from': self.owner})
+        self.token.functions.transfer(self.outsider, 10 ** 17).transact({'from': self.users[0]})
+
+        ledger = BalanceLedger(self.token, self.users + [self.outsider], self.path)
+        with patch.object(ledger, 'read_balances', wraps=ledger.read_balances) as read_balances:
+            self.assertEqual(ledger.sync(multicall_address=self.multicall.address), {self.users[0], self.outsider})
+        self.assertEqual(read_balances.call_args.args[:2], ([self.outsider.lower()], self.web3.eth.block_number))
+        self.assertEqual(ledger.balances[self.outsider.lower()], 11 * 10 ** 17)
+        self.assertEqual(ledger.balances[self.users[0].lower()], 9 * 10 ** 17)
+
+    def test_drift_check_repairs_sampled_balances(self):
+        ledger = self.ledger()
+        ledger.sync(multicall_address=self.multicall.address)
+        ledger.balances[self.users[2].lower()] = 5
+
+        with self.assertLogs(level='WARNING'):
+            drifted = ledger.check_drift(sample_size=len(self.users), multicall_address=self.multicall.address)
+        self.assertEqual(drifted, {self.users[2]})
+        self.assertEqual(ledger.balances[self.users[2].lower()], 10 ** 18)
+        self.assertEqual(ledger.check_drift(sample_size=len(self.users), multicall_address=self.multicall.address), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+from utils.log_fetcher import LogFetchError, LogRangeFetcher, is_range_error
+
+
+class FakeEth:
+    """Serves one log per block and rejects queries wider than ``max_range`` blocks."""
+
+    def __init__(self, max_range=None, failures=0):
+        self.max_range = max_range
+        self.failures = failures
+        self.ranges = []
+        self.lock = threading.Lock()
+
+    def get_logs(self, params):
+        from_block, to_block = params['fromBlock'], params['toBlock']
+        with self.lock:
+            self.ranges.append((from_block, to_block))
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError('connection reset by peer')
+        if self.max_range is not None and to_block - from_block + 1 > self.max_range:
+            raise ValueError({'code': -32005, 'message': 'query returned more than 10000 results'})
+        return [{'blockNumber': block, 'logIndex': 0} for block in reversed(range(from_block, to_block + 1))]
+
+
+def make_fetcher(eth, **kwargs):
+    web3 = MagicMock()
+    web3.eth = eth
+    return LogRangeFetcher(web3, backoff=0, **kwargs)
+
+
+class TestLogRangeFetcher(unittest.TestCase):
+    def test_is_range_error(self):
+        self.assertTrue(is_range_error(ValueError({'code': -32005, 'message': 'query returned more than 10000 results'})))
+        self.assertTrue(is_range_error(ValueError('eth_getLogs block range is too large')))
+        self.assertTrue(is_range_error(ValueError('Log response size exceeded.')))
+        self.assertFalse(is_range_error(ConnectionError('connection reset')))
+        # Rate limits share code -32005 and "limit exceeded" with range errors
+        self.assertFalse(is_range_error(ValueError({'code': -32005, 'message': 'limit exceeded'})))
+        self.assertFalse(is_range_error(ValueError('daily request limit exceeded')))
+        self.assertFalse(is_range_error(ValueError({'code': -32005, 'message': 'rate limit exceeded'})))
+
+    def test_rate_limits_back_off_without_shrinking(self):
+        eth = FakeEth()
+        calls = []
+        get_logs = eth.get_logs
+
+        def limited(params):
+            calls.append((params['fromBlock'], params['toBlock']))
+            if len(calls) <= 2:
+                raise ValueError({'code': -32005, 'message': 'rate limit exceeded'})
+            return get_logs(params)
+
+        eth.get_logs = limited
+        fetcher = make_fetcher(eth, initial_step=100, retries=2)
+        self.assertEqual(len(fetcher.fetch_range({}, 0, 99)), 100)
+        self.assertEqual(calls, [(0, 99)] * 3)
+
+    def test_shrinks_on_range_error(self):
+        eth = FakeEth(max_range=100)
+        fetcher = make_fetcher(eth, initial_step=1000, target_logs=10 ** 6)
+        logs = fetcher.fetch_range({}, 0, 999)
+        self.assertEqual([log['blockNumber'] for log in logs], list(range(1000)))
+        # 1000 -> 500 -> 250 -> 125 are rejected, then the window stays capped at 62 blocks
+        self.assertEqual(len(eth.ranges), 4 + 17)
+        self.assertTrue(all(end - start + 1 <= 62 for start, end in eth.ranges[4:]))
+
+    def test_grows_on_sparse_ranges(self):
+        eth = FakeEth()
+        fetcher = make_fetcher(eth, initial_step=10, target_logs=10 ** 6, max_step=80)
+        fetcher.fetch_range({}, 0, 309)
+        self.assertEqual([end - start + 1 for start, end in eth.ranges], [10, 20, 40, 80, 80, 80])
+
+    def test_shrinks_on_dense_ranges(self):
+        eth = FakeEth()
+        fetcher = make_fetcher(eth, initial_step=64, target_logs=10)
+        fetcher.fetch_range({}, 0, 99)
+        self.assertEqual([end - start + 1 for start, end in eth.ranges][:3], [64, 32, 4])
+
+    def test_parallel_segments_in_order(self):
+        eth = FakeEth()
+        fetcher = make_fetcher(eth, initial_step=7, segment_size=50, workers=4)
+        segments = list(fetcher.iter_logs({}, 0, 449))
+        self.assertEqual([end for end, _ in segments], list(range(49, 450, 50)))
+        logs = [log['blockNumber'] for _, segment_logs in segments for log in segment_logs]
+        self.assertEqual(logs, list(range(450)))
+
+    def test_retries_transient_errors(self):
+        eth = FakeEth(failures=2)
+        fetcher = make_fetcher(eth, initial_step=100, retries=2)
+        self.assertEqual(len(fetcher.get_logs({}, 0, 99)), 100)
+
+    def test_raises_after_retries(self):
+        eth = FakeEth(failures=10)
+        fetcher = make_fetcher(eth, initial_step=100, retries=1)
+        with self.assertRaises(LogFetchError) as context:
+            fetcher.get_logs({}, 0, 99)
+        self.assertEqual((context.exception.from_block, context.exception.to_block), (0, 99))
+
+    def test_range_error_at_min_step_is_fatal(self):
+        eth = FakeEth(max_range=0)
+        fetcher = make_fetcher(eth, initial_step=4, min_step=1)
+        with self.assertRaises(LogFetchError):
+            fetcher.fetch_range({}, 0, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
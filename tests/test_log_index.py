@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import patch
+from local_chain import setup_local_web3, deploy_contract
+from utils.log_index import MintLogIndex
+from utils.monitor import calculate_prices, get_historical_mint_prices, sync_mint_index
+
+
+def make_event(block_number, log_index, price):
+    return {
+        'blockNumber': block_number,
+        'logIndex': log_index,
+        'transactionHash': f'0x{block_number:064x}',
+        'amount': int(price * 10 ** 18),
+        'price': price
+    }
+
+
+class TestMintLogIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = MintLogIndex(':memory:')
+
+    def tearDown(self):
+        self.index.close()
+
+    def test_checkpoint_and_history(self):
+        self.assertIsNone(self.index.get_checkpoint(1, '0xAbC'))
+        self.index.add_events(1, '0xAbC', [make_event(10, 0, 1.0), make_event(5, 0, 3.0)], 20)
+        self.assertEqual(self.index.get_checkpoint(1, '0xabc'), 20)
+        self.assertEqual(self.index.get_prices(1, '0xabc'), [3.0, 1.0])
+        self.assertEqual(self.index.get_prices(1, '0xabc', from_block=6), [1.0])
+        self.assertEqual(self.index.get_average_price(1, '0xabc'), 2.0)
+        self.assertIsNone(self.index.get_average_price(2, '0xabc'))
+
+    def test_add_events_is_idempotent_and_checkpoint_monotonic(self):
+        self.index.add_events(1, '0xabc', [make_event(10, 0, 1.0)], 20)
+        self.index.add_events(1, '0xabc', [make_event(10, 0, 1.0)], 15)
+        self.assertEqual(self.index.get_prices(1, '0xabc'), [1.0])
+        self.assertEqual(self.index.get_checkpoint(1, '0xabc'), 20)
+
+
+class TestMintIndexSync(unittest.TestCase):
+    def setUp(self):
+        self.web3 = setup_local_web3()
+        self.token = deploy_contract(self.web3, 'GLPStandIn')
+        self.index = MintLogIndex(':memory:')
+
+    def tearDown(self):
+        self.index.close()
+
+    def mint(self, amount):
+        self.token.functions.mint(self.web3.eth.accounts[1], amount * 10 ** 18).transact({'from': self.web3.eth.accounts[0]})
+
+    def test_without_index(self):
+        self.mint(1)
+        self.mint(2)
+        self.assertEqual(get_historical_mint_prices(self.web3, self.token, step=1), [1, 2])
+
+    def test_sync_only_fetches_new_blocks(self):
+        self.mint(1)
+        self.mint(3)
+        self.assertEqual(get_historical_mint_prices(self.web3, self.token, index=self.index), [1, 3])
+        checkpoint = self.index.get_checkpoint(self.web3.eth.chain_id, self.token.address)
+        self.assertEqual(checkpoint, self.web3.eth.block_number)
+
+        self.mint(5)
+        with patch.object(self.web3.eth, 'get_logs', wraps=self.web3.eth.get_logs) as get_logs:
+            prices = get_historical_mint_prices(self.web3, self.token, index=self.index)
+        self.assertEqual(prices, [1, 3, 5])
+        self.assertEqual(get_logs.call_count, 1)
+        self.assertEqual(get_logs.call_args[0][0]['fromBlock'], checkpoint + 1)
+
+    def test_failed_batch_keeps_checkpoint(self):
+        self.mint(1)
+        self.mint(2)
+        with patch.object(self.web3.eth, 'get_logs', side_effect=ValueError('query returned more than 10000 results')):
+            sync_mint_index(self.web3, self.token, self.index)
+        self.assertIsNone(self.index.get_checkpoint(self.web3.eth.chain_id, self.token.address))
+
+    def test_calculate_prices_from_index(self):
+        self.mint(1)
+        self.mint(3)
+        self.assertEqual(calculate_prices(self.web3, self.token, index=self.index), (2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
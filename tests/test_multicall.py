@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import patch
+from local_chain import setup_local_web3, deploy_contract
+from utils.monitor import get_batched_glp_balances
+from utils.multicall import aggregate, chunked
+
+
+class TestMulticall(unittest.TestCase):
+    def setUp(self):
+        self.web3 = setup_local_web3()
+        self.token = deploy_contract(self.web3, 'GLPStandIn')
+        self.multicall = deploy_contract(self.web3, 'Multicall3')
+        self.users = self.web3.eth.accounts[1:6]
+        for i, user in enumerate(self.users):
+            self.token.functions.mint(user, (i + 1) * 10 ** 18).transact({'from': self.web3.eth.accounts[0]})
+
+    def test_chunked(self):
+        self.assertEqual(list(chunked([1, 2, 3, 4, 5], 2)), [[1, 2], [3, 4], [5]])
+        with self.assertRaises(ValueError):
+            list(chunked([1], 0))
+
+    def test_batched_balances(self):
+        snapshot = get_batched_glp_balances(self.token, self.users, batch_size=2, multicall_address=self.multicall.address)
+        self.assertEqual(snapshot['total_supply'], 15)
+        self.assertEqual(snapshot['balances'], {user: i + 1 for i, user in enumerate(self.users)})
+        self.assertEqual(snapshot['errors'], {})
+
+    def test_batch_size_controls_request_count(self):
+        with patch.object(self.web3.eth, 'call', wraps=self.web3.eth.call) as eth_call:
+            get_batched_glp_balances(self.token, self.users, batch_size=2, multicall_address=self.multicall.address)
+        # totalSupply + 5 balances = 6 calls in batches of 2
+        self.assertEqual(eth_call.call_count, 3)
+
+    def test_failing_sub_call_reports_own_error(self):
+        eoa = self.web3.eth.accounts[0]
+        calls = [
+            (self.token.address, self.token.encode_abi('totalSupply')),
+            (self.token.address, b'\xde\xad\xbe\xef'),
+            (eoa, self.token.encode_abi('totalSupply'))
+        ]
+        results = aggregate(self.web3, calls, multicall_address=self.multicall.address)
+        self.assertTrue(results[0][0])
+        self.assertEqual(results[1][0], False)
+        self.assertIn('reverted', results[1][1])
+        # Calls to an address without code succeed with empty data
+        self.assertEqual(results[2], (True, b''))
+
+    def test_invalid_address_reports_own_error(self):
+        snapshot = get_batched_glp_balances(self.token, [self.users[0], 'not-an-address'], multicall_address=self.multicall.address)
+        self.assertEqual(snapshot['balances'][self.users[0]], 1)
+        self.assertEqual(snapshot['balances']['not-an-address'], 0)
+        self.assertIn('not-an-address', snapshot['errors'])
+
+    def test_failed_batch_marks_every_call(self):
+        results = aggregate(self.web3, [(self.token.address, b'')] * 3, multicall_address=self.web3.eth.accounts[0])
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(not success for success, _ in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
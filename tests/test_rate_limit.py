@@ -0,0 +1,81 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from urllib.parse import urlsplit
+from benchmarks.stand_in import StandInServer
+from utils import http_client
+from utils.http_client import HTTP_SETTINGS, http_get
+from utils.rate_limit import PRIORITY_BACKFILL, PRIORITY_INTERACTIVE, PriorityTokenBucket, request_priority
+
+
+class TestPriorityTokenBucket(unittest.TestCase):
+    def test_sustained_rate(self):
+        limiter = PriorityTokenBucket(50, burst=1)
+        started = time.monotonic()
+        for _ in range(10):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.17)
+
+    def test_interactive_requests_skip_the_backlog(self):
+        limiter = PriorityTokenBucket(10, burst=1)
+        limiter.acquire()
+        admitted = []
+
+        def acquire(name, priority):
+            with request_priority(priority):
+                limiter.acquire()
+            admitted.append(name)
+
+        threads = [threading.Thread(target=acquire, args=(f'backfill-{i}', PRIORITY_BACKFILL)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        while limiter.queued() < 3:
+            time.sleep(0.005)
+        threads.append(threading.Thread(target=acquire, args=('interactive', PRIORITY_INTERACTIVE)))
+        threads[-1].start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(admitted[0], 'interactive')
+        self.assertEqual(sorted(admitted[1:]), ['backfill-0', 'backfill-1', 'backfill-2'])
+
+
+    def test_pause_holds_back_every_request(self):
+        limiter = PriorityTokenBucket(1000)
+        limiter.pause(0.2)
+        started = time.monotonic()
+        limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+
+
+class TestHostRateLimit(unittest.TestCase):
+    def setUp(self):
+        self.stand_in = StandInServer(latency={'coingecko': 0.2}, rate_limits={'coingecko': 5}).start()
+        self.addCleanup(self.stand_in.stop)
+        self.url = self.stand_in.url('coingecko') + '/api/v3/simple/price'
+        for patcher in (patch.dict(HTTP_SETTINGS['rate_limits'], {urlsplit(self.url).netloc: 5}),
+                        patch.dict(http_client._limiters, clear=True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_identical_concurrent_requests_are_sent_once(self):
+        responses = []
+        threads = [threading.Thread(target=lambda: responses.append(http_get(self.url, params={'ids': 'ethereum'})))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual([response.json() for response in responses], [{'ethereum': {'usd': 3000.0}}] * 5)
+        self.assertEqual(self.stand_in.counts()['coingecko'], 1)
+
+    def test_throttled_host_is_never_rate_limited_upstream(self):
+        for token in range(8):
+            self.assertEqual(http_get(self.url, params={'ids': f'token-{token}'}).status_code, 200)
+        self.assertEqual(self.stand_in.counts().get('throttled:coingecko', 0), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
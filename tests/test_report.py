@@ -0,0 +1,110 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+import utils.monitor as monitor
+from benchmarks.run import _glp_contracts, configure_endpoints
+from benchmarks.stand_in import StandInServer, balance_of, wallet
+from utils.cache import market_data_cache
+from utils.constants import SUBGRAPH_URLS
+from utils.explorer import EXPLORER_URLS
+from utils.report import iter_chunks, read_addresses, run_report
+
+
+class TestReadAddresses(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as address_file:
+            address_file.write(text)
+        return path
+
+    def test_newline_file_skips_comments_and_invalid_lines(self):
+        path = self.write('wallets.txt', f"# watchlist\n{wallet(1).lower()}\n\nnot-an-address\n{wallet(2)}\n")
+        with self.assertLogs(level='ERROR'):
+            self.assertEqual(list(read_addresses(path)), [wallet(1), wallet(2)])
+
+    def test_csv_reads_the_address_column(self):
+        path = self.write('wallets.csv', f"label,address\nfirst,{wallet(1)}\nsecond,{wallet(2)}\n")
+        self.assertEqual(list(read_addresses(path)), [wallet(1), wallet(2)])
+
+    def test_csv_without_header_reads_the_first_column(self):
+        path = self.write('wallets.csv', f"{wallet(1)},first\n{wallet(2)},second\n")
+        self.assertEqual(list(read_addresses(path)), [wallet(1), wallet(2)])
+
+    def test_chunks_are_read_lazily(self):
+        self.assertEqual(list(iter_chunks(iter(range(5)), 2)), [[0, 1], [2, 3], [4]])
+
+
+class TestRunReport(unittest.TestCase):
+    def setUp(self):
+        self.stand_in = StandInServer().start()
+        self.addCleanup(self.stand_in.stop)
+        for patcher in (patch.dict(SUBGRAPH_URLS), patch.dict(EXPLORER_URLS),
+                        patch.object(monitor, 'COINGECKO_API_URL', monitor.COINGECKO_API_URL)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        configure_endpoints(self.stand_in)
+        market_data_cache.clear()
+        self.addCleanup(market_data_cache.clear)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.users = [wallet(number) for number in range(6)]
+        self.addresses_path = os.path.join(self.directory, 'wallets.txt')
+        with open(self.addresses_path, 'w') as address_file:
+            address_file.write('\n'.join(self.users) + '\n')
+        self.contracts = _glp_contracts(self.stand_in)
+
+    def report(self, name, **kwargs):
+        path = os.path.join(self.directory, name)
+        rows = run_report(self.contracts, self.addresses_path, path, api_key='', **kwargs)
+        self.assertEqual(rows, len(self.users) * len(self.contracts))
+        return path
+
+    def test_csv_report_values_every_wallet_on_every_chain(self):
+        with open(self.report('report.csv', chunk_size=4)) as report_file:
+            rows = list(csv.DictReader(report_file))
+
+        self.assertEqual([(row['address'], row['network']) for row in rows[:2]],
+                         [(self.users[0], 'arbitrum'), (self.users[0], 'avalanche')])
+        first = rows[0]
+        balance = balance_of(self.users[0]) / 10 ** 18
+        self.assertAlmostEqual(float(first['balance']), balance)
+        price = float(first['value']) / balance
+        self.assertGreater(price, 0)
+        self.assertAlmostEqual(sum(json.loads(first['exposure']).values()), balance * sum(
+            monitor.calculate_wallet_exposure(1.0, 'arbitrum').values()))
+        self.assertTrue(all(row['realized_pnl'] != '' for row in rows))
+        self.assertTrue(all(row['error'] == '' for row in rows))
+
+    def test_transfer_logs_are_scanned_once_whatever_the_chunking(self):
+        self.report('small_chunks.ndjson', chunk_size=1)
+        small_chunks = self.stand_in.counts()['explorer']
+        self.stand_in.reset_counts()
+        self.report('one_chunk.ndjson', chunk_size=len(self.users))
+        self.assertEqual(self.stand_in.counts()['explorer'], small_chunks)
+
+        small = pd.read_json(os.path.join(self.directory, 'small_chunks.ndjson'), lines=True)
+        whole = pd.read_json(os.path.join(self.directory, 'one_chunk.ndjson'), lines=True)
+        pd.testing.assert_frame_equal(small, whole)
+
+    def test_parquet_report_without_pnl_skips_the_explorer(self):
+        frame = pd.read_parquet(self.report('report.parquet', pnl=False, chunk_size=4))
+        self.assertEqual(len(frame), len(self.users) * 2)
+        self.assertTrue(frame['realized_pnl'].isna().all())
+        self.assertNotIn('explorer', self.stand_in.counts())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import time
+import unittest
+from unittest.mock import Mock, patch
+from benchmarks.stand_in import HEAD_BLOCK, StandInServer
+from utils.http_client import HTTP_SETTINGS
+from utils.rate_limit import PRIORITY_BACKFILL, current_priority, request_priority
+from utils.rpc_pool import EndpointPool
+from utils.web3_utils import is_endpoint_error, setup_async_web3, setup_web3
+
+
+class FakeNodes:
+    """Answer JSON-RPC requests by URL; URLs in ``limited`` answer with a -32005 rate-limit error."""
+
+    def __init__(self):
+        self.limited = set()
+        self.requests = []
+
+    def __call__(self, url, data=None, **kwargs):
+        request = json.loads(data)
+        self.requests.append((url, request['method']))
+        body = {'jsonrpc': '2.0', 'id': request['id']}
+        if url in self.limited:
+            body['error'] = {'code': -32005, 'message': 'daily request count exceeded, request rate limited'}
+        elif request['method'] == 'eth_newBlockFilter':
+            body['result'] = '0x1'
+        elif request['method'] == 'eth_getFilterChanges':
+            body['result'] = []
+        else:
+            body['result'] = '0x10'
+        return Mock(content=json.dumps(body).encode(), raise_for_status=lambda: None)
+
+    def urls(self, method):
+        return [url for url, requested in self.requests if requested == method]
+
+
+class TestEndpointPool(unittest.TestCase):
+    def setUp(self):
+        # Fail fast on refused connections instead of retrying them
+        patcher = patch.dict(HTTP_SETTINGS, retries=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stand_in(self, latency=0.0):
+        stand_in = StandInServer(latency={'rpc': latency}).start()
+        self.addCleanup(stand_in.stop)
+        return stand_in
+
+    def test_hedged_request_is_answered_by_the_faster_endpoint(self):
+        slow, fast = self.stand_in(latency=1.0), self.stand_in()
+        web3 = setup_web3([slow.url('rpc', 'arbitrum'), fast.url('rpc', 'arbitrum')], min_hedge_delay=0.05, max_hedge_delay=0.05)
+
+        started = time.perf_counter()
+        self.assertEqual(web3.eth.block_number, HEAD_BLOCK)
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(web3.provider.pool.hedged, 1)
+        self.assertEqual(fast.counts()['rpc:eth_blockNumber'], 1)
+
+    def test_unhealthy_endpoint_leaves_the_rotation(self):
+        dead, live = self.stand_in(), self.stand_in()
+        dead_url = dead.url('rpc', 'arbitrum')
+        dead.stop()
+        web3 = setup_web3([dead_url, live.url('rpc', 'arbitrum')], max_failures=1, cooldown=60)
+
+        with self.assertLogs(level='ERROR'):
+            self.assertEqual(web3.eth.block_number, HEAD_BLOCK)
+        self.assertEqual([endpoint['healthy'] for endpoint in web3.provider.pool.stats()], [False, True])
+
+        for _ in range(3):
+            self.assertEqual(web3.eth.block_number, HEAD_BLOCK)
+        self.assertEqual(web3.provider.pool.stats()[0]['requests'], 1)
+        self.assertEqual(live.counts()['rpc:eth_blockNumber'], 4)
+
+    def test_async_clients_share_the_failover_pool(self):
+        dead, live = self.stand_in(), self.stand_in()
+        dead_url = dead.url('rpc', 'arbitrum')
+        dead.stop()
+        web3 = setup_async_web3([dead_url, live.url('rpc', 'arbitrum')], max_failures=1, cooldown=60)
+
+        async def read():
+            return await web3.eth.block_number
+
+        with self.assertLogs(level='ERROR'):
+            self.assertEqual(asyncio.run(read()), HEAD_BLOCK)
+        self.assertEqual([endpoint['healthy'] for endpoint in web3.provider.provider.pool.stats()], [False, True])
+
+    def test_async_requests_keep_the_caller_priority(self):
+        nodes = FakeNodes()
+        priorities = []
+
+        def send(url, data=None, **kwargs):
+            priorities.append(current_priority())
+            return nodes(url, data, **kwargs)
+
+        async def read():
+            with request_priority(PRIORITY_BACKFILL):
+                return await setup_async_web3('http://a').eth.block_number
+
+        with patch('utils.web3_utils.http_post', send):
+            self.assertEqual(asyncio.run(read()), 16)
+        self.assertEqual(priorities, [PRIORITY_BACKFILL])
+
+    def fake_web3(self, **pool_options):
+        nodes = FakeNodes()
+        patcher = patch('utils.web3_utils.http_post', nodes)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return nodes, setup_web3(['http://a', 'http://b'], **pool_options)
+
+    def test_filter_calls_stick_to_one_endpoint_without_hedging(self):
+        nodes, web3 = self.fake_web3(min_hedge_delay=0, max_hedge_delay=0)
+        block_filter = web3.eth.filter('latest')
+        for _ in range(5):
+            self.assertEqual(web3.eth.get_filter_changes(block_filter.filter_id), [])
+
+        self.assertEqual(nodes.urls('eth_newBlockFilter'), ['http://a'])
+        self.assertEqual(nodes.urls('eth_getFilterChanges'), ['http://a'] * 5)
+        self.assertEqual(web3.provider.pool.hedged, 0)
+
+    def test_failed_filter_call_moves_the_pin(self):
+        nodes, web3 = self.fake_web3(max_failures=1, cooldown=60)
+        block_filter = web3.eth.filter('latest')
+        nodes.limited.add('http://a')
+
+        with self.assertLogs(level='ERROR'), self.assertRaises(ValueError):
+            web3.eth.get_filter_changes(block_filter.filter_id)
+        web3.eth.filter('latest')
+        self.assertEqual(nodes.urls('eth_newBlockFilter'), ['http://a', 'http://b'])
+
+    def test_rate_limit_errors_count_as_failures(self):
+        nodes, web3 = self.fake_web3(max_failures=2, cooldown=60, min_hedge_delay=1, max_hedge_delay=1)
+        nodes.limited.add('http://a')
+
+        with self.assertLogs(level='ERROR'):
+            for _ in range(3):
+                self.assertEqual(web3.eth.block_number, 16)
+        self.assertEqual([endpoint['healthy'] for endpoint in web3.provider.pool.stats()], [False, True])
+        self.assertEqual(nodes.urls('eth_blockNumber').count('http://a'), 2)
+
+        nodes.limited.add('http://b')
+        with self.assertRaises(ValueError) as raised, self.assertLogs(level='ERROR'):
+            web3.eth.block_number
+        self.assertIn('rate limited', str(raised.exception))
+
+    def test_rate_limits_are_endpoint_errors_and_range_errors_are_not(self):
+        self.assertTrue(is_endpoint_error({'code': -32005, 'message': 'limit exceeded'}))
+        self.assertTrue(is_endpoint_error({'code': 429, 'message': 'daily request limit exceeded'}))
+        self.assertFalse(is_endpoint_error({'code': -32005, 'message': 'query returned more than 10000 results'}))
+
+    def test_every_endpoint_failing_raises_the_last_error(self):
+        pool = EndpointPool(['a', 'b'], max_failures=5)
+
+        def send(url):
+            raise ConnectionError(url)
+
+        with self.assertRaises(ConnectionError) as raised:
+            pool.request(send)
+        self.assertEqual(str(raised.exception), 'b')
+        self.assertEqual([endpoint['errors'] for endpoint in pool.stats()], [1, 1])
+
+    def test_hedged_requests_keep_the_caller_priority(self):
+        pool = EndpointPool(['slow', 'fast'], min_hedge_delay=0.01, max_hedge_delay=0.01)
+        priorities = {}
+
+        def send(url):
+            priorities[url] = current_priority()
+            if url == 'slow':
+                time.sleep(0.2)
+            return url
+
+        with request_priority(PRIORITY_BACKFILL):
+            self.assertEqual(pool.request(send), 'fast')
+        self.assertEqual(priorities, {'slow': PRIORITY_BACKFILL, 'fast': PRIORITY_BACKFILL})
+
+    def test_hedge_delay_follows_recent_latencies(self):
+        pool = EndpointPool(['a'], min_hedge_delay=0.01, max_hedge_delay=1.0, hedge_quantile=0.9)
+        for latency in range(1, 11):
+            pool._latencies.append(latency / 100)
+        self.assertAlmostEqual(pool.hedge_delay(), 0.10)
+        pool._latencies.extend([5.0] * 10)
+        self.assertEqual(pool.hedge_delay(), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest.mock import patch
+import utils.monitor as monitor
+from utils.metrics import REGISTRY
+from utils.scheduler import ShardedScheduler
+
+TIERS = [
+    {'name': 'large', 'min_balance': 10, 'interval': 10},
+    {'name': 'small', 'min_balance': 0, 'interval': 100},
+]
+
+BALANCES = {'0xa0': 50, '0xa1': 20, '0xa2': 1, '0xa3': 1, '0xa4': 1}
+
+
+def read_balances(user_addresses):
+    return {address: BALANCES[address] for address in user_addresses}
+
+
+def read_balances_with_sizes(user_addresses):
+    return read_balances(user_addresses), len(user_addresses)
+
+
+class TestShardedScheduler(unittest.TestCase):
+    def run_until_idle(self, scheduler, now):
+        finished = scheduler.tick(now)
+        while scheduler._in_flight:
+            scheduler.wait(1)
+            finished += scheduler.tick(now)
+        return finished
+
+    def make_scheduler(self, refresh=read_balances, executor=None, **kwargs):
+        executor = executor or ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(executor.shutdown)
+        return ShardedScheduler(refresh, list(BALANCES), tiers=TIERS, shard_size=2, executor=executor, **kwargs)
+
+    def test_balances_move_addresses_between_tiers(self):
+        scheduler = self.make_scheduler()
+        start = time.time()
+        self.assertEqual(self.run_until_idle(scheduler, start), 3)
+
+        stats = scheduler.shard_stats()
+        self.assertEqual({key: value['size'] for key, value in stats.items()},
+                         {('large', 0): 2, ('small', 0): 2, ('small', 1): 1})
+        self.assertEqual(scheduler.shards[('large', 0)].user_addresses, ['0xa0', '0xa1'])
+        # Only the new large shard falls due after one large interval
+        self.assertEqual(self.run_until_idle(scheduler, start + 11), 1)
+        self.assertEqual(self.run_until_idle(scheduler, start + 12), 0)
+
+    def test_recent_activity_promotes_to_first_tier(self):
+        balances = dict(BALANCES)
+
+        def refresh(user_addresses):
+            return {address: balances[address] for address in user_addresses}
+
+        scheduler = self.make_scheduler(refresh)
+        start = time.time()
+        self.run_until_idle(scheduler, start)
+        balances['0xa4'] = 2
+        self.run_until_idle(scheduler, start + 101)
+        self.assertIn('0xa4', scheduler.shards[('large', 0)].user_addresses + scheduler.shards[('large', 1)].user_addresses)
+
+    def test_missing_balances_keep_their_tier(self):
+        failing = set()
+
+        def refresh(user_addresses):
+            # A failed read is left out rather than reported as zero
+            return {address: BALANCES[address] for address in user_addresses if address not in failing}
+
+        scheduler = self.make_scheduler(refresh)
+        start = time.time()
+        self.run_until_idle(scheduler, start)
+        failing.add('0xa0')
+        self.run_until_idle(scheduler, start + 11)
+
+        self.assertEqual(scheduler.balances['0xa0'], 50)
+        self.assertNotIn('0xa0', scheduler.last_active)
+        self.assertIn('0xa0', scheduler.shards[('large', 0)].user_addresses)
+
+    def test_shard_refresh_leaves_out_failed_reads(self):
+        snapshots = {
+            'arbitrum': {'balances': {'0xa0': 0, '0xa1': 2}, 'errors': {'0xa0': 'request timed out'}},
+            'avalanche': {'balances': {'0xa0': 1, '0xa1': 3}, 'errors': {}},
+        }
+        worker = {'contracts': {'arbitrum': 'arbitrum', 'avalanche': 'avalanche'}, 'batch_size': 10,
+                  'multicall_address': None}
+        with patch.dict(monitor._shard_worker, worker), \
+                patch.object(monitor, 'get_batched_glp_balances', side_effect=lambda contract, *args: snapshots[contract]):
+            self.assertEqual(monitor.refresh_user_shard(['0xa0', '0xa1']), {'0xa1': 5})
+
+    def test_shard_workers_do_not_read_the_market(self):
+        worker = {'contracts': {'arbitrum': 'arbitrum', 'avalanche': 'avalanche'}, 'batch_size': 10,
+                  'multicall_address': None}
+        with patch.dict(monitor._shard_worker, worker), \
+                patch.object(monitor, 'get_batched_glp_balances', return_value={'balances': {'0xa0': 1}, 'errors': {}}), \
+                patch.object(monitor, 'get_market_snapshot') as get_market_snapshot:
+            snapshots, _ = monitor.read_user_shard(['0xa0'])
+        get_market_snapshot.assert_not_called()
+        self.assertNotIn('market', snapshots['arbitrum'])
+
+    def test_process_workers_hand_back_their_metrics(self):
+        def read(contract, *args):
+            REGISTRY.inc('glp_upstream_requests_total', kind='rpc', name='eth_call')
+            return {'total_supply': 1, 'balances': {'0xa0': 1}, 'errors': {}}
+
+        worker = {'contracts': {'arbitrum': 'arbitrum', 'avalanche': 'avalanche'}, 'batch_size': 10,
+                  'multicall_address': None, 'export_metrics': True}
+        with patch.dict(monitor._shard_worker, worker), patch.object(monitor, 'get_batched_glp_balances', side_effect=read):
+            REGISTRY.drain()
+            snapshots, metrics = monitor.read_user_shard(['0xa0'])
+        self.assertEqual(monitor.shard_balances(['0xa0'], snapshots), {'0xa0': 2})
+        self.assertEqual(metrics['counters'], {('glp_upstream_requests_total', (('kind', 'rpc'), ('name', 'eth_call'))): 2})
+        self.assertEqual(REGISTRY.get('glp_upstream_requests_total', kind='rpc', name='eth_call'), 0)
+
+    def test_lag_is_reported_per_shard(self):
+        def slow_refresh(user_addresses):
+            time.sleep(0.1)
+            return {address: 1 for address in user_addresses}
+
+        scheduler = self.make_scheduler(slow_refresh, ThreadPoolExecutor(max_workers=1))
+        self.run_until_idle(scheduler, time.time())
+        lags = sorted(stats['lag'] for stats in scheduler.shard_stats().values())
+        # With one worker, the third shard waits for the first two
+        self.assertGreaterEqual(lags[-1], 0.15)
+
+    def test_failed_shard_is_counted(self):
+        def failing_refresh(user_addresses):
+            raise RuntimeError('node down')
+
+        scheduler = self.make_scheduler(failing_refresh)
+        with self.assertLogs(level='ERROR'):
+            self.run_until_idle(scheduler, time.time())
+        self.assertEqual(sum(stats['errors'] for stats in scheduler.shard_stats().values()), 3)
+
+    def test_process_pool(self):
+        scheduler = self.make_scheduler(executor=ProcessPoolExecutor(max_workers=2))
+        self.assertEqual(self.run_until_idle(scheduler, time.time()), 3)
+        self.assertEqual(scheduler.balances, BALANCES)
+
+    def test_collect_unpacks_worker_results(self):
+        sizes = []
+
+        def collect(result):
+            balances, size = result
+            sizes.append(size)
+            return balances
+
+        scheduler = self.make_scheduler(read_balances_with_sizes, ProcessPoolExecutor(max_workers=2), collect=collect)
+        self.run_until_idle(scheduler, time.time())
+        self.assertEqual(sorted(sizes), [1, 2, 2])
+        self.assertEqual(scheduler.balances, BALANCES)
+
+    def test_invalid_shard_size(self):
+        with self.assertRaises(ValueError):
+            ShardedScheduler(read_balances, [], shard_size=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
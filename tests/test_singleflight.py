@@ -0,0 +1,101 @@
+import threading
+import unittest
+from unittest.mock import patch
+from local_chain import setup_local_web3, deploy_contract
+from utils.cache import market_data_cache
+from utils.monitor import run_monitor_tick
+from utils.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_run(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        runs = []
+
+        def slow():
+            runs.append(1)
+            started.set()
+            release.wait(5)
+            return 'price'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do('arbitrum', slow)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do('arbitrum', slow))) for _ in range(3)]
+        for follower in followers:
+            follower.start()
+        while flight.shared < 3:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(results, ['price'] * 4)
+        self.assertEqual(len(runs), 1)
+        self.assertEqual((flight.calls, flight.shared), (1, 3))
+
+    def test_error_reaches_every_waiter_and_is_not_kept(self):
+        flight = SingleFlight()
+
+        def failing():
+            raise ValueError('upstream down')
+
+        with self.assertRaises(ValueError):
+            flight.do('arbitrum', failing)
+        self.assertEqual(flight.do('arbitrum', lambda: 'recovered'), 'recovered')
+        self.assertEqual(flight.calls, 2)
+
+
+class TestMarketSnapshot(unittest.TestCase):
+    def setUp(self):
+        market_data_cache.clear()
+        self.addCleanup(market_data_cache.clear)
+        self.web3 = setup_local_web3()
+        self.contracts = {network: deploy_contract(self.web3, 'GLPStandIn') for network in ('arbitrum', 'avalanche')}
+        self.multicall = deploy_contract(self.web3, 'Multicall3')
+        self.users = self.web3.eth.accounts[1:6]
+        for contract in self.contracts.values():
+            for user in self.users:
+                contract.functions.mint(user, 10 ** 18).transact({'from': self.web3.eth.accounts[0]})
+
+    def test_market_is_read_once_per_chain_per_tick(self):
+        with patch('utils.monitor.calculate_prices', return_value=(2, 1)) as calculate_prices, \
+                patch('utils.monitor.fetch_glp_data', return_value={'glp_price': 1.0}) as fetch_glp_data:
+            snapshots = run_monitor_tick(self.contracts, self.users, multicall_address=self.multicall.address, index=object())
+
+        self.assertEqual(calculate_prices.call_count, 2)
+        self.assertEqual(fetch_glp_data.call_count, 2)
+        self.assertEqual(snapshots['arbitrum']['market'],
+                         {'total_supply': 5, 'glp_data': {'glp_price': 1.0}, 'average_mint_price': 2, 'redemption_price': 1})
+
+    def test_ticks_within_the_ttl_share_one_market_read(self):
+        with patch('utils.monitor.calculate_prices', return_value=(2, 1)) as calculate_prices, \
+                patch('utils.monitor.fetch_glp_data', return_value=None):
+            for _ in range(3):
+                run_monitor_tick(self.contracts, self.users, multicall_address=self.multicall.address, index=object())
+
+        self.assertEqual(calculate_prices.call_count, 2)
+
+    def test_mint_history_is_not_scanned_without_an_index(self):
+        with patch('utils.monitor.calculate_prices') as calculate_prices, \
+                patch('utils.monitor.fetch_glp_data', return_value=None):
+            snapshots = run_monitor_tick(self.contracts, self.users, multicall_address=self.multicall.address)
+
+        calculate_prices.assert_not_called()
+        self.assertIsNone(snapshots['arbitrum']['market']['average_mint_price'])
+
+    def test_failed_market_read_is_logged_once_per_chain(self):
+        with patch('utils.monitor.calculate_prices', side_effect=ValueError('rpc down')), \
+                patch('utils.monitor.fetch_glp_data', return_value=None), \
+                self.assertLogs(level='ERROR') as logs:
+            snapshots = run_monitor_tick(self.contracts, self.users, multicall_address=self.multicall.address, index=object())
+
+        self.assertIsNone(snapshots['avalanche']['market'])
+        self.assertEqual(len(logs.records), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import unittest
+from unittest.mock import patch
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+import utils.monitor as monitor
+from benchmarks.run import GLP_ABI_PATH, GLP_ADDRESSES, STREAMLIT_APP_PATH, configure_endpoints
+from benchmarks.stand_in import StandInServer
+from utils import async_fetch, web3_utils
+from utils.cache import market_data_cache
+from utils.constants import SUBGRAPH_URLS
+from utils.explorer import EXPLORER_URLS
+from utils.subgraph import SubgraphError
+from streamlit_app import label_token_composition, render_token_composition
+
+USER = '0x00000000000000000000000000000000000a0001'
+
+COMPOSITION = {
+    '0x82af49447d8a07e3bd95bd0d56f35241523fbab1': 0.4,
+    '0xaf88d065e77c8cc2239327c5edb3a432268e5831': 0.35,
+    '0x0000000000000000000000000000000000000001': 0.25,
+}
+
+
+class TestTokenCompositionChart(unittest.TestCase):
+    def setUp(self):
+        st.cache_data.clear()
+
+    def test_labels_use_the_normalized_address_map(self):
+        self.assertEqual(label_token_composition(COMPOSITION, 'Arbitrum'),
+                         (('ETH', 40.0), ('USDC', 35.0), ('0x0000000000000000000000000000000000000001', 25.0)))
+
+    def test_repeat_renders_reuse_the_cached_image(self):
+        labelled_weights = label_token_composition(COMPOSITION, 'Arbitrum')
+        image = render_token_composition(labelled_weights, 'Arbitrum')
+        self.assertTrue(image.startswith(b'\x89PNG'))
+
+        started = time.perf_counter()
+        self.assertEqual(render_token_composition(labelled_weights, 'Arbitrum'), image)
+        self.assertLess(time.perf_counter() - started, 0.05)
+
+    def test_renders_leave_no_figures_behind(self):
+        import matplotlib.pyplot as plt
+        render_token_composition(label_token_composition(COMPOSITION, 'Arbitrum'), 'Arbitrum')
+
+        tracemalloc.start()
+        for share in range(20):
+            st.cache_data.clear()
+            render_token_composition((('ETH', 50.0 + share), ('USDC', 50.0 - share)), 'Arbitrum')
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.assertEqual(plt.get_fignums(), [])
+        self.assertLess(current, 5 * 2 ** 20)
+
+
+
+class TestAppReruns(unittest.TestCase):
+    def setUp(self):
+        self.stand_in = StandInServer().start()
+        self.addCleanup(self.stand_in.stop)
+        for patcher in (patch.dict(SUBGRAPH_URLS), patch.dict(EXPLORER_URLS), patch.object(monitor, 'COINGECKO_API_URL')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        configure_endpoints(self.stand_in)
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        market_data_cache.clear()
+        self.addCleanup(market_data_cache.clear)
+
+        # The app reads config.yaml and the ABI from its working directory
+        workdir = tempfile.mkdtemp(prefix='glp-app-')
+        self.addCleanup(shutil.rmtree, workdir)
+        os.makedirs(os.path.join(workdir, 'contracts'))
+        shutil.copy(GLP_ABI_PATH, os.path.join(workdir, 'contracts'))
+        with open(os.path.join(workdir, 'config.yaml'), 'w') as config_file:
+            json.dump({
+                'arb_provider_url': self.stand_in.url('rpc', 'arbitrum'),
+                'avax_provider_url': self.stand_in.url('rpc', 'avalanche'),
+                'arb_glp_contract_address': GLP_ADDRESSES['arbitrum'],
+                'avax_glp_contract_address': GLP_ADDRESSES['avalanche'],
+                'api_key': '',
+                'user_addresses': [],
+            }, config_file)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(workdir)
+
+    def open_app(self):
+        app = AppTest.from_file(STREAMLIT_APP_PATH, default_timeout=60).run()
+        app.text_input[0].input(USER).run()
+        self.assertFalse(app.exception)
+        return app
+
+    def test_rerun_reuses_clients_and_data(self):
+        with patch.object(web3_utils, 'setup_async_web3', wraps=web3_utils.setup_async_web3) as setup_async_web3:
+            app = self.open_app()
+            calls = self.stand_in.counts()
+            app.run()
+            app.run()
+        self.assertFalse(app.exception)
+        # One client per chain, built on the first run only
+        self.assertEqual(setup_async_web3.call_count, 2)
+        self.assertEqual(self.stand_in.counts(), calls)
+
+    def test_unopened_tabs_make_no_requests(self):
+        with patch.object(monitor, 'get_glp_transactions', wraps=monitor.get_glp_transactions) as get_glp_transactions, \
+                patch.object(monitor, 'get_glp_price_history', wraps=monitor.get_glp_price_history) as price_history, \
+                patch.object(monitor, 'calculate_cost_basis', wraps=monitor.calculate_cost_basis) as cost_basis:
+            app = self.open_app()
+            # Only the first tab is open: Arbitrum transfers, nothing for the other tabs
+            self.assertEqual([call.kwargs['network'] for call in get_glp_transactions.call_args_list], ['arbitrum'])
+            self.assertEqual(self.stand_in.counts()['explorer'], 1)
+            price_history.assert_not_called()
+            cost_basis.assert_not_called()
+
+            app.session_state['glp_tab'] = 'GLP Value'
+            app.run()
+        self.assertFalse(app.exception)
+        self.assertEqual(cost_basis.call_count, 2)
+        self.assertEqual(sorted(call.args[0] for call in price_history.call_args_list), ['arbitrum', 'avalanche'])
+
+    def test_failed_glp_data_is_shown_and_not_cached(self):
+        with patch.object(async_fetch, 'fetch_glp_data', side_effect=SubgraphError('subgraph down')):
+            app = self.open_app()
+        self.assertTrue(any('GLP data could not be loaded' in warning.value for warning in app.warning))
+
+        # The failed load was not cached, so the next rerun reads the subgraph again
+        app.run()
+        self.assertFalse(app.exception)
+        self.assertFalse(app.warning)
+
+if __name__ == '__main__':
+    unittest.main()
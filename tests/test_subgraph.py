@@ -0,0 +1,93 @@
+import re
+import unittest
+from unittest.mock import MagicMock, patch
+from utils import subgraph
+from utils.cache import market_data_cache
+from utils.monitor import fetch_glp_data, get_token_composition_scraping
+from utils.subgraph import SubgraphError, get_latest_token_stats, iter_entities
+
+
+def token_stat(token, timestamp, pool_amount_usd):
+    return {'id': f'{timestamp}:{token}', 'token': token, 'timestamp': timestamp, 'poolAmountUsd': str(pool_amount_usd)}
+
+
+class FakeSubgraph:
+    """Answers tokenStats/glpStats queries from in-memory rows, honouring the id_gt cursor."""
+
+    def __init__(self, token_stats, glp_stats=None):
+        self.token_stats = sorted(token_stats, key=lambda row: row['id'])
+        self.glp_stats = glp_stats or []
+        self.queries = []
+
+    def __call__(self, url, json=None):
+        self.queries.append(json)
+        query, variables = json['query'], json.get('variables', {})
+        if 'glpStats' in query:
+            data = {'glpStats': self.glp_stats}
+        elif 'orderBy: timestamp' in query:
+            data = {'tokenStats': sorted(self.token_stats, key=lambda row: -row['timestamp'])[:1]}
+        else:
+            since = int(re.search(r'timestamp_gte: (-?\d+)', query).group(1))
+            rows = [row for row in self.token_stats if row['id'] > variables['cursor'] and row['timestamp'] >= since]
+            data = {'tokenStats': rows[:variables['first']]}
+        response = MagicMock(status_code=200)
+        response.json.return_value = {'data': data}
+        return response
+
+
+class TestSubgraph(unittest.TestCase):
+    def setUp(self):
+        day = 86400
+        self.rows = [token_stat(f'0x{i:02x}', 10 * day, 100 + i) for i in range(5)]
+        self.rows += [token_stat(f'0x{i:02x}', 9 * day, 1) for i in range(5)]
+        self.rows += [token_stat('0xff', 8 * day, 50), token_stat('0xee', day, 1000)]
+        self.fake = FakeSubgraph(self.rows, [{'aumInUsdg': '300', 'glpSupply': '200'}])
+        patcher = patch.object(subgraph, 'http_post', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_iter_entities_uses_cursor_pages(self):
+        rows = list(iter_entities('arbitrum', 'tokenStats', 'token timestamp', 'timestamp_gte: 0', page_size=3))
+        self.assertEqual([row['id'] for row in rows], sorted(row['id'] for row in self.rows))
+        # 12 rows in full pages of 3, plus the empty page that ends the stream
+        self.assertEqual(len(self.fake.queries), 5)
+        self.assertEqual([query['variables']['cursor'] for query in self.fake.queries][:2], ['', rows[2]['id']])
+        self.assertTrue(all('skip' not in query['query'] for query in self.fake.queries))
+
+    def test_latest_token_stats_keeps_one_row_per_token(self):
+        latest = get_latest_token_stats('arbitrum', page_size=4)
+        self.assertEqual(set(latest), {f'0x{i:02x}' for i in range(5)} | {'0xff'})
+        self.assertEqual(latest['0x01']['poolAmountUsd'], '101')
+        self.assertEqual(latest['0xff']['timestamp'], 8 * 86400)
+        # Rows older than the lookback before the newest snapshot are not downloaded
+        self.assertNotIn('0xee', latest)
+        self.assertTrue(all(f'timestamp_gte: {3 * 86400}' in query['query'] for query in self.fake.queries[1:]))
+
+    def test_token_composition_uses_latest_snapshot(self):
+        composition = get_token_composition_scraping.uncached('arbitrum')
+        total = sum(100 + i for i in range(5)) + 50
+        self.assertAlmostEqual(composition['0x00'], 100 / total)
+        self.assertAlmostEqual(sum(composition.values()), 1)
+        self.assertNotIn('0xee', composition)
+
+    def test_fetch_glp_data_uses_client(self):
+        self.assertEqual(fetch_glp_data.uncached('avalanche'), {'aum_in_usdg': 300.0, 'glp_supply': 200.0, 'price': 1.5})
+
+    def test_errors_raise(self):
+        response = MagicMock(status_code=200)
+        response.json.return_value = {'errors': [{'message': 'bad query'}]}
+        with patch.object(subgraph, 'http_post', return_value=response):
+            with self.assertRaises(SubgraphError):
+                subgraph.query_subgraph('arbitrum', '{ x }')
+            with self.assertRaises(SubgraphError):
+                get_token_composition_scraping.uncached('arbitrum')
+            market_data_cache.clear()
+            self.assertEqual(get_token_composition_scraping('arbitrum'), {})
+        # The failed load was not cached, so the next call queries again
+        self.assertAlmostEqual(sum(get_token_composition_scraping('arbitrum').values()), 1)
+        with self.assertRaises(ValueError):
+            subgraph.query_subgraph('optimism', '{ x }')
+
+
+if __name__ == '__main__':
+    unittest.main()
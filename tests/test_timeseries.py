@@ -0,0 +1,136 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from utils import timeseries
+from utils.timeseries import TimeSeriesStore
+
+ALICE, BOB = '0x' + 'aa' * 20, '0x' + 'bb' * 20
+
+
+class TestTimeSeriesStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.store = TimeSeriesStore(self.directory.name, segment_rows=1000)
+
+    def record(self, timestamp, alice, bob, supply=100.0, price=1.0):
+        snapshot = {'total_supply': supply, 'balances': {ALICE: alice, BOB: bob}}
+        self.store.record_snapshot(timestamp, 'arbitrum', snapshot, {'price': price, 'aum_in_usdg': supply * price})
+
+    def test_range_query_reads_flushed_ticks(self):
+        for minute in range(5):
+            self.record(minute * 60, alice=float(minute), bob=1.0)
+        self.assertTrue(self.store.query('balances').empty)
+        self.store.flush()
+
+        rows = self.store.query('balances', start=60, end=180, address=ALICE)
+        self.assertEqual(list(rows['timestamp']), [60, 120])
+        self.assertEqual(list(rows['balance']), [1.0, 2.0])
+        self.assertEqual(len(self.store.query('chains', network='arbitrum')), 5)
+        with self.assertRaises(ValueError):
+            self.store.query('balances', wallet=ALICE)
+
+    def test_rollups_merge_buckets_split_across_flushes(self):
+        # Two ticks of the same hour land in different segments
+        self.record(3600, alice=4.0, bob=0.0, price=1.0)
+        self.store.flush()
+        self.record(3660, alice=2.0, bob=0.0, price=3.0)
+        self.record(7200, alice=5.0, bob=0.0, price=2.0)
+        self.store.flush()
+
+        hourly = self.store.rollup('balances', '1h', address=ALICE)
+        self.assertEqual(list(hourly['bucket']), [3600, 7200])
+        first = hourly.iloc[0]
+        self.assertEqual((first['balance_open'], first['balance_close']), (4.0, 2.0))
+        self.assertEqual((first['balance_high'], first['balance_low'], first['balance_mean']), (4.0, 2.0, 3.0))
+        self.assertEqual(first['count'], 2)
+
+        prices = self.store.rollup('chains', '1d')
+        self.assertEqual(prices.iloc[0]['glp_price_mean'], 2.0)
+        self.assertEqual(prices.iloc[0]['glp_price_close'], 2.0)
+        self.assertEqual(list(self.store.rollup('chains', '1m', start=3660)['bucket']), [3660, 7200])
+
+    def segments(self, table, resolution):
+        return [name for name in os.listdir(os.path.join(self.directory.name, table, resolution)) if name.endswith('.parquet')]
+
+    def test_compact_keeps_rollup_values(self):
+        for hour in range(4):
+            self.record(hour * 3600 + 30, alice=float(hour), bob=1.0)
+            self.store.flush()
+        before = self.store.rollup('balances', '1d')
+        self.store.compact('balances', '1d')
+        self.assertEqual(len(self.segments('balances', '1d')), 1)
+        self.assertTrue(before.equals(self.store.rollup('balances', '1d')))
+
+    def test_writer_compacts_closed_days_in_the_background(self):
+        store = TimeSeriesStore(self.directory.name, segment_rows=1)
+        row = {'network': 'arbitrum', 'total_supply': 1.0, 'glp_price': 1.0, 'aum': 1.0}
+        for hour in range(3):
+            store.append('chains', hour * 3600, [row])
+        self.assertEqual(len(self.segments('chains', timeseries.RAW)), 3)
+
+        store._last_compact -= store.compact_interval
+        store.append('chains', 3 * 3600, [row])
+        store._compactor.join(10)
+        for resolution in [timeseries.RAW, *timeseries.ROLLUPS]:
+            self.assertEqual(len(self.segments('chains', resolution)), 1)
+        self.assertEqual(list(store.rollup('chains', '1h')['count']), [1, 1, 1, 1])
+        self.assertEqual(list(store.query('chains')['timestamp']), [0, 3600, 7200, 10800])
+
+    def test_open_day_is_not_compacted(self):
+        now = int(time.time())
+        self.record(now - 120, alice=1.0, bob=1.0)
+        self.store.flush()
+        self.record(now - 60, alice=2.0, bob=1.0)
+        self.store.flush()
+        self.store.compact('balances', timeseries.RAW, before=now)
+        self.assertEqual(len(self.segments('balances', timeseries.RAW)), 2)
+
+    def test_segments_added_after_a_compaction_are_kept(self):
+        for hour in range(2):
+            self.record(hour * 3600, alice=float(hour), bob=1.0)
+            self.store.flush()
+        self.store.compact('balances', timeseries.RAW)
+        # A late tick of the compacted day lands in its own segment and is merged next time
+        self.record(3 * 3600, alice=3.0, bob=1.0)
+        self.store.flush()
+        self.assertEqual(list(self.store.query('balances', address=ALICE)['balance']), [0.0, 1.0, 3.0])
+        self.store.compact('balances', timeseries.RAW)
+        self.assertEqual(len(self.segments('balances', timeseries.RAW)), 1)
+        self.assertEqual(list(self.store.query('balances', address=ALICE)['balance']), [0.0, 1.0, 3.0])
+
+    def test_readers_never_count_a_tick_twice_during_compaction(self):
+        for hour in range(3):
+            self.record(hour * 3600, alice=1.0, bob=1.0)
+            self.store.flush()
+        reader = TimeSeriesStore(self.directory.name)
+        seen = []
+        remove = os.remove
+
+        def remove_after_reading(path):
+            # The merged segment exists and some inputs are not removed yet
+            seen.append((len(reader.query('balances')), reader.rollup('balances', '1d')['count'].tolist()))
+            remove(path)
+
+        with patch.object(timeseries.os, 'remove', remove_after_reading):
+            self.store.compact('balances', timeseries.RAW)
+            self.store.compact('balances', '1d')
+        self.assertEqual(seen, [(6, [3, 3])] * 6)
+
+    def test_full_buffer_flushes_and_skips_other_segments(self):
+        store = TimeSeriesStore(self.directory.name, segment_rows=2)
+        store.append('chains', 10, [{'network': 'arbitrum', 'total_supply': 1.0, 'glp_price': 1.0, 'aum': 1.0}])
+        store.append('chains', 20, [{'network': 'arbitrum', 'total_supply': 2.0, 'glp_price': 1.0, 'aum': 2.0}])
+        store.append('chains', 5000, [{'network': 'arbitrum', 'total_supply': 3.0, 'glp_price': 1.0, 'aum': 3.0}])
+        store.flush()
+
+        with patch.object(timeseries.pq, 'read_table', wraps=timeseries.pq.read_table) as read_table:
+            rows = store.query('chains', start=4000)
+        self.assertEqual(list(rows['total_supply']), [3.0])
+        self.assertEqual(read_table.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
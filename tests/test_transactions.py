@@ -0,0 +1,86 @@
+import pickle
+import unittest
+
+import pandas as pd
+
+from utils.cost_basis import transfers_from_transactions
+from utils.transactions import TransactionBatch
+
+USER = '0x00000000000000000000000000000000000000aa'
+OTHER = '0x00000000000000000000000000000000000000bb'
+WEI = 10 ** 18
+
+
+def make_record(number, sender, receiver, value, **extra):
+    record = {
+        'blockNumber': str(100 + number), 'timeStamp': str(1700000000 + number), 'hash': f'0x{number:064x}',
+        'from': sender, 'to': receiver, 'value': str(value), 'tokenName': 'GLP', 'tokenSymbol': 'GLP',
+        'tokenDecimal': '18', 'gas': '1000000', 'gasPrice': '100000000', 'confirmations': '5'
+    }
+    record.update(extra)
+    return record
+
+
+class TestTransactionBatch(unittest.TestCase):
+    def setUp(self):
+        self.records = [
+            make_record(0, OTHER, USER.upper().replace('0X', '0x'), 40 * WEI),
+            make_record(1, USER, OTHER, WEI, methodId='0xa9059cbb'),
+            make_record(2, USER, OTHER, 2 ** 70),
+        ]
+
+    def test_records_keep_only_the_used_fields_as_native_types(self):
+        batch = TransactionBatch.from_records(iter(self.records), chunk_size=2)
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(batch.table.column_names, ['hash', 'from', 'to', 'value', 'timeStamp', 'blockNumber', 'methodId'])
+        self.assertEqual(batch.values(), [40 * WEI, WEI, 2 ** 70])
+        self.assertEqual(batch.table.column('timeStamp').to_pylist(), [1700000000, 1700000001, 1700000002])
+
+    def test_large_values_stay_exact_and_out_of_range_ones_are_rejected(self):
+        records = [make_record(number, OTHER, USER, value) for number, value in
+                   enumerate([2 ** 128 - 1, 2 ** 200, 10 ** 76 - 1, 10 ** 76, -1, 'not-a-number'])]
+        with self.assertLogs(level='ERROR') as logs:
+            batch = TransactionBatch.from_records(records)
+        self.assertEqual(batch.values(), [2 ** 128 - 1, 2 ** 200, 10 ** 76 - 1])
+        self.assertEqual(len(logs.records), 3)
+
+    def test_rows_read_as_dicts_with_dates_formatted_on_access(self):
+        batch = TransactionBatch.from_records(self.records)
+        self.assertEqual(batch[0]['methodId'], 'N/A')
+        self.assertEqual(batch[1]['methodId'], '0xa9059cbb')
+        self.assertEqual(batch[-1]['value'], 2 ** 70)
+        self.assertEqual(batch[0]['human_readable_date'], '2023-11-14 22:13:20')
+        self.assertEqual([row['hash'] for row in batch], [record['hash'] for record in self.records])
+        with self.assertRaises(IndexError):
+            batch[3]
+
+    def test_empty_stream_gives_an_empty_batch(self):
+        batch = TransactionBatch.from_records([])
+        self.assertFalse(batch)
+        self.assertEqual(len(batch.to_pandas()), 0)
+
+    def test_pandas_columns_are_backed_by_arrow(self):
+        batch = TransactionBatch.from_records(self.records)
+        frame = batch.to_pandas()
+        self.assertTrue(all(isinstance(dtype, pd.ArrowDtype) for dtype in frame.dtypes))
+        self.assertEqual(list(batch.glp_values()), [40.0, 1.0, 2 ** 70 / WEI])
+        self.assertEqual(pickle.loads(pickle.dumps(batch)), batch)
+
+    def test_cost_basis_rows_match_the_dict_records(self):
+        history = [(1700000000, 1.0), (1700000002, 2.0)]
+        from_batch = transfers_from_transactions(TransactionBatch.from_records(self.records), USER, history)
+        from_dicts = transfers_from_transactions(self.records, USER, history)
+        pd.testing.assert_frame_equal(from_batch, from_dicts, check_dtype=False)
+        self.assertEqual(list(from_batch['amount']), [40 * WEI, -WEI, -2 ** 70])
+
+    def test_self_transfers_open_no_lots(self):
+        history = [(1700000000, 1.0)]
+        records = self.records + [make_record(3, USER, USER.upper().replace('0X', '0x'), 5 * WEI)]
+        from_batch = transfers_from_transactions(TransactionBatch.from_records(records), USER, history)
+        from_dicts = transfers_from_transactions(records, USER, history)
+        pd.testing.assert_frame_equal(from_batch, from_dicts, check_dtype=False)
+        self.assertEqual(list(from_dicts['amount']), [40 * WEI, -WEI, -2 ** 70])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import functools
+import json
+import logging
+
+GLP_ABI_PATH = 'contracts/glp_abi.json'
+SLIM_GLP_ABI_PATH = 'contracts/glp_abi.slim.json'
+
+# The GLP functions and events this package calls or decodes
+GLP_ABI_NAMES = ('balanceOf', 'decimals', 'totalSupply', 'Transfer')
+
+
+def slim_abi(abi, names=GLP_ABI_NAMES):
+    """
+    Keep only the named functions and events of an ABI.
+
+    Args:
+        abi (list): The full ABI.
+        names (tuple): The function and event names to keep.
+
+    Returns:
+        list: The matching entries, in ABI order.
+
+    Raises:
+        ValueError: If a name is missing from the ABI.
+    """
+    entries = [entry for entry in abi if entry.get('type') in ('function', 'event') and entry.get('name') in names]
+    missing = set(names) - {entry['name'] for entry in entries}
+    if missing:
+        raise ValueError(f"ABI has no entries named {sorted(missing)}")
+    return entries
+
+
+def build_slim_abi(source=GLP_ABI_PATH, target=SLIM_GLP_ABI_PATH, names=GLP_ABI_NAMES):
+    """
+    Write the slim ABI used at runtime from the full contract ABI.
+
+    Args:
+        source (str): The path of the full ABI.
+        target (str): The path to write the slim ABI to.
+        names (tuple): The function and event names to keep.
+
+    Returns:
+        list: The slim ABI.
+    """
+    with open(source, 'r') as abi_file:
+        abi = slim_abi(json.load(abi_file), names)
+    with open(target, 'w') as abi_file:
+        json.dump(abi, abi_file, indent=2)
+        abi_file.write('\n')
+    logging.info(f"Wrote {len(abi)} ABI entries to {target}")
+    return abi
+
+
+@functools.lru_cache(maxsize=None)
+def load_glp_abi(path=SLIM_GLP_ABI_PATH):
+    """
+    Load the slim GLP ABI once per process.
+
+    The slim file is generated by :func:`build_slim_abi` and checked against
+    the full ABI by the tests, so it is not validated again here.
+
+    Args:
+        path (str): The path of the slim ABI.
+
+    Returns:
+        list: The ABI entries. The list is shared, so callers must not modify it.
+    """
+    with open(path, 'r') as abi_file:
+        return json.load(abi_file)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    build_slim_abi()
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import time
+
+from .constants import DECIMALS
+from .monitor import (fetch_glp_data, build_balance_calls, collect_balance_results, log_user_holdings,
+                      attach_market_snapshots, load_glp_contracts, open_mint_index, open_timeseries_store, record_tick)
+from .multicall import aggregate_async, DEFAULT_BATCH_SIZE, MULTICALL3_ADDRESS
+from .metrics import observe_tick
+from .abi import load_glp_abi
+
+DEFAULT_MAX_CONCURRENCY = 16
+
+
+async def _bounded(semaphore, coro):
+    if semaphore is None:
+        return await coro
+    async with semaphore:
+        return await coro
+
+
+async def get_total_supply_async(contract, semaphore=None):
+    """
+    Fetch the total supply of GLP asynchronously.
+
+    Args:
+        contract (AsyncContract): The GLP contract instance.
+        semaphore (asyncio.Semaphore, optional): Bounds the number of in-flight requests.
+
+    Returns:
+        float: The total supply of GLP.
+    """
+    try:
+        return await _bounded(semaphore, contract.functions.totalSupply().call()) / (10 ** DECIMALS)
+    except Exception as e:
+        logging.error(f"Error fetching GLP supply: {e}")
+        return 0
+
+
+async def get_user_glp_balance_async(contract, user_address, semaphore=None):
+    """
+    Fetch the GLP balance of a user asynchronously.
+
+    Args:
+        contract (AsyncContract): The GLP contract instance.
+        user_address (str): The address of the user.
+        semaphore (asyncio.Semaphore, optional): Bounds the number of in-flight requests.
+
+    Returns:
+        float: The GLP balance of the user.
+    """
+    try:
+        return await _bounded(semaphore, contract.functions.balanceOf(user_address).call()) / (10 ** DECIMALS)
+    except Exception as e:
+        logging.error(f"Error fetching user GLP balance for {user_address}: {e}")
+        return 0
+
+
+async def fetch_glp_data_async(network='arbitrum', semaphore=None):
+    """
+    Fetch GLP AUM and supply from the subgraph API without blocking the event loop.
+
+    The request runs :func:`utils.monitor.fetch_glp_data` on a worker thread, so it
+    shares the market data cache, the subgraph host's rate limiter and the response
+    checks of the synchronous engines.
+
+    Args:
+        network (str): The network to query ('arbitrum' or 'avalanche').
+        semaphore (asyncio.Semaphore, optional): Bounds the number of in-flight requests.
+
+    Returns:
+        dict: A dictionary with AUM, supply, and price, or None if it could not be read.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def fetch():
+        return await loop.run_in_executor(None, fetch_glp_data, network)
+
+    try:
+        return await _bounded(semaphore, fetch())
+    except Exception as e:
+        logging.error(f"Error fetching {network} GLP data: {e}")
+        return None
+
+
+async def get_batched_glp_balances_async(contract, user_addresses, semaphore, batch_size=DEFAULT_BATCH_SIZE, multicall_address=MULTICALL3_ADDRESS):
+    """
+    Async version of :func:`utils.monitor.get_batched_glp_balances`.
+
+    Args:
+        contract (AsyncContract): The GLP contract instance.
+        user_addresses (list): The addresses of the users.
+        semaphore (asyncio.Semaphore): Bounds the number of in-flight requests.
+        batch_size (int): The maximum number of calls per multicall request.
+        multicall_address (str): The address of the Multicall3 contract.
+
+    Returns:
+        dict: A dictionary with the total supply, the balances keyed by user address,
+        and an error message for every read that failed.
+    """
+    keys, calls, errors = build_balance_calls(contract, user_addresses)
+    results = await aggregate_async(contract.w3, calls, semaphore, batch_size=batch_size, multicall_address=multicall_address)
+    return collect_balance_results(contract, user_addresses, keys, results, errors)
+
+
+async def fetch_all_chains_async(contracts, user_addresses, max_concurrency=DEFAULT_MAX_CONCURRENCY, batch_size=DEFAULT_BATCH_SIZE,
+                                 multicall_address=MULTICALL3_ADDRESS, include_glp_data=True):
+    """
+    Fetch supply, balances and (optionally) subgraph GLP data for every chain concurrently.
+
+    All chains and all balance batches share one semaphore, so the wall-clock time
+    of a call follows the slowest chain instead of the sum of all of them.
+
+    Args:
+        contracts (dict): The GLP contract instances keyed by network name.
+        user_addresses (list): The addresses of the users.
+        max_concurrency (int): The maximum number of in-flight requests.
+        batch_size (int): The maximum number of calls per multicall request.
+        multicall_address (str): The address of the Multicall3 contract.
+        include_glp_data (bool): Whether to also fetch AUM, supply and price from the subgraph.
+
+    Returns:
+        dict: A snapshot per network, as returned by :func:`get_batched_glp_balances_async`,
+        with an extra 'glp_data' entry when ``include_glp_data`` is set (None if the
+        subgraph could not be read).
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch_chain(network, contract):
+        tasks = [get_batched_glp_balances_async(contract, user_addresses, semaphore, batch_size, multicall_address)]
+        if include_glp_data:
+            tasks.append(fetch_glp_data_async(network, semaphore))
+        results = await asyncio.gather(*tasks)
+        snapshot = results[0]
+        if include_glp_data:
+            snapshot['glp_data'] = results[1]
+        return snapshot
+
+    snapshots = await asyncio.gather(*(fetch_chain(network, contract) for network, contract in contracts.items()))
+
+    return dict(zip(contracts.keys(), snapshots))
+
+
+async def monitor_glp_async(config, interval=60):
+    """
+    Monitor the user's GLP holdings, rewards, and fees with the asyncio engine.
+
+    Args:
+        config (dict): The configuration dictionary.
+        interval (int, optional): The time interval (in seconds) to refresh the data. Defaults to 60.
+    """
+    from .web3_utils import setup_async_web3, load_contract
+
+    glp_abi = load_glp_abi()
+    contracts = {
+        'arbitrum': load_contract(setup_async_web3(config['arb_provider_url'], **config.get('rpc_failover', {})),
+                                  config['arb_glp_contract_address'], glp_abi),
+        'avalanche': load_contract(setup_async_web3(config['avax_provider_url'], **config.get('rpc_failover', {})),
+                                   config['avax_glp_contract_address'], glp_abi)
+    }
+
+    # Mint prices come from the synchronous log scanner, run off the event loop
+    market_contracts = load_glp_contracts(config)
+    index = open_mint_index(config)
+    store = open_timeseries_store(config)
+    loop = asyncio.get_running_loop()
+
+    max_concurrency = config.get('max_concurrency', DEFAULT_MAX_CONCURRENCY)
+    batch_size = config.get('multicall_batch_size', DEFAULT_BATCH_SIZE)
+    multicall_address = config.get('multicall_address', MULTICALL3_ADDRESS)
+
+    try:
+        while True:
+            started = time.perf_counter()
+            snapshots = await fetch_all_chains_async(contracts, config['user_addresses'], max_concurrency, batch_size,
+                                                     multicall_address, include_glp_data=False)
+            await loop.run_in_executor(None, attach_market_snapshots, market_contracts, snapshots, index)
+
+            for user_address in config['user_addresses']:
+                log_user_holdings(user_address, snapshots['arbitrum'], snapshots['avalanche'])
+            # Parquet writes block, so they run off the event loop too
+            await loop.run_in_executor(None, record_tick, store, snapshots)
+            observe_tick('async', time.perf_counter() - started)
+
+            # Wait for the specified interval before fetching the data again
+            await asyncio.sleep(interval)
+    finally:
+        if store:
+            store.flush()
@@ -0,0 +1,407 @@
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.constants import DECIMALS, GLP_MANAGER_ADDRESSES, GLP_TOKEN_ADDRESSES
+from utils.multicall import DEFAULT_BATCH_SIZE, MULTICALL3_ADDRESS, MULTICALL3_DEPLOYMENT_BLOCKS, aggregate, chunked
+from utils.rate_limit import PRIORITY_BACKFILL, request_priority
+
+DEFAULT_BACKFILL_PATH = 'data/backfill.sqlite'
+DEFAULT_STEP = 7200  # blocks between samples
+DEFAULT_CHUNK_SIZE = 50  # blocks fetched and stored by one worker task
+DEFAULT_WORKERS = 4
+
+USDG_DECIMALS = 18
+
+# getAumInUsdg on the GlpManager, totalSupply and balanceOf on the GLP tokens,
+# getCurrentBlockTimestamp on Multicall3
+BACKFILL_ABI = [
+    {"inputs": [{"internalType": "bool", "name": "maximise", "type": "bool"}], "name": "getAumInUsdg",
+     "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}], "stateMutability": "view", "type": "function"},
+    {"inputs": [], "name": "totalSupply",
+     "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}], "stateMutability": "view", "type": "function"},
+    {"inputs": [{"internalType": "address", "name": "account", "type": "address"}], "name": "balanceOf",
+     "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}], "stateMutability": "view", "type": "function"},
+    {"inputs": [], "name": "getCurrentBlockTimestamp",
+     "outputs": [{"internalType": "uint256", "name": "timestamp", "type": "uint256"}], "stateMutability": "view", "type": "function"}
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS points (
+    chain_id INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    aum TEXT NOT NULL,
+    glp_supply TEXT NOT NULL,
+    PRIMARY KEY (chain_id, block_number)
+);
+CREATE TABLE IF NOT EXISTS balances (
+    chain_id INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    balance TEXT NOT NULL,
+    PRIMARY KEY (chain_id, address, block_number)
+);
+"""
+
+
+def block_grid(start_block, end_block, step=DEFAULT_STEP):
+    """
+    Return the sample blocks between two blocks.
+
+    Samples sit on multiples of ``step``, so runs over overlapping ranges
+    share their points.
+
+    Args:
+        start_block (int): The first block of the range.
+        end_block (int): The last block of the range.
+        step (int): The blocks between samples.
+
+    Returns:
+        list: The sample blocks, in order.
+    """
+    if step < 1:
+        raise ValueError(f"Step must be positive, got {step}")
+    first = -(-start_block // step) * step
+    return list(range(first, end_block + 1, step))
+
+
+class BackfillCache:
+    """
+    On-disk SQLite cache of GLP AUM, supply and balances at sampled blocks.
+
+    Points are keyed by ``(chain_id, block)`` and never change once written,
+    so a point is fetched from the archive node at most once. Amounts are
+    stored as exact integer strings.
+
+    Args:
+        path (str): The path of the SQLite database, or ':memory:'.
+    """
+
+    def __init__(self, path=DEFAULT_BACKFILL_PATH):
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def missing_blocks(self, chain_id, blocks, addresses=()):
+        """
+        Return the blocks that have no point or lack the balance of an address.
+
+        Args:
+            chain_id (int): The chain ID.
+            blocks (list): The sample blocks, in order.
+            addresses (list): The addresses whose balances are needed.
+
+        Returns:
+            list: The missing blocks, in order.
+        """
+        if not blocks:
+            return []
+        addresses = {address.lower() for address in addresses}
+        bounds = (chain_id, blocks[0], blocks[-1])
+        with self._lock:
+            cached = {row[0] for row in self._connection.execute(
+                "SELECT block_number FROM points WHERE chain_id = ? AND block_number BETWEEN ? AND ?", bounds)}
+            balances = {}
+            if addresses:
+                for block_number, address in self._connection.execute(
+                        "SELECT block_number, address FROM balances WHERE chain_id = ? AND block_number BETWEEN ? AND ?", bounds):
+                    balances.setdefault(block_number, set()).add(address)
+        return [block for block in blocks
+                if block not in cached or not addresses <= balances.get(block, set())]
+
+    def add_points(self, chain_id, points):
+        """
+        Store sampled points and their balances in one transaction.
+
+        Args:
+            chain_id (int): The chain ID.
+            points (list): Dicts with 'block', 'timestamp', 'aum', 'glp_supply'
+                and 'balances', a dict of raw balances by address.
+        """
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO points VALUES (?, ?, ?, ?, ?)",
+                [(chain_id, point['block'], point['timestamp'], str(point['aum']), str(point['glp_supply']))
+                 for point in points]
+            )
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO balances VALUES (?, ?, ?, ?)",
+                [(chain_id, point['block'], address.lower(), str(balance))
+                 for point in points for address, balance in point['balances'].items()]
+            )
+
+    def price_series(self, chain_id, start_block=0, end_block=None):
+        """
+        Return the cached GLP price series of a chain.
+
+        Args:
+            chain_id (int): The chain ID.
+            start_block (int): The first block to include.
+            end_block (int, optional): The last block to include; defaults to every cached block.
+
+        Returns:
+            list: Dicts with 'block', 'timestamp', 'aum' (USD), 'glp_supply' (GLP)
+            and 'price' (USD per GLP), by block.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT block_number, timestamp, aum, glp_supply FROM points "
+                "WHERE chain_id = ? AND block_number >= ? AND block_number <= ? ORDER BY block_number",
+                (chain_id, start_block, end_block if end_block is not None else 2 ** 63 - 1)
+            ).fetchall()
+        series = []
+        for block_number, timestamp, aum, glp_supply in rows:
+            aum, glp_supply = int(aum), int(glp_supply)
+            series.append({
+                'block': block_number,
+                'timestamp': timestamp,
+                'aum': aum / 10 ** USDG_DECIMALS,
+                'glp_supply': glp_supply / 10 ** DECIMALS,
+                'price': glp_price(aum, glp_supply)
+            })
+        return series
+
+    def exposure_series(self, chain_id, address, start_block=0, end_block=None):
+        """
+        Return the cached GLP balance and USD value of an address over time.
+
+        Args:
+            chain_id (int): The chain ID.
+            address (str): The wallet address.
+            start_block (int): The first block to include.
+            end_block (int, optional): The last block to include; defaults to every cached block.
+
+        Returns:
+            list: Dicts with 'block', 'timestamp', 'price', 'balance' (GLP) and 'value' (USD), by block.
+        """
+        with self._lock:
+            balances = dict(self._connection.execute(
+                "SELECT block_number, balance FROM balances "
+                "WHERE chain_id = ? AND address = ? AND block_number >= ? AND block_number <= ?",
+                (chain_id, address.lower(), start_block, end_block if end_block is not None else 2 ** 63 - 1)
+            ).fetchall())
+        series = []
+        for point in self.price_series(chain_id, start_block, end_block):
+            if point['block'] not in balances:
+                continue
+            balance = int(balances[point['block']]) / 10 ** DECIMALS
+            series.append({'block': point['block'], 'timestamp': point['timestamp'], 'price': point['price'],
+                           'balance': balance, 'value': balance * point['price']})
+        return series
+
+
+def glp_price(aum, glp_supply):
+    """
+    Return the GLP price in USD from the raw AUM in USDG and the raw GLP supply.
+    """
+    if not glp_supply:
+        return 0.0
+    return (aum / 10 ** USDG_DECIMALS) / (glp_supply / 10 ** DECIMALS)
+
+
+def _decode_uint(web3, result):
+    success, data = result
+    if not success or not data:
+        return None
+    return web3.codec.decode(['uint256'], bytes(data))[0]
+
+
+def _call_directly(web3, target, data, block):
+    try:
+        return True, web3.eth.call({'to': target, 'data': data}, block_identifier=block)
+    except Exception as e:
+        return False, str(e)
+
+
+def read_block(web3, block, addresses, glp_manager_address, glp_token_address, balance_token_address,
+               batch_size=DEFAULT_BATCH_SIZE, multicall_address=MULTICALL3_ADDRESS, multicall_block=0):
+    """
+    Read the GLP AUM, supply, block timestamp and balances at one block.
+
+    Every value is read in the same Multicall3 ``eth_call`` against the
+    archive state of the block, or in a few when the balances exceed ``batch_size``.
+    Blocks before ``multicall_block`` predate Multicall3, so each value is read
+    with its own ``eth_call`` and the timestamp comes from the block header.
+
+    Args:
+        web3 (Web3): The Web3 instance of an archive node.
+        block (int): The block to read at.
+        addresses (list): The addresses whose balances to read.
+        glp_manager_address (str): The GlpManager contract, for the AUM.
+        glp_token_address (str): The GLP token, for the supply.
+        balance_token_address (str): The token holding user balances (fsGLP).
+        batch_size (int): The maximum number of calls per ``eth_call``.
+        multicall_address (str): The address of the Multicall3 contract.
+        multicall_block (int): The first block at which the Multicall3 contract exists.
+
+    Returns:
+        dict: The point, with 'block', 'timestamp', 'aum', 'glp_supply' and
+        'balances' (raw integers), or None if the market values could not be read.
+        Balances that could not be read are left out.
+    """
+    encoder = web3.eth.contract(abi=BACKFILL_ABI)
+    calls = [
+        (glp_manager_address, encoder.encode_abi('getAumInUsdg', [True])),
+        (glp_token_address, encoder.encode_abi('totalSupply')),
+    ]
+    calls.extend((balance_token_address, encoder.encode_abi('balanceOf', [address])) for address in addresses)
+
+    try:
+        if block >= multicall_block:
+            calls.insert(0, (multicall_address, encoder.encode_abi('getCurrentBlockTimestamp')))
+            results = aggregate(web3, calls, batch_size, multicall_address, block_identifier=block)
+        else:
+            results = [(True, web3.codec.encode(['uint256'], [web3.eth.get_block(block)['timestamp']]))]
+            results += [_call_directly(web3, target, data, block) for target, data in calls]
+        timestamp, aum, glp_supply = (_decode_uint(web3, result) for result in results[:3])
+        if None in (timestamp, aum, glp_supply):
+            raise ValueError(f"market calls failed: {[result for result in results[:3] if not result[0]]}")
+        balances = {}
+        for address, result in zip(addresses, results[3:]):
+            balance = _decode_uint(web3, result)
+            if balance is not None:
+                balances[address] = balance
+    except Exception as e:
+        logging.error(f"Error reading GLP state at block {block}: {e}")
+        return None
+
+    return {'block': block, 'timestamp': timestamp, 'aum': aum, 'glp_supply': glp_supply, 'balances': balances}
+
+
+def backfill(web3, cache, network, start_block, end_block, addresses=(), balance_token_address=None, step=DEFAULT_STEP,
+             workers=DEFAULT_WORKERS, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+             multicall_address=MULTICALL3_ADDRESS, glp_manager_address=None, glp_token_address=None, multicall_block=None):
+    """
+    Sample the GLP AUM, supply and balances on a block grid into the cache.
+
+    Only blocks missing from the cache are read. They are split into chunks
+    read in parallel, each chunk stored as soon as it is complete, so an
+    interrupted backfill resumes where it stopped. Requests are sent with
+    backfill priority, behind interactive and monitor requests.
+
+    Blocks before the Multicall3 deployment (see ``MULTICALL3_DEPLOYMENT_BLOCKS``,
+    block 7,654,707 on Arbitrum and 11,907,934 on Avalanche) are read with one
+    ``eth_call`` per value, which costs ``3 + len(addresses)`` requests per block.
+
+    Args:
+        web3 (Web3): The Web3 instance of an archive node.
+        cache (BackfillCache): The cache to fill.
+        network (str): 'arbitrum' or 'avalanche', for the default contract addresses.
+        start_block (int): The first block of the range.
+        end_block (int): The last block of the range.
+        addresses (list): The addresses whose balances to sample.
+        balance_token_address (str, optional): The token holding user balances; required with ``addresses``.
+        step (int): The blocks between samples.
+        workers (int): The chunks read in parallel.
+        chunk_size (int): The blocks per chunk.
+        batch_size (int): The maximum number of calls per ``eth_call``.
+        multicall_address (str): The address of the Multicall3 contract.
+        glp_manager_address (str, optional): Overrides the GlpManager of the network.
+        glp_token_address (str, optional): Overrides the GLP token of the network.
+        multicall_block (int, optional): The first block at which ``multicall_address`` exists.
+            Defaults to the chain's Multicall3 deployment block, or 0 for another contract.
+
+    Returns:
+        int: The number of blocks read and stored.
+    """
+    if addresses and not balance_token_address:
+        raise ValueError("balance_token_address is required to sample balances")
+    glp_manager_address = glp_manager_address or GLP_MANAGER_ADDRESSES[network]
+    glp_token_address = glp_token_address or GLP_TOKEN_ADDRESSES[network]
+    addresses = list(addresses)
+    chain_id = web3.eth.chain_id
+
+    if multicall_block is None:
+        multicall_block = MULTICALL3_DEPLOYMENT_BLOCKS.get(chain_id, 0) if multicall_address == MULTICALL3_ADDRESS else 0
+
+    missing = cache.missing_blocks(chain_id, block_grid(start_block, end_block, step), addresses)
+    if not missing:
+        return 0
+    early = sum(1 for block in missing if block < multicall_block)
+    if early:
+        logging.warning(f"{early} {network} blocks predate Multicall3 (deployed at block {multicall_block}); "
+                        f"reading them with one eth_call per value")
+
+    def run_chunk(chunk):
+        with request_priority(PRIORITY_BACKFILL):
+            points = [read_block(web3, block, addresses, glp_manager_address, glp_token_address,
+                                 balance_token_address, batch_size, multicall_address, multicall_block) for block in chunk]
+        points = [point for point in points if point is not None]
+        cache.add_points(chain_id, points)
+        return len(points)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backfill') as executor:
+        stored = sum(executor.map(run_chunk, chunked(missing, chunk_size)))
+
+    logging.info(f"Backfilled {stored} of {len(missing)} missing {network} blocks between {start_block} and {end_block}")
+    return stored
+
+
+def open_backfill_cache(config):
+    """
+    Open the backfill cache configured under ``backfill.cache_path``.
+    """
+    return BackfillCache(config.get('backfill', {}).get('cache_path', DEFAULT_BACKFILL_PATH))
+
+
+def backfill_from_config(config, network, start_block, end_block, addresses=()):
+    """
+    Run :func:`backfill` with the provider, contracts and tuning of the configuration.
+
+    The provider is ``backfill.<prefix>_archive_provider_url`` when set, otherwise
+    the monitor's ``<prefix>_provider_url``; either must serve historical state.
+
+    Args:
+        config (dict): The configuration.
+        network (str): 'arbitrum' or 'avalanche'.
+        start_block (int): The first block of the range.
+        end_block (int): The last block of the range.
+        addresses (list): The addresses whose balances to sample.
+
+    Returns:
+        int: The number of blocks read and stored.
+    """
+    from utils.web3_utils import setup_web3
+
+    settings = config.get('backfill', {})
+    prefix = 'arb' if network == 'arbitrum' else 'avax'
+    web3 = setup_web3(settings.get(f'{prefix}_archive_provider_url') or config[f'{prefix}_provider_url'],
+                      **config.get('rpc_failover', {}))
+    cache = open_backfill_cache(config)
+    try:
+        return backfill(
+            web3, cache, network, start_block, end_block, addresses,
+            balance_token_address=config[f'{prefix}_glp_contract_address'],
+            step=settings.get('step', DEFAULT_STEP),
+            workers=settings.get('workers', DEFAULT_WORKERS),
+            chunk_size=settings.get('chunk_size', DEFAULT_CHUNK_SIZE),
+            batch_size=config.get('multicall_batch_size', DEFAULT_BATCH_SIZE),
+            glp_manager_address=settings.get(f'{prefix}_glp_manager_address'),
+            glp_token_address=settings.get(f'{prefix}_glp_token_address')
+        )
+    finally:
+        cache.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    from utils.config_loader import load_config
+
+    parser = argparse.ArgumentParser(description="Backfill historical GLP prices and balances from an archive node.")
+    parser.add_argument('--network', choices=['arbitrum', 'avalanche'], required=True)
+    parser.add_argument('--start-block', type=int, required=True)
+    parser.add_argument('--end-block', type=int, required=True)
+    parser.add_argument('--address', action='append', default=[], help="A wallet to sample; may be repeated")
+    parser.add_argument('--config', default='config.yaml')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    backfill_from_config(load_config(args.config), args.network, args.start_block, args.end_block, args.address)
@@ -0,0 +1,176 @@
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+# Seconds a value stays fresh, per upstream data source
+CACHE_TTLS = {
+    'coingecko': 60,
+    'subgraph': 300,
+    # Chain-wide market snapshots, shared by every tick, poll and shard refresh within it
+    'market': 15,
+}
+
+DEFAULT_MAXSIZE = 1024
+
+# Stale values are served for up to this many TTLs while a refresh runs
+STALE_FACTOR = 10
+
+LOCK_STRIPES = 64
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded TTL cache with stale-while-revalidate.
+
+    Fresh entries are returned directly. Stale entries are returned as well,
+    while a single background thread per key refreshes them. Missing or
+    expired entries are loaded synchronously, and concurrent callers of the
+    same key wait for one load instead of each calling the loader. The least
+    recently used entry is evicted once ``maxsize`` is reached.
+
+    Args:
+        maxsize (int): The maximum number of entries.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._load_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _refresh(self, key, loader):
+        try:
+            self._store(key, loader())
+        except Exception as e:
+            self.refresh_errors += 1
+            logging.error(f"Error refreshing cached value for {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_load(self, key, loader, ttl, max_stale=None):
+        """
+        Return the cached value of a key, loading or refreshing it when needed.
+
+        Args:
+            key (hashable): The cache key.
+            loader (callable): Called without arguments to produce the value.
+            ttl (float): The number of seconds a value stays fresh.
+            max_stale (float, optional): How long past its TTL a value may still be
+                served while it refreshes. Defaults to ``STALE_FACTOR`` TTLs.
+
+        Returns:
+            object: The cached or freshly loaded value.
+        """
+        if max_stale is None:
+            max_stale = ttl * STALE_FACTOR
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, loaded_at = entry
+                age = time.monotonic() - loaded_at
+                if age <= ttl + max_stale:
+                    self._entries.move_to_end(key)
+                    if age <= ttl:
+                        self.hits += 1
+                        return value
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+                    return value
+
+        with self._load_locks[hash(key) % LOCK_STRIPES]:
+            # Another caller may have loaded the key while we waited
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and time.monotonic() - entry[1] <= ttl:
+                    self.hits += 1
+                    return entry[0]
+                self.misses += 1
+            value = loader()
+            self._store(key, value)
+            return value
+
+
+market_data_cache = TTLCache()
+
+
+def configure_cache(ttls=None, maxsize=None):
+    """
+    Override the per-source TTLs and the size of the shared market data cache.
+
+    Args:
+        ttls (dict, optional): TTLs in seconds keyed by data source.
+        maxsize (int, optional): The maximum number of cached entries.
+    """
+    if ttls:
+        CACHE_TTLS.update(ttls)
+    if maxsize:
+        market_data_cache.maxsize = maxsize
+
+
+def cached(source, errors=(), fallback=None):
+    """
+    Cache a function's results in the shared market data cache.
+
+    The TTL is looked up in ``CACHE_TTLS`` under ``source`` on every call, so
+    :func:`configure_cache` applies to functions that are already decorated.
+    The undecorated function stays available as ``uncached``.
+
+    A function that fails with one of ``errors`` is never cached. If the key
+    has a value that is still within its stale window, that value is served
+    while the refresh is retried. Otherwise the error is logged and
+    ``fallback()`` is returned without being cached.
+
+    Args:
+        source (str): The data source the function queries.
+        errors (tuple, optional): The exceptions that mark a failed load.
+        fallback (callable, optional): Produces the value returned after a failed
+            load; defaults to None.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Bind defaults so f() and f(network='arbitrum') share one entry
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (func.__qualname__, tuple(bound.arguments.items()))
+            try:
+                return market_data_cache.get_or_load(key, lambda: func(*args, **kwargs), CACHE_TTLS[source])
+            except errors as e:
+                logging.error(f"Error loading {func.__qualname__}: {e}")
+                return fallback() if fallback else None
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
@@ -23,4 +23,22 @@ AVALANCHE_TOKEN_ADDRESS_MAP = {
     "0xa7d7079b0fead91f3e65f86e8915cb59c1a4c664": "USDC.e",
     "0xb31f66aa3c1e785363f0875a1b74e27b85fd66c7": "AVAX",
     "0xb97ef9ef8734c71904d8002f8b6bc66dd9c48a6e": "USDC"
-}
\ No newline at end of file
+}
+
+CHAIN_IDS = {'arbitrum': 42161, 'avalanche': 43114}
+
+# GLP token (for the total supply) and GlpManager (for the AUM) read by the historical backfill
+GLP_TOKEN_ADDRESSES = {
+    'arbitrum': "0x4277f8F2c384827B5273592FF7CeBd9f2C1ac258",
+    'avalanche': "0x01234181085565ed162a948b6a5e88758CD7c7b8"
+}
+
+GLP_MANAGER_ADDRESSES = {
+    'arbitrum': "0x321F653eED006AD1C29D174e17d96351BDe22649",
+    'avalanche': "0xe1ae4d4b06A5Fe1fc288f6B4CD72f9F8323B107F"
+}
+
+SUBGRAPH_URLS = {
+    'arbitrum': "https://subgraph.satsuma-prod.com/3b2ced13c8d9/gmx/gmx-arbitrum-stats/api",
+    'avalanche': "https://subgraph.satsuma-prod.com/3b2ced13c8d9/gmx/gmx-avalanche-stats/api"
+}
@@ -0,0 +1,101 @@
+import logging
+
+from hexbytes import HexBytes
+
+from .explorer import TRANSFER_EVENT_TOPIC
+from .log_fetcher import LogRangeFetcher
+
+DEFAULT_POLL_INTERVAL = 2  # seconds between filter polls
+
+ZERO_ADDRESS = '0x' + '00' * 20
+
+
+def topic_to_address(topic):
+    """
+    Extract the lowercase address stored in an indexed log topic.
+
+    Args:
+        topic (bytes or str): A 32-byte topic.
+
+    Returns:
+        str: The lowercase, 0x-prefixed address.
+    """
+    return '0x' + bytes(HexBytes(topic))[-20:].hex()
+
+
+class TransferWatcher:
+    """
+    Follow new blocks and a token's Transfer logs through node-side filters.
+
+    Each poll first asks the block filter whether anything was mined, so an
+    idle chain costs one ``eth_getFilterChanges`` call. Only when new blocks
+    arrived is the log filter polled, and only the watched addresses found in
+    its Transfer logs are reported. ``last_block`` follows the head on every
+    successful poll. When the node forgets a filter, both are reinstalled and
+    the blocks after ``last_block`` are read with ``eth_getLogs`` in bounded
+    windows; a failed read is retried on the next poll.
+
+    Args:
+        contract (Contract): The token contract.
+        user_addresses (list): The addresses to watch.
+        fetcher (LogRangeFetcher, optional): Reads the missed range after a filter is lost.
+    """
+
+    def __init__(self, contract, user_addresses, fetcher=None):
+        self.web3 = contract.w3
+        self.address = contract.address
+        self.watchlist = {address.lower(): address for address in user_addresses}
+        self.fetcher = fetcher or LogRangeFetcher(self.web3)
+        self.last_block = self.web3.eth.block_number
+        self._recovering = False
+        self._install()
+
+    def _install(self):
+        self._block_filter = self.web3.eth.filter('latest')
+        self._log_filter = self.web3.eth.filter({'address': self.address, 'topics': [TRANSFER_EVENT_TOPIC]})
+
+    def _changed_logs(self):
+        if not self._recovering:
+            try:
+                if not self.web3.eth.get_filter_changes(self._block_filter.filter_id):
+                    return []
+                # Read before the log filter, so every log up to the head is in its changes
+                head = self.web3.eth.block_number
+                logs = self.web3.eth.get_filter_changes(self._log_filter.filter_id)
+                self.last_block = max(self.last_block, head)
+                return logs
+            except ValueError as e:
+                logging.error(f"Transfer filter on {self.address} was lost, reinstalling: {e}")
+            self._install()
+            self._recovering = True
+
+        to_block = self.web3.eth.block_number
+        logs = self.fetcher.get_logs({'address': self.address, 'topics': [TRANSFER_EVENT_TOPIC]}, self.last_block + 1, to_block) \
+            if to_block > self.last_block else []
+        self._recovering = False
+        self.last_block = max(self.last_block, to_block)
+        return logs
+
+    def poll(self):
+        """
+        Collect the watched addresses touched by Transfers since the last poll.
+
+        Returns:
+            tuple: The set of watched addresses (as given) whose balance may have
+            changed, and whether a mint or burn changed the total supply.
+        """
+        changed = set()
+        supply_changed = False
+
+        for log in self._changed_logs():
+            topics = log['topics']
+            if len(topics) < 3:
+                continue
+            self.last_block = max(self.last_block, log['blockNumber'])
+            for address in (topic_to_address(topics[1]), topic_to_address(topics[2])):
+                if address == ZERO_ADDRESS:
+                    supply_changed = True
+                elif address in self.watchlist:
+                    changed.add(self.watchlist[address])
+
+        return changed, supply_changed
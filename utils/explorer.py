@@ -0,0 +1,277 @@
+import json
+import logging
+import threading
+import time
+
+from .http_client import http_get
+from .metrics import track_call
+
+EXPLORER_URLS = {
+    'arbitrum': 'https://api.arbiscan.io/api',
+    'avalanche': 'https://api.snowtrace.io/api'
+}
+
+TRANSFER_EVENT_TOPIC = '0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef'
+
+# Explorers refuse page * offset beyond this, whatever the block range
+MAX_RESULT_WINDOW = 10000
+DEFAULT_PAGE_SIZE = 1000
+RATE_LIMIT_RETRIES = 5
+RATE_LIMIT_BACKOFF = 1.0  # seconds, doubled on every retry
+LATEST_BLOCK = 999999999
+
+# Up to this many wallets, each gets its own server-side topic-filtered queries;
+# beyond it, one unfiltered pass over the contract's Transfers is cheaper
+SERVER_FILTER_MAX_WALLETS = 25
+
+EMPTY_RESULT_MESSAGES = ('no transactions found', 'no records found')
+
+
+class ExplorerError(Exception):
+    """Raised when the explorer API returns an error payload."""
+
+
+class RateLimiter:
+    """
+    Space calls at least ``1 / rate`` seconds apart across threads.
+
+    Args:
+        rate (float): The maximum number of calls per second.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._next_call = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_call - now
+            self._next_call = max(now, self._next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def parse_block_number(value):
+    """
+    Parse a block number that the explorer returns as a decimal or hex string.
+    """
+    return int(value, 16) if value.startswith('0x') else int(value)
+
+
+def _record_key(record):
+    return json.dumps(record, sort_keys=True)
+
+
+def request_explorer(network, params, rate_limiter=None):
+    """
+    Send one request to a network's explorer API.
+
+    Requests wait for the explorer host's shared rate limit in ``utils.http_client``.
+
+    Args:
+        network (str): The network to query ('arbitrum' or 'avalanche').
+        params (dict): The query parameters, including the API key.
+        rate_limiter (RateLimiter, optional): Extra spacing on top of the host's rate limit.
+
+    Returns:
+        list: The records of the response; empty when nothing matched.
+
+    Raises:
+        ValueError: If the network is not supported.
+        ExplorerError: If the explorer returns an error.
+    """
+    base_url = EXPLORER_URLS.get(network)
+    if not base_url:
+        raise ValueError(f"Unsupported network: {network}")
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        if rate_limiter is not None:
+            rate_limiter.wait()
+        with track_call('explorer', params.get('action', 'unknown')) as outcome:
+            data = http_get(base_url, params=params).json()
+            message = str(data.get('message', ''))
+            result = str(data.get('result', ''))
+            empty = message.lower() in EMPTY_RESULT_MESSAGES or result == '[]'
+            outcome['error'] = data.get('status') != '1' and not empty
+
+        if data.get('status') == '1':
+            return data['result']
+        if empty:
+            return []
+        if 'rate limit' in result.lower() and attempt < RATE_LIMIT_RETRIES:
+            time.sleep(RATE_LIMIT_BACKOFF * 2 ** attempt)
+            continue
+        raise ExplorerError(f"{message}: {result}")
+
+
+def iter_explorer_records(network, params, start_param, end_param, start_block=0, end_block=LATEST_BLOCK,
+                          page_size=DEFAULT_PAGE_SIZE, rate_limiter=None):
+    """
+    Stream every record of a paginated explorer query in ascending block order.
+
+    Pages are requested with ``page``/``offset``. When the explorer's result
+    window is exhausted, the block window restarts at the last block seen, and
+    the records of that block that were already yielded are skipped.
+
+    Args:
+        network (str): The network to query ('arbitrum' or 'avalanche').
+        params (dict): The query parameters without paging and block bounds.
+        start_param (str): The name of the first-block parameter ('startblock' or 'fromBlock').
+        end_param (str): The name of the last-block parameter ('endblock' or 'toBlock').
+        start_block (int): The first block to include.
+        end_block (int): The last block to include.
+        page_size (int): The number of records per request.
+        rate_limiter (RateLimiter, optional): Extra spacing on top of the host's rate limit.
+
+    Yields:
+        dict: The records, as returned by the explorer.
+    """
+    pages_per_window = max(1, MAX_RESULT_WINDOW // page_size)
+    window_start = start_block
+    seen_at_start = set()  # Records of block window_start that were already yielded
+
+    while True:
+        last_block = window_start
+        last_block_keys = set(seen_at_start)
+        new_records = 0
+
+        for page in range(1, pages_per_window + 1):
+            records = request_explorer(network, dict(
+                params, sort='asc', page=page, offset=page_size, **{start_param: window_start, end_param: end_block}
+            ), rate_limiter)
+
+            for record in records:
+                block_number = parse_block_number(record['blockNumber'])
+                key = _record_key(record)
+                if block_number == window_start and key in seen_at_start:
+                    continue
+                if block_number != last_block:
+                    last_block, last_block_keys = block_number, set()
+                last_block_keys.add(key)
+                new_records += 1
+                yield record
+
+            if len(records) < page_size:
+                return
+
+        if new_records == 0:
+            # A single block holds more records than the explorer can page through
+            logging.error(f"More than {MAX_RESULT_WINDOW} records in block {window_start}; skipping the rest of it")
+            window_start, seen_at_start = window_start + 1, set()
+        else:
+            window_start, seen_at_start = last_block, last_block_keys
+
+
+def iter_token_transfers(contract_address, user_address, api_key, network='arbitrum', start_block=0,
+                         end_block=LATEST_BLOCK, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Stream every token transfer of a user for one token contract.
+
+    Args:
+        contract_address (str): The token contract address.
+        user_address (str): The user's address.
+        api_key (str): The API key for the blockchain explorer.
+        network (str): The network to query ('arbitrum' or 'avalanche').
+        start_block (int): The first block to include.
+        end_block (int): The last block to include.
+        page_size (int): The number of records per request.
+
+    Yields:
+        dict: The explorer's ``tokentx`` records in ascending block order.
+    """
+    params = {
+        'module': 'account',
+        'action': 'tokentx',
+        'address': user_address,
+        'contractaddress': contract_address,
+        'apikey': api_key
+    }
+    return iter_explorer_records(network, params, 'startblock', 'endblock', start_block, end_block, page_size)
+
+
+def iter_contract_logs(contract_address, api_key, network='arbitrum', topics=None, start_block=0,
+                       end_block=LATEST_BLOCK, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Stream every log of a contract, optionally filtered by topics.
+
+    Args:
+        contract_address (str): The contract address.
+        api_key (str): The API key for the blockchain explorer.
+        network (str): The network to query ('arbitrum' or 'avalanche').
+        topics (dict, optional): Topic filters such as ``{'topic0': ...}``.
+        start_block (int): The first block to include.
+        end_block (int): The last block to include.
+        page_size (int): The number of records per request.
+
+    Yields:
+        dict: The explorer's ``getLogs`` records in ascending block order.
+    """
+    params = dict(topics or {}, module='logs', action='getLogs', address=contract_address, apikey=api_key)
+    return iter_explorer_records(network, params, 'fromBlock', 'toBlock', start_block, end_block, page_size)
+
+
+def pad_address_topic(address):
+    """
+    Encode an address as the 32-byte topic of an indexed event argument.
+
+    Args:
+        address (str): The 0x-prefixed address.
+
+    Returns:
+        str: The lowercase, zero-padded topic.
+    """
+    return '0x' + address.lower()[2:].rjust(64, '0')
+
+
+def iter_wallet_transfer_logs(contract_address, api_key, user_addresses, network='arbitrum', start_block=0,
+                              end_block=LATEST_BLOCK, page_size=DEFAULT_PAGE_SIZE,
+                              max_filtered_wallets=None):
+    """
+    Stream the Transfer logs of a token that involve any of several wallets.
+
+    Small watchlists are filtered by the explorer: each wallet gets one query on
+    the sender topic and one on the receiver topic. Larger watchlists are served
+    by a single pass over all of the contract's Transfers, routed to wallets
+    through a padded-topic index.
+
+    Args:
+        contract_address (str): The token contract address.
+        api_key (str): The API key for the blockchain explorer.
+        user_addresses (list): The wallets to collect logs for.
+        network (str): The network to query ('arbitrum' or 'avalanche').
+        start_block (int): The first block to include.
+        end_block (int): The last block to include.
+        page_size (int): The number of records per request.
+        max_filtered_wallets (int, optional): The largest watchlist filtered by the explorer.
+            Defaults to ``SERVER_FILTER_MAX_WALLETS``.
+
+    Yields:
+        tuple: ``(user_address, log)`` for every wallet a log involves, with the
+        address as given. A transfer between two watched wallets is yielded for both.
+    """
+    if max_filtered_wallets is None:
+        max_filtered_wallets = SERVER_FILTER_MAX_WALLETS
+    index = {pad_address_topic(address): address for address in user_addresses}
+
+    if len(index) <= max_filtered_wallets:
+        for topic, address in index.items():
+            for position in ('topic1', 'topic2'):
+                topics = {'topic0': TRANSFER_EVENT_TOPIC, position: topic, f'topic0_{position[-1]}_opr': 'and'}
+                for log in iter_contract_logs(contract_address, api_key, network, topics, start_block, end_block, page_size):
+                    # Self-transfers match both queries; the sender query already yielded them
+                    if position == 'topic2' and log['topics'][1].lower() == topic:
+                        continue
+                    yield address, log
+        return
+
+    for log in iter_contract_logs(contract_address, api_key, network, {'topic0': TRANSFER_EVENT_TOPIC},
+                                  start_block, end_block, page_size):
+        topics = log['topics']
+        if len(topics) < 3:
+            continue
+        sender, receiver = topics[1].lower(), topics[2].lower()
+        if sender in index:
+            yield index[sender], log
+        if receiver in index and receiver != sender:
+            yield index[receiver], log
@@ -0,0 +1,257 @@
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import REGISTRY
+from .rate_limit import PriorityTokenBucket
+from .singleflight import SingleFlight
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = (5, 30)  # (connect, read) seconds
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Sustained requests per second allowed per host; hosts not listed are not throttled
+DEFAULT_RATE_LIMITS = {
+    'api.arbiscan.io': 5,
+    'api.snowtrace.io': 5,
+    'api.coingecko.com': 0.5,
+    'subgraph.satsuma-prod.com': 10,
+}
+
+HTTP_SETTINGS = {
+    'pool_size': DEFAULT_POOL_SIZE,
+    'timeout': DEFAULT_TIMEOUT,
+    'retries': DEFAULT_RETRIES,
+    'backoff': DEFAULT_BACKOFF,
+    'rate_limits': dict(DEFAULT_RATE_LIMITS),
+}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_limiters = {}
+
+# Identical requests waiting for a token or in flight share one response
+request_flight = SingleFlight()
+
+
+def configure_http(pool_size=None, timeout=None, retries=None, backoff=None, rate_limits=None):
+    """
+    Override the HTTP settings. The pool size applies to sessions created after this call.
+
+    Args:
+        pool_size (int, optional): The number of keep-alive connections kept per host.
+        timeout (float or tuple, optional): The request timeout, or a (connect, read) tuple.
+        retries (int, optional): The number of retries on connection errors and 429/5xx responses.
+        backoff (float, optional): The base backoff factor (in seconds) between retries.
+        rate_limits (dict, optional): Requests per second per host (e.g. 'api.arbiscan.io'),
+            merged into the defaults. A limit of 0 or None removes a host's throttling.
+    """
+    for name, value in (('pool_size', pool_size), ('timeout', timeout), ('retries', retries), ('backoff', backoff)):
+        if value is not None:
+            HTTP_SETTINGS[name] = tuple(value) if isinstance(value, list) else value
+    if rate_limits:
+        HTTP_SETTINGS['rate_limits'].update(rate_limits)
+        with _sessions_lock:
+            _limiters.clear()
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_session(url):
+    """
+    Return the shared, pooled session for the host of a URL.
+
+    Args:
+        url (str): Any URL on the host.
+
+    Returns:
+        requests.Session: A session with keep-alive pooling. It does not retry; see :func:`send_request`.
+    """
+    key = _host_key(url)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_SETTINGS['pool_size'])
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[key] = session
+        return session
+
+
+def get_limiter(url):
+    """
+    Return the shared token bucket of a URL's host, or None if the host is not throttled.
+
+    Args:
+        url (str): Any URL on the host.
+
+    Returns:
+        PriorityTokenBucket: The host's limiter, or None.
+    """
+    host = urlsplit(url).netloc
+    rate = HTTP_SETTINGS['rate_limits'].get(host)
+    if not rate:
+        return None
+    with _sessions_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = PriorityTokenBucket(rate)
+        return limiter
+
+
+def _request_key(method, url, kwargs):
+    try:
+        return method, url, json.dumps({name: kwargs[name] for name in ('params', 'json', 'data') if name in kwargs},
+                                       sort_keys=True, default=str)
+    except TypeError:
+        return None
+
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt):
+    # Exponential backoff spread by up to 100% random jitter
+    return HTTP_SETTINGS['backoff'] * 2 ** attempt * (1 + random.random())
+
+
+def send_request(method, url, **kwargs):
+    """
+    Send a request through the pooled session of the URL's host, after the host's rate limit.
+
+    Requests to a throttled host wait for a token, highest priority first (see
+    :func:`utils.rate_limit.request_priority`). Identical requests, i.e. with
+    the same method, URL and parameters, that are waiting or in flight at the
+    same time are sent once and share the response.
+
+    Connection errors and 429/5xx responses are retried up to ``retries`` times
+    with jittered exponential backoff. Every attempt takes its own token, and a
+    Retry-After header pauses the host's limiter, so retries never exceed the
+    host's rate. The last response is returned whatever its status.
+
+    Args:
+        method (str): 'GET' or 'POST'.
+        url (str): The URL to request.
+        **kwargs: Passed to ``requests.Session.request``.
+
+    Returns:
+        requests.Response: The response.
+    """
+    kwargs.setdefault('timeout', HTTP_SETTINGS['timeout'])
+    limiter = get_limiter(url)
+
+    def send():
+        retries = HTTP_SETTINGS['retries']
+        for attempt in range(retries + 1):
+            if limiter is not None:
+                REGISTRY.observe('glp_rate_limit_wait_seconds', limiter.acquire(), host=urlsplit(url).netloc)
+            try:
+                response = get_session(url).request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= retries:
+                    raise
+                time.sleep(_backoff(attempt))
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                return response
+            delay = _retry_after(response)
+            if delay is not None and limiter is not None:
+                # Holds back every request to the host, not only this retry
+                limiter.pause(delay)
+            else:
+                time.sleep(_backoff(attempt) if delay is None else delay)
+
+    key = _request_key(method, url, kwargs)
+    return send() if key is None else request_flight.do(key, send)
+
+
+def http_get(url, **kwargs):
+    """
+    Send a GET request through the pooled session of the URL's host (see :func:`send_request`).
+
+    Args:
+        url (str): The URL to request.
+        **kwargs: Passed to ``requests.Session.get``.
+
+    Returns:
+        requests.Response: The response.
+    """
+    return send_request('GET', url, **kwargs)
+
+
+def http_post(url, **kwargs):
+    """
+    Send a POST request through the pooled session of the URL's host (see :func:`send_request`).
+
+    Args:
+        url (str): The URL to request.
+        **kwargs: Passed to ``requests.Session.post``.
+
+    Returns:
+        requests.Response: The response.
+    """
+    return send_request('POST', url, **kwargs)
+
+
+def connection_stats():
+    """
+    Count new and reused connections across every pooled session.
+
+    Returns:
+        dict: Per-host counts of 'requests', 'new_connections' and 'reused_connections',
+        plus the totals under 'total'.
+    """
+    stats = {}
+    with _sessions_lock:
+        sessions = list(_sessions.items())
+
+    for key, session in sessions:
+        host_stats = {'requests': 0, 'new_connections': 0}
+        adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+        for adapter in adapters.values():
+            pools = adapter.poolmanager.pools
+            for pool_key in list(pools.keys()):
+                pool = pools.get(pool_key)
+                if pool is not None:
+                    host_stats['requests'] += pool.num_requests
+                    host_stats['new_connections'] += pool.num_connections
+        host_stats['reused_connections'] = host_stats['requests'] - host_stats['new_connections']
+        stats[key] = host_stats
+
+    stats['total'] = {
+        name: sum(host_stats[name] for host_stats in stats.values())
+        for name in ('requests', 'new_connections', 'reused_connections')
+    }
+    return stats
+
+
+def close_sessions():
+    """Close every pooled session and forget it."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
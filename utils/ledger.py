@@ -0,0 +1,284 @@
+import json
+import logging
+import os
+import random
+import time
+
+from hexbytes import HexBytes
+
+from .constants import DECIMALS
+from .event_watcher import ZERO_ADDRESS, topic_to_address
+from .explorer import TRANSFER_EVENT_TOPIC
+from .log_fetcher import LogRangeFetcher
+from .multicall import DEFAULT_BATCH_SIZE, MULTICALL3_ADDRESS, aggregate
+
+DEFAULT_LEDGER_PATH = 'data/ledger'
+DEFAULT_DRIFT_SAMPLE = 50  # addresses re-read from chain state per drift check
+DEFAULT_SAVE_INTERVAL = 60  # seconds between writes of a ledger that only applied deltas
+
+
+class BalanceLedger:
+    """
+    GLP balances of a watchlist kept current from Transfer log deltas.
+
+    The ledger is seeded once from ``balanceOf`` reads pinned to one block.
+    After that, each sync fetches the Transfer logs of the blocks mined since
+    and applies their amounts, so only addresses that transferred are touched
+    and no balances are read. The state is written to a JSON file right after
+    balances are seeded, and otherwise at most every ``save_interval`` seconds,
+    so a sync costs in proportion to transfer activity rather than to the
+    watchlist. A restart resumes from the last written block and re-applies
+    the deltas since. Addresses added to the watchlist are seeded at the head,
+    once the existing balances have been synced to it, so a pruned node that
+    no longer serves old state can still seed them.
+
+    Sampled ``balanceOf`` checks (see :meth:`check_drift`) repair anything the
+    deltas missed, such as a reorged block or a rebasing transfer.
+
+    Args:
+        contract (Contract): The GLP contract instance.
+        user_addresses (list): The addresses to keep balances for.
+        path (str, optional): The JSON file the ledger is persisted to.
+        fetcher (LogRangeFetcher, optional): Fetches the Transfer logs.
+        save_interval (float): Seconds between writes of a ledger that only applied deltas.
+    """
+
+    def __init__(self, contract, user_addresses, path=None, fetcher=None, save_interval=DEFAULT_SAVE_INTERVAL):
+        self.contract = contract
+        self.web3 = contract.w3
+        self.watchlist = {address.lower(): address for address in user_addresses}
+        self.path = path
+        self.fetcher = fetcher or LogRangeFetcher(self.web3)
+        self.save_interval = save_interval
+        self.balances = {}  # lowercase address -> balance in wei
+        self.total_supply = None  # in wei, None until it has been read
+        self.last_block = None
+        self.errors = {}
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError) as e:
+            logging.error(f"Error loading balance ledger {self.path}, reseeding: {e}")
+            return
+        if state.get('contract', '').lower() != self.contract.address.lower():
+            return
+        self.last_block = state['last_block']
+        self.total_supply = None if state['total_supply'] is None else int(state['total_supply'])
+        self.balances = {address: int(balance) for address, balance in state['balances'].items() if address in self.watchlist}
+
+    def save(self):
+        """Write the ledger to its file atomically; does nothing without a path."""
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        if not self.path:
+            return
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        state = {
+            'contract': self.contract.address,
+            'last_block': self.last_block,
+            'total_supply': None if self.total_supply is None else str(self.total_supply),
+            'balances': {address: str(balance) for address, balance in self.balances.items()},
+        }
+        temporary_path = f'{self.path}.tmp'
+        with open(temporary_path, 'w') as state_file:
+            json.dump(state, state_file)
+        os.replace(temporary_path, self.path)
+
+    def flush(self):
+        """Write the ledger if it has changes that were not written yet."""
+        if self._dirty:
+            self.save()
+
+    def read_balances(self, addresses, block, batch_size=DEFAULT_BATCH_SIZE, multicall_address=MULTICALL3_ADDRESS):
+        """
+        Read the total supply and the balances of some addresses at one block.
+
+        Args:
+            addresses (list): Lowercase watched addresses.
+            block (int): The block to read at.
+            batch_size (int): The maximum number of calls per multicall request.
+            multicall_address (str): The address of the Multicall3 contract.
+
+        Returns:
+            tuple: The total supply in wei (None if it could not be read), the balances
+            in wei keyed by address, and an error message for every address that failed.
+        """
+        keys = [None] + list(addresses)
+        calls = [(self.contract.address, self.contract.encode_abi('totalSupply'))]
+        calls += [(self.contract.address, self.contract.encode_abi('balanceOf', args=[self.web3.to_checksum_address(address)]))
+                  for address in addresses]
+        results = aggregate(self.web3, calls, batch_size, multicall_address, block_identifier=block)
+
+        total_supply = None
+        balances = {}
+        errors = {}
+        for key, (success, result) in zip(keys, results):
+            if success:
+                try:
+                    value = self.web3.codec.decode(['uint256'], result)[0]
+                except Exception as e:
+                    result = f"could not decode return data: {e}"
+                else:
+                    if key is None:
+                        total_supply = value
+                    else:
+                        balances[key] = value
+                    continue
+            errors['totalSupply' if key is None else key] = result
+        return total_supply, balances, errors
+
+    def seed(self, block, batch_size=DEFAULT_BATCH_SIZE, multicall_address=MULTICALL3_ADDRESS):
+        """
+        Read the watched addresses that have no balance yet at ``block``.
+
+        The total supply is read along with them, and on its own while it is
+        still unknown. A failed read is recorded in :attr:`errors` and retried by
+        the next seed instead of being stored. The ledger is written after every read.
+
+        Args:
+            block (int): The block the ledger is (or will be) synced to.
+            batch_size (int): The maximum number of calls per multicall request.
+            multicall_address (str): The address of the Multicall3 contract.
+
+        Returns:
+            set: The lowercase addresses that were seeded.
+        """
+        missing = [address for address in self.watchlist if address not in self.balances]
+        if not missing and self.total_supply is not None and self.last_block is not None:
+            self.errors = {}
+            return set()
+
+        total_supply, balances, errors = self.read_balances(missing, block, batch_size, multicall_address)
+        for key, error in errors.items():
+            logging.error(f"Error seeding GLP balance ledger for {key}: {error}")
+        if total_supply is not None:
+            self.total_supply = total_supply
+        self.balances.update(balances)
+        self.errors = {address: errors[address] for address in missing if address in errors}
+        if self.total_supply is None:
+            self.errors['totalSupply'] = errors['totalSupply']
+        self.last_block = block
+        self.save()
+        return set(balances)
+
+    def apply_logs(self, logs):
+        """
+        Apply the amounts of Transfer logs to the watched balances and the total supply.
+
+        Logs at or before the last synced block are skipped, so overlapping
+        ranges are never counted twice.
+
+        Args:
+            logs (list): Transfer logs in block order.
+
+        Returns:
+            set: The lowercase watched addresses whose balance changed.
+        """
+        changed = set()
+        for log in logs:
+            topics = log['topics']
+            if len(topics) < 3 or log['blockNumber'] <= self.last_block:
+                continue
+            amount = int.from_bytes(bytes(HexBytes(log['data'])), 'big')
+            sender, recipient = topic_to_address(topics[1]), topic_to_address(topics[2])
+
+            if sender == ZERO_ADDRESS:
+                if self.total_supply is not None:
+                    self.total_supply += amount
+            elif sender in self.balances:
+                self.balances[sender] -= amount
+                changed.add(sender)
+            if recipient == ZERO_ADDRESS:
+                if self.total_supply is not None:
+                    self.total_supply -= amount
+            elif recipient in self.balances:
+                self.balances[recipient] += amount
+                changed.add(recipient)
+        return changed
+
+    def sync(self, batch_size=DEFAULT_BATCH_SIZE, multicall_address=MULTICALL3_ADDRESS):
+        """
+        Bring the ledger up to the latest block.
+
+        The first sync seeds every balance; later syncs fetch Transfer logs and
+        only seed addresses that have no balance yet, at the head. Applied
+        deltas are written once ``save_interval`` has passed since the last write.
+
+        Args:
+            batch_size (int): The maximum number of calls per multicall request.
+            multicall_address (str): The address of the Multicall3 contract.
+
+        Returns:
+            set: The watched addresses (as given) whose balance was seeded or changed.
+        """
+        head = self.web3.eth.block_number
+        changed = set()
+
+        if self.last_block is not None and head > self.last_block:
+            logs = self.fetcher.get_logs(
+                {'address': self.contract.address, 'topics': [TRANSFER_EVENT_TOPIC]}, self.last_block + 1, head)
+            changed |= self.apply_logs(logs)
+            self.last_block = head
+            self._dirty = True
+        changed |= self.seed(head if self.last_block is None else self.last_block, batch_size, multicall_address)
+
+        if time.monotonic() - self._saved_at >= self.save_interval:
+            self.flush()
+        return {self.watchlist[address] for address in changed}
+
+    def check_drift(self, sample_size=DEFAULT_DRIFT_SAMPLE, batch_size=DEFAULT_BATCH_SIZE, multicall_address=MULTICALL3_ADDRESS):
+        """
+        Compare a random sample of balances and the total supply with chain state.
+
+        Drifted values are logged and replaced by the chain's.
+
+        Args:
+            sample_size (int): The number of addresses to re-read.
+            batch_size (int): The maximum number of calls per multicall request.
+            multicall_address (str): The address of the Multicall3 contract.
+
+        Returns:
+            set: The watched addresses (as given) whose balance had drifted.
+        """
+        if self.last_block is None:
+            return set()
+        sample = random.sample(sorted(self.balances), min(sample_size, len(self.balances)))
+        total_supply, balances, _ = self.read_balances(sample, self.last_block, batch_size, multicall_address)
+
+        drifted = {address for address, balance in balances.items() if balance != self.balances[address]}
+        for address in drifted:
+            logging.warning(f"GLP balance ledger drifted for {address} at block {self.last_block}: "
+                            f"{self.balances[address]} != {balances[address]}")
+        self.balances.update(balances)
+        if total_supply is not None and total_supply != self.total_supply:
+            if self.total_supply is not None:
+                logging.warning(f"GLP balance ledger supply drifted at block {self.last_block}: {self.total_supply} != {total_supply}")
+            self.total_supply = total_supply
+            self.errors.pop('totalSupply', None)
+            self.save()
+        elif drifted:
+            self.save()
+        return {self.watchlist[address] for address in drifted}
+
+    def snapshot(self):
+        """
+        Return the ledger in the format of :func:`utils.monitor.get_batched_glp_balances`.
+
+        Returns:
+            dict: The total supply (0 while it could not be read), the balances keyed by
+            user address, and an error message for every read that failed (keyed by
+            'totalSupply' or user address).
+        """
+        return {
+            'total_supply': (self.total_supply or 0) / (10 ** DECIMALS),
+            'balances': {original: self.balances.get(address, 0) / (10 ** DECIMALS) for address, original in self.watchlist.items()},
+            'errors': {self.watchlist.get(key, key): error for key, error in self.errors.items()},
+        }
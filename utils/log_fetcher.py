@@ -0,0 +1,203 @@
+import logging
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_INITIAL_STEP = 2048
+DEFAULT_MIN_STEP = 1
+DEFAULT_MAX_STEP = 100000
+DEFAULT_TARGET_LOGS = 5000
+DEFAULT_SEGMENT_SIZE = 100000
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 3
+
+# Substrings (lowercased) that public RPCs use when a log query spans too many blocks or results
+RANGE_ERROR_MARKERS = (
+    'too many results',
+    'returned more than',
+    'more than 10000 results',
+    'block range',
+    'range limit',
+    'range is too large',
+    'response size',
+    'query timeout',
+)
+
+# Substrings (lowercased) of rate-limit errors, which also use code -32005 and "limit exceeded"
+RATE_LIMIT_MARKERS = ('rate limit', 'too many requests', 'request count exceeded', 'request limit')
+
+
+class LogFetchError(Exception):
+    """Raised when a block range still fails after all retries."""
+
+    def __init__(self, from_block, to_block, error):
+        super().__init__(f"Error fetching logs from blocks {from_block} to {to_block}: {error}")
+        self.from_block = from_block
+        self.to_block = to_block
+        self.error = error
+
+
+def is_range_error(error):
+    """
+    Check whether an RPC error means the requested block range was too large.
+
+    Rate-limit errors are never range errors, so they are retried with backoff
+    and fail over instead of shrinking the window.
+
+    Args:
+        error (Exception): The error raised by ``eth_getLogs``.
+
+    Returns:
+        bool: True if the query should be retried with a smaller range.
+    """
+    message = str(error).lower()
+    if any(marker in message for marker in RATE_LIMIT_MARKERS):
+        return False
+    return any(marker in message for marker in RANGE_ERROR_MARKERS)
+
+
+class LogRangeFetcher:
+    """
+    Fetch ``eth_getLogs`` results over large block ranges.
+
+    The range is split into disjoint segments that a worker pool fetches in
+    parallel. Inside a segment, the window shrinks on range-limit errors and
+    grows again, below the last rejected size, while results stay sparse.
+    Other errors are retried with jittered exponential backoff, and logs are
+    always returned in block order.
+
+    Args:
+        web3 (Web3): The Web3 instance.
+        initial_step (int): The first window size, in blocks.
+        min_step (int): The smallest window size before a range error is fatal.
+        max_step (int): The largest window size.
+        target_logs (int): Windows returning more logs than this shrink; windows
+            returning less than a quarter of it grow.
+        segment_size (int): The number of blocks handed to one worker at a time.
+        workers (int): The number of parallel workers.
+        retries (int): The number of retries for a window that fails with a non-range error.
+        backoff (float): The base delay (in seconds) between retries.
+    """
+
+    def __init__(self, web3, initial_step=DEFAULT_INITIAL_STEP, min_step=DEFAULT_MIN_STEP, max_step=DEFAULT_MAX_STEP,
+                 target_logs=DEFAULT_TARGET_LOGS, segment_size=DEFAULT_SEGMENT_SIZE, workers=DEFAULT_WORKERS,
+                 retries=DEFAULT_RETRIES, backoff=0.5):
+        self.web3 = web3
+        self.initial_step = initial_step
+        self.min_step = min_step
+        self.max_step = max_step
+        self.target_logs = target_logs
+        self.segment_size = segment_size
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+
+    def _get_logs(self, filter_params, from_block, to_block):
+        attempt = 0
+        while True:
+            try:
+                return self.web3.eth.get_logs(dict(filter_params, fromBlock=from_block, toBlock=to_block))
+            except Exception as e:
+                if is_range_error(e) or attempt >= self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt) * (1 + random.random())
+                logging.warning(f"Retrying logs from blocks {from_block} to {to_block} in {delay:.2f}s: {e}")
+                time.sleep(delay)
+                attempt += 1
+
+    def fetch_range(self, filter_params, from_block, to_block):
+        """
+        Fetch the logs of one segment with an adaptive window.
+
+        Args:
+            filter_params (dict): The ``eth_getLogs`` filter without block bounds.
+            from_block (int): The first block of the segment.
+            to_block (int): The last block of the segment.
+
+        Returns:
+            list: The logs of the segment in block order.
+
+        Raises:
+            LogFetchError: If a window fails after all retries or at the minimum step.
+        """
+        logs = []
+        step = self.initial_step
+        ceiling = self.max_step
+        current_block = from_block
+
+        while current_block <= to_block:
+            window_end = min(current_block + step - 1, to_block)
+            try:
+                window_logs = self._get_logs(filter_params, current_block, window_end)
+            except Exception as e:
+                if is_range_error(e) and step > self.min_step:
+                    # Never grow back to a window the node already rejected
+                    step = ceiling = max(self.min_step, step // 2)
+                    continue
+                raise LogFetchError(current_block, window_end, e) from e
+
+            logs.extend(window_logs)
+            current_block = window_end + 1
+
+            if len(window_logs) > self.target_logs:
+                step = max(self.min_step, step // 2)
+            elif len(window_logs) < self.target_logs // 4:
+                step = min(ceiling, step * 2)
+
+        logs.sort(key=lambda log: (log['blockNumber'], log['logIndex']))
+        return logs
+
+    def iter_logs(self, filter_params, from_block, to_block):
+        """
+        Fetch logs over a block range in parallel and yield them segment by segment.
+
+        Segments are yielded in block order as soon as they and every segment
+        before them are complete, so callers can checkpoint after each one.
+
+        Args:
+            filter_params (dict): The ``eth_getLogs`` filter without block bounds.
+            from_block (int): The first block to fetch.
+            to_block (int): The last block to fetch.
+
+        Yields:
+            tuple: The last block of the segment and its logs in block order.
+
+        Raises:
+            LogFetchError: If a segment cannot be fetched.
+        """
+        segments = ((start, min(start + self.segment_size - 1, to_block))
+                    for start in range(from_block, to_block + 1, self.segment_size))
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                for segment_start, segment_end in segments:
+                    pending.append((segment_end, executor.submit(self.fetch_range, filter_params, segment_start, segment_end)))
+                    if len(pending) >= self.workers * 2:
+                        segment_end, future = pending.popleft()
+                        yield segment_end, future.result()
+
+                while pending:
+                    segment_end, future = pending.popleft()
+                    yield segment_end, future.result()
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def get_logs(self, filter_params, from_block, to_block):
+        """
+        Fetch every log over a block range in block order.
+
+        Args:
+            filter_params (dict): The ``eth_getLogs`` filter without block bounds.
+            from_block (int): The first block to fetch.
+            to_block (int): The last block to fetch.
+
+        Returns:
+            list: The logs in block order.
+        """
+        logs = []
+        for _, segment_logs in self.iter_logs(filter_params, from_block, to_block):
+            logs.extend(segment_logs)
+        return logs
@@ -0,0 +1,127 @@
+import os
+import sqlite3
+import threading
+
+DEFAULT_INDEX_PATH = 'data/mint_index.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mint_events (
+    chain_id INTEGER NOT NULL,
+    contract TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    transaction_hash TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (chain_id, contract, transaction_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS mint_events_block ON mint_events (chain_id, contract, block_number, log_index);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    chain_id INTEGER NOT NULL,
+    contract TEXT NOT NULL,
+    last_block INTEGER NOT NULL,
+    PRIMARY KEY (chain_id, contract)
+);
+"""
+
+
+class MintLogIndex:
+    """
+    On-disk SQLite index of decoded Mint events with a per-contract checkpoint.
+
+    Events and the checkpoint of a block range are written in one transaction,
+    so an interrupted scan resumes from the last fully indexed block.
+
+    Args:
+        path (str): The path of the SQLite database, or ':memory:'.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def get_checkpoint(self, chain_id, contract):
+        """
+        Return the last indexed block of a contract, or None if it was never scanned.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT last_block FROM checkpoints WHERE chain_id = ? AND contract = ?",
+                (chain_id, contract.lower())
+            ).fetchone()
+        return row[0] if row else None
+
+    def add_events(self, chain_id, contract, events, last_block):
+        """
+        Store decoded Mint events and advance the checkpoint in one transaction.
+
+        Args:
+            chain_id (int): The chain ID.
+            contract (str): The contract address.
+            events (list): Dicts with 'blockNumber', 'logIndex', 'transactionHash', 'amount' and 'price'.
+            last_block (int): The last block covered by ``events``.
+        """
+        contract = contract.lower()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO mint_events VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(chain_id, contract, event['blockNumber'], event['logIndex'], event['transactionHash'],
+                  str(event['amount']), event['price']) for event in events]
+            )
+            self._connection.execute(
+                "INSERT INTO checkpoints VALUES (?, ?, ?) "
+                "ON CONFLICT (chain_id, contract) DO UPDATE SET last_block = MAX(last_block, excluded.last_block)",
+                (chain_id, contract, last_block)
+            )
+
+    def get_prices(self, chain_id, contract, from_block=None, to_block=None):
+        """
+        Return the indexed Mint prices of a contract in block order.
+        """
+        return [event['price'] for event in self.get_history(chain_id, contract, from_block, to_block)]
+
+    def get_history(self, chain_id, contract, from_block=None, to_block=None):
+        """
+        Return the indexed Mint events of a contract in block order.
+
+        Args:
+            chain_id (int): The chain ID.
+            contract (str): The contract address.
+            from_block (int, optional): The first block to include.
+            to_block (int, optional): The last block to include.
+
+        Returns:
+            list: Dicts with 'blockNumber', 'logIndex', 'transactionHash', 'amount' and 'price'.
+        """
+        query = ("SELECT block_number, log_index, transaction_hash, amount, price FROM mint_events "
+                 "WHERE chain_id = ? AND contract = ? AND block_number >= ? AND block_number <= ? "
+                 "ORDER BY block_number, log_index")
+        bounds = (
+            from_block if from_block is not None else 0,
+            to_block if to_block is not None else 2 ** 63 - 1
+        )
+        with self._lock:
+            rows = self._connection.execute(query, (chain_id, contract.lower()) + bounds).fetchall()
+        return [
+            {'blockNumber': block_number, 'logIndex': log_index, 'transactionHash': transaction_hash,
+             'amount': int(amount), 'price': price}
+            for block_number, log_index, transaction_hash, amount, price in rows
+        ]
+
+    def get_average_price(self, chain_id, contract):
+        """
+        Return the average indexed Mint price of a contract, or None if no events are indexed.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT AVG(price) FROM mint_events WHERE chain_id = ? AND contract = ?",
+                (chain_id, contract.lower())
+            ).fetchone()
+        return row[0]
@@ -0,0 +1,359 @@
+import bisect
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_METRICS_PORT = 9108
+# Loopback only by default; the endpoint is unauthenticated
+DEFAULT_METRICS_ADDRESS = '127.0.0.1'
+
+# Upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms rendered in the Prometheus text format.
+
+    Recording a sample takes one lock and a dict lookup, so it can sit on
+    every upstream call. Values that already live elsewhere, such as cache
+    statistics, are read by collectors when the metrics are scraped.
+
+    Args:
+        buckets (tuple): The upper bounds of every histogram's buckets, in seconds.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._help = {}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def describe(self, metric, kind, help_text):
+        """Set the type ('counter', 'gauge' or 'histogram') and help text of a metric."""
+        self._help[metric] = (kind, help_text)
+
+    def inc(self, metric, amount=1, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set(self, metric, value, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, metric, value, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.counts[position] += 1
+            histogram.sum += value
+            histogram.count += 1
+
+    def get(self, metric, **labels):
+        """Return the value of a counter or gauge, or 0 if it was never recorded."""
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            return self._counters.get(key, self._gauges.get(key, 0))
+
+    def register_collector(self, collector):
+        """
+        Add a callable run on every scrape.
+
+        It returns ``(name, kind, help, samples)`` tuples, where ``samples`` is
+        a list of ``(labels dict, value)`` pairs.
+        """
+        self._collectors.append(collector)
+
+    def drain(self):
+        """
+        Remove and return every counter, gauge and histogram sample.
+
+        Lets a worker process hand its samples to the registry that is served,
+        see :meth:`merge`. Collectors are not included.
+
+        Returns:
+            dict: Picklable 'counters', 'gauges' and 'histograms'.
+        """
+        with self._lock:
+            samples = {
+                'counters': self._counters,
+                'gauges': self._gauges,
+                'histograms': {key: (histogram.counts, histogram.sum, histogram.count)
+                               for key, histogram in self._histograms.items()},
+            }
+            self._counters, self._gauges, self._histograms = {}, {}, {}
+        return samples
+
+    def merge(self, samples):
+        """
+        Add samples from :meth:`drain`: counters and histograms are summed, gauges replaced.
+        """
+        with self._lock:
+            for key, value in samples['counters'].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            self._gauges.update(samples['gauges'])
+            for key, (counts, total, count) in samples['histograms'].items():
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = _Histogram(self.buckets)
+                histogram.counts = [current + added for current, added in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += count
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition text.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: (list(h.counts), h.sum, h.count) for key, h in self._histograms.items()}
+
+        families = {}
+        for (name, labels), value in sorted(counters.items()) + sorted(gauges.items()):
+            families.setdefault(name, []).append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for (name, labels), (counts, total, count) in sorted(histograms.items()):
+            lines = families.setdefault(name, [])
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                bucket_labels = labels + (('le', _format_value(float(bound))),)
+                lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+        for collector in self._collectors:
+            try:
+                collected = collector()
+            except Exception as e:
+                logging.error(f"Error collecting metrics from {collector}: {e}")
+                continue
+            for name, kind, help_text, samples in collected:
+                self._help.setdefault(name, (kind, help_text))
+                families.setdefault(name, []).extend(
+                    f'{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}' for labels, value in samples)
+
+        output = []
+        for name in sorted(families):
+            if name in self._help:
+                kind, help_text = self._help[name]
+                output.append(f'# HELP {name} {help_text}')
+                output.append(f'# TYPE {name} {kind}')
+            output.extend(families[name])
+        return '\n'.join(output) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+REGISTRY.describe('glp_upstream_requests_total', 'counter', 'Upstream requests by kind (rpc, explorer, subgraph, price) and name.')
+REGISTRY.describe('glp_upstream_errors_total', 'counter', 'Upstream requests that failed or returned an error.')
+REGISTRY.describe('glp_upstream_request_duration_seconds', 'histogram', 'Latency of upstream requests.')
+REGISTRY.describe('glp_tick_duration_seconds', 'histogram', 'Duration of monitor ticks by refresh mode.')
+REGISTRY.describe('glp_last_tick_timestamp_seconds', 'gauge', 'Unix time the last monitor tick finished.')
+REGISTRY.describe('glp_backlog', 'gauge', 'Refresh work queued or running but not finished, by refresh mode.')
+REGISTRY.describe('glp_rate_limit_wait_seconds', 'histogram', 'Time outbound requests waited for their host rate limit.')
+REGISTRY.describe('glp_shard_lag_seconds', 'gauge', 'How late the last shard of each tier started.')
+
+
+def record_call(kind, name, seconds, error=False):
+    """
+    Record one upstream request.
+
+    Args:
+        kind (str): 'rpc', 'explorer', 'subgraph' or 'price'.
+        name (str): The RPC method, explorer action, subgraph entity or price source.
+        seconds (float): The request latency.
+        error (bool): Whether the request failed.
+    """
+    REGISTRY.inc('glp_upstream_requests_total', kind=kind, name=name)
+    REGISTRY.observe('glp_upstream_request_duration_seconds', seconds, kind=kind, name=name)
+    if error:
+        REGISTRY.inc('glp_upstream_errors_total', kind=kind, name=name)
+
+
+@contextmanager
+def track_call(kind, name):
+    """
+    Time the enclosed upstream request and record it, as an error if it raises.
+
+    Yields:
+        dict: Set ``'error'`` to True in it to record a failure that did not raise.
+    """
+    outcome = {'error': False}
+    started = time.perf_counter()
+    try:
+        yield outcome
+    except Exception:
+        outcome['error'] = True
+        raise
+    finally:
+        record_call(kind, name, time.perf_counter() - started, outcome['error'])
+
+
+def timed_call(kind, name):
+    """Decorate a function so every call is recorded with :func:`track_call`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_call(kind, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe_tick(mode, seconds):
+    """
+    Record the duration of one monitor tick.
+
+    Args:
+        mode (str): 'interval', 'events', 'ledger', 'sharded' or 'async'.
+        seconds (float): How long the tick took.
+    """
+    REGISTRY.observe('glp_tick_duration_seconds', seconds, mode=mode)
+    REGISTRY.set('glp_last_tick_timestamp_seconds', time.time(), mode=mode)
+
+
+def set_backlog(mode, size):
+    REGISTRY.set('glp_backlog', size, mode=mode)
+
+
+def _cache_metrics():
+    from .cache import market_data_cache
+    return [
+        ('glp_cache_lookups_total', 'counter', 'Market data cache lookups by result.', [
+            ({'result': 'hit'}, market_data_cache.hits),
+            ({'result': 'stale'}, market_data_cache.stale_hits),
+            ({'result': 'miss'}, market_data_cache.misses),
+        ]),
+        ('glp_cache_refresh_errors_total', 'counter', 'Failed background refreshes of stale cache entries.',
+         [({}, market_data_cache.refresh_errors)]),
+        ('glp_cache_entries', 'gauge', 'Entries in the market data cache.', [({}, len(market_data_cache))]),
+    ]
+
+
+def _connection_metrics():
+    from .http_client import connection_stats
+    stats = connection_stats()
+    stats.pop('total')
+    return [('glp_http_connections_total', 'counter', 'Pooled HTTP connections opened or reused, per host.', [
+        ({'host': host, 'state': state}, host_stats[f'{state}_connections'])
+        for host, host_stats in stats.items() for state in ('new', 'reused')
+    ])]
+
+
+def _rate_limit_metrics():
+    from .http_client import _limiters, request_flight
+    return [
+        ('glp_rate_limit_queued', 'gauge', 'Outbound requests waiting for their host rate limit.',
+         [({'host': host}, limiter.queued()) for host, limiter in list(_limiters.items())]),
+        ('glp_merged_requests_total', 'counter', 'Outbound requests served by an identical request already queued or in flight.',
+         [({}, request_flight.shared)]),
+    ]
+
+
+def _endpoint_metrics():
+    from .rpc_pool import POOLS
+    pools = sorted(list(POOLS), key=lambda pool: pool.id)
+    # Labelled by position and host, never by URL, which may embed an API key
+    endpoints = [
+        ({'pool': pool.id, 'endpoint': position, 'host': endpoint['host']}, endpoint)
+        for pool in pools for position, endpoint in enumerate(pool.stats())
+    ]
+    return [
+        ('glp_rpc_endpoint_healthy', 'gauge', 'Whether an RPC endpoint of a failover pool is in rotation.',
+         [(labels, int(endpoint['healthy'])) for labels, endpoint in endpoints]),
+        ('glp_rpc_endpoint_latency_seconds', 'gauge', 'Moving average latency of an RPC endpoint of a failover pool.',
+         [(labels, endpoint['latency']) for labels, endpoint in endpoints if endpoint['latency'] is not None]),
+        ('glp_rpc_hedged_requests_total', 'counter', 'RPC requests duplicated to a second endpoint after the hedge delay.',
+         [({}, sum(pool.hedged for pool in pools))]),
+    ]
+
+
+REGISTRY.register_collector(_cache_metrics)
+REGISTRY.register_collector(_connection_metrics)
+REGISTRY.register_collector(_endpoint_metrics)
+REGISTRY.register_collector(_rate_limit_metrics)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port=DEFAULT_METRICS_PORT, address=DEFAULT_METRICS_ADDRESS, registry=REGISTRY):
+    """
+    Serve ``/metrics`` from a daemon thread of the current process.
+
+    Args:
+        port (int): The port to listen on; 0 picks a free one.
+        address (str): The interface to bind. Defaults to loopback, as the endpoint is
+            unauthenticated; bind another one only behind a trusted network or proxy.
+        registry (MetricsRegistry): The metrics to serve.
+
+    Returns:
+        ThreadingHTTPServer: The running server; its ``server_address`` holds the bound port.
+    """
+    server = ThreadingHTTPServer((address, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"Serving metrics on http://{address}:{server.server_address[1]}/metrics")
+    return server
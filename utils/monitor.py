@@ -1,10 +1,26 @@
+import atexit
 import logging
+import os
 import time
 from .constants import ARBITRUM_TOKEN_ADDRESS_MAP, AVALANCHE_TOKEN_ADDRESS_MAP, DECIMALS
+from .multicall import aggregate, DEFAULT_BATCH_SIZE, MULTICALL3_ADDRESS
+from .log_fetcher import LogRangeFetcher, LogFetchError
+from .cache import cached, market_data_cache, CACHE_TTLS
 import logging
-import requests
-from datetime import datetime
-
+from .http_client import http_get
+from .subgraph import get_latest_token_stats, iter_entities, query_subgraph, SubgraphError
+from .explorer import iter_contract_logs, iter_token_transfers, iter_wallet_transfer_logs, ExplorerError, TRANSFER_EVENT_TOPIC
+from .event_watcher import TransferWatcher, DEFAULT_POLL_INTERVAL
+from .scheduler import ShardedScheduler, DEFAULT_ACTIVITY_WINDOW, DEFAULT_SHARD_SIZE, DEFAULT_WORKERS
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from .metrics import REGISTRY, observe_tick, track_call
+from .log_index import MintLogIndex
+from .ledger import BalanceLedger, DEFAULT_DRIFT_SAMPLE, DEFAULT_LEDGER_PATH, DEFAULT_SAVE_INTERVAL
+from .abi import load_glp_abi
+
+COINGECKO_API_URL = "https://api.coingecko.com/api/v3/simple/price"
+
+@cached('coingecko')
 def get_token_prices():
     """
     Fetch the current prices of tokens using Chainlink or an external API like CoinGecko.
@@ -25,9 +41,9 @@ def get_token_prices():
         "FRAX": "frax"
     }
 
-    coingecko_api_url = "https://api.coingecko.com/api/v3/simple/price"
-    response = requests.get(coingecko_api_url, params={"ids": ",".join(token_ids.values()), "vs_currencies": "usd"})
-    data = response.json()
+    with track_call('price', 'coingecko'):
+        response = http_get(COINGECKO_API_URL, params={"ids": ",".join(token_ids.values()), "vs_currencies": "usd"})
+        data = response.json()
 
     token_prices = {symbol: data[token_id]["usd"] for symbol, token_id in token_ids.items()}
     
@@ -38,7 +54,100 @@ def get_token_prices():
 
     return token_prices
 
-def get_historical_mint_prices(web3, contract, start_block=0, end_block=None, step=2048):
+MINT_EVENT_SIGNATURE = "Mint(address,uint256)"
+
+def hex_to_int(value):
+    """
+    Convert a hex string or bytes value returned by a node or explorer to an int.
+
+    Args:
+        value (str or bytes): The value to convert.
+
+    Returns:
+        int: The converted value.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return int.from_bytes(value, 'big')
+    return int(value, 16)
+
+def decode_mint_log(log):
+    """
+    Decode a Mint log into an index record.
+
+    Args:
+        log (dict): The log returned by ``eth_getLogs``.
+
+    Returns:
+        dict: A dictionary with the block number, log index, transaction hash, raw amount and price.
+    """
+    amount = hex_to_int(log['data'])
+    transaction_hash = log['transactionHash']
+    return {
+        'blockNumber': log['blockNumber'],
+        'logIndex': log['logIndex'],
+        'transactionHash': transaction_hash if isinstance(transaction_hash, str) else '0x' + bytes(transaction_hash).hex(),
+        'amount': amount,
+        'price': amount / (10 ** DECIMALS)  # Adjust based on actual token decimals
+    }
+
+def scan_mint_logs(web3, contract, start_block, end_block, step=2048, fetcher=None):
+    """
+    Scan Mint logs with the adaptive, parallel block-range fetcher.
+
+    Args:
+        web3 (Web3): The Web3 instance.
+        contract (Contract): The GLP contract instance.
+        start_block (int): The block number to start fetching logs from.
+        end_block (int): The block number to end fetching logs at.
+        step (int): The initial number of blocks to fetch in each request.
+        fetcher (LogRangeFetcher, optional): The fetcher to use. Defaults to one built from ``step``.
+
+    Yields:
+        tuple: The last block of each completed segment and the decoded Mint events in it.
+    """
+    if fetcher is None:
+        fetcher = LogRangeFetcher(web3, initial_step=step)
+    event_signature = '0x' + bytes(web3.keccak(text=MINT_EVENT_SIGNATURE)).hex()
+    filter_params = {"address": contract.address, "topics": [event_signature]}
+
+    try:
+        for to_block, logs in fetcher.iter_logs(filter_params, start_block, end_block):
+            yield to_block, [decode_mint_log(log) for log in logs]
+    except LogFetchError as e:
+        logging.error(f"{e}; Mint history is incomplete past block {e.from_block - 1}")
+
+def sync_mint_index(web3, contract, index, start_block=0, end_block=None, step=2048, fetcher=None):
+    """
+    Bring the Mint log index of a contract up to date.
+
+    Only the blocks after the stored checkpoint are fetched. The checkpoint is
+    advanced after every batch, so an interrupted sync resumes where it stopped.
+
+    Args:
+        web3 (Web3): The Web3 instance.
+        contract (Contract): The GLP contract instance.
+        index (MintLogIndex): The index to update.
+        start_block (int): The block to start from when the contract was never indexed.
+        end_block (int): The block number to end fetching logs at. Defaults to the latest block.
+        step (int): The initial number of blocks to fetch in each request.
+        fetcher (LogRangeFetcher, optional): The block-range fetcher to use.
+
+    Returns:
+        int: The chain ID the index entries are stored under.
+    """
+    chain_id = web3.eth.chain_id
+    if end_block is None:
+        end_block = web3.eth.get_block('latest')['number']
+
+    checkpoint = index.get_checkpoint(chain_id, contract.address)
+    from_block = start_block if checkpoint is None else checkpoint + 1
+
+    for to_block, events in scan_mint_logs(web3, contract, from_block, end_block, step, fetcher):
+        index.add_events(chain_id, contract.address, events, to_block)
+
+    return chain_id
+
+def get_historical_mint_prices(web3, contract, start_block=0, end_block=None, step=2048, index=None, fetcher=None):
     """
     Fetch historical mint prices in paginated batches.
 
@@ -47,118 +156,156 @@ def get_historical_mint_prices(web3, contract, start_block=0, end_block=None, st
         contract (Contract): The GLP contract instance.
         start_block (int): The block number to start fetching logs from.
         end_block (int): The block number to end fetching logs at.
-        step (int): The number of blocks to fetch in each batch.
+        step (int): The initial number of blocks to fetch in each request.
+        index (MintLogIndex, optional): A persistent index. When given, only blocks
+            added since its checkpoint are fetched and the prices are read from the index.
+        fetcher (LogRangeFetcher, optional): The block-range fetcher to use.
 
     Returns:
         list: A list of historical mint prices.
     """
-    historical_prices = []
+    if index is not None:
+        chain_id = sync_mint_index(web3, contract, index, start_block, end_block, step, fetcher)
+        return index.get_prices(chain_id, contract.address, start_block, end_block)
 
-    event_signature = web3.keccak(text="Mint(address,uint256)").hex()
     if end_block is None:
         end_block = web3.eth.get_block('latest')['number']
 
-    current_block = start_block
-
-    while current_block <= end_block:
-        to_block = min(current_block + step, end_block)
-        try:
-            logs = web3.eth.get_logs({
-                "fromBlock": current_block,
-                "toBlock": to_block,
-                "address": contract.address,
-                "topics": [event_signature]
-            })
+    historical_prices = []
+    for _, events in scan_mint_logs(web3, contract, start_block, end_block, step, fetcher):
+        historical_prices.extend(event['price'] for event in events)
 
-            for log in logs:
-                price = int(log['data'], 16) / (10 ** DECIMALS)  # Adjust based on actual token decimals
-                historical_prices.append(price)
+    return historical_prices
 
-        except ValueError as e:
-            logging.error(f"Error fetching logs from blocks {current_block} to {to_block}: {e}")
-            break  # Exit if there's an error
+@cached('subgraph', errors=(SubgraphError,), fallback=list)
+def get_glp_price_history(network='arbitrum'):
+    """
+    Fetch the daily GLP price history from the subgraph.
 
-        current_block = to_block + 1
+    A failed query is never cached, so the last complete history keeps being
+    served instead of an empty or partial one.
 
-    return historical_prices
+    Args:
+        network (str): The network to query ('arbitrum' or 'avalanche').
 
-def calculate_average_mint_price(transactions):
+    Returns:
+        list: ``(timestamp, price)`` tuples sorted by timestamp.
+    """
+    history = []
+    for row in iter_entities(network, 'glpStats', 'timestamp aumInUsdg glpSupply', 'period: daily'):
+        glp_supply = float(row['glpSupply'])
+        if glp_supply:
+            history.append((int(row['timestamp']), float(row['aumInUsdg']) / glp_supply))
+    return sorted(history)
+
+def calculate_cost_basis(transactions, user_address, price_history, current_price=None):
     """
-    Calculate the average mint price of GLP from the user's transactions.
+    Calculate the FIFO cost basis and PnL of a user's GLP from their transfers.
 
     Args:
-        transactions (list): A list of GLP transactions.
+        transactions (list): The user's GLP transfers, as returned by the explorer.
+        user_address (str): The user's address.
+        price_history (list): ``(timestamp, price)`` tuples used to price each transfer.
+        current_price (float, optional): The current GLP price, for unrealized PnL.
 
     Returns:
-        float: The weighted average mint price.
+        dict: The user's row of :func:`compute_cost_basis`, or None without transfers.
     """
-    total_glp = 0
-    total_cost = 0
+    # pandas is only needed here, so importing the monitor stays light
+    from .cost_basis import compute_cost_basis, transfers_from_transactions
 
-    for tx in transactions:
-        if tx['methodId'] == 'mint':
-            glp_amount = float(tx['value']) / (10 ** DECIMALS)  # Adjust for GLP decimals
-            glp_price = float(tx['value']) / glp_amount  # Assuming 'value' is in USD (this may need adjustment)
-            total_glp += glp_amount
-            total_cost += glp_price * glp_amount
+    transfers = transfers_from_transactions(transactions, user_address, price_history)
+    result = compute_cost_basis(transfers, current_price)
+    return result.iloc[0].to_dict() if len(result) else None
+
+def calculate_average_mint_price(transactions, user_address, price_history):
+    """
+    Calculate the average price paid for the GLP a user still holds.
 
-    average_mint_price = total_cost / total_glp if total_glp else 0
-    return average_mint_price
+    Args:
+        transactions (list): The user's GLP transfers, as returned by the explorer.
+        user_address (str): The user's address.
+        price_history (list): ``(timestamp, price)`` tuples used to price each transfer.
+
+    Returns:
+        float: The FIFO average cost of the open position, 0 without one.
+    """
+    cost_basis = calculate_cost_basis(transactions, user_address, price_history)
+    return cost_basis['average_cost'] if cost_basis else 0
 
-def calculate_prices(web3, contract):
+def calculate_prices(web3, contract, index=None, fetcher=None):
     """
     Calculate the minting and redemption prices of GLP.
 
     Args:
         web3 (Web3): The Web3 instance.
         contract (Contract): The GLP contract instance.
+        index (MintLogIndex, optional): A persistent Mint log index to sync and average from.
+        fetcher (LogRangeFetcher, optional): The block-range fetcher used to scan Mint logs.
 
     Returns:
         tuple: The average minting price and current redemption price of GLP.
     """
-    historical_prices = get_historical_mint_prices(web3, contract)
-    average_mint_price = sum(historical_prices) / len(historical_prices) if historical_prices else 1
+    if index is not None:
+        chain_id = sync_mint_index(web3, contract, index, fetcher=fetcher)
+        average_mint_price = index.get_average_price(chain_id, contract.address) or 1
+    else:
+        historical_prices = get_historical_mint_prices(web3, contract, fetcher=fetcher)
+        average_mint_price = sum(historical_prices) / len(historical_prices) if historical_prices else 1
     current_redemption_price = 1  # Replace with actual logic to fetch current redemption price
 
     return average_mint_price, current_redemption_price
 
-def get_historical_mint_prices_via_api(contract_address, api_key, network='arbitrum', user_address=None):
-    historical_prices = []
-    base_url = {
-        'arbitrum': 'https://api.arbiscan.io/api',
-        'avalanche': 'https://api.snowtrace.io/api'
-    }.get(network)
-
-    if not base_url:
-        raise ValueError(f"Unsupported network: {network}")
-
-    params = {
-        'module': 'logs',
-        'action': 'getLogs',
-        'fromBlock': '0',
-        'toBlock': 'latest',
-        'address': contract_address,
-        'topic0': '0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef',  # Transfer event topic
-        'apikey': api_key
+def parse_transfer_log(log):
+    """
+    Convert an explorer Transfer log into a historical price record.
+    """
+    amount = int(log['data'], 16) / (10 ** DECIMALS)
+    price = int(log['data'], 16) / (10 ** DECIMALS)
+    return {
+        'blockNumber': int(log['blockNumber'], 16),
+        'price': price,
+        'amount': amount,
+        'timeStamp': int(log['timeStamp'], 16)
     }
 
-    response = requests.get(base_url, params=params)
-    data = response.json()
+def get_wallet_transfer_histories_via_api(contract_address, api_key, user_addresses, network='arbitrum'):
+    """
+    Fetch the Transfer history of many wallets with one scan of the explorer's logs.
+
+    Args:
+        contract_address (str): The contract address.
+        api_key (str): The API key for the blockchain explorer.
+        user_addresses (list): The wallets to collect records for.
+        network (str): The network to query ('arbitrum' or 'avalanche').
 
-    if data['status'] == '1':
-        for log in data['result']:
-            if user_address and user_address.lower() not in (log['topics'][1], log['topics'][2]):
-                continue
-            amount = int(log['data'], 16) / (10 ** DECIMALS)
-            price = int(log['data'], 16) / (10 ** DECIMALS)
-            historical_prices.append({
-                'blockNumber': int(log['blockNumber'], 16),
-                'price': price,
-                'amount': amount,
-                'timeStamp': int(log['timeStamp'], 16)
-            })
-    else:
-        logging.error(f"Error fetching logs: {data['message']}")
+    Returns:
+        dict: The records of each wallet in ascending block order, keyed by address as given.
+    """
+    histories = {user_address: [] for user_address in user_addresses}
+
+    try:
+        for user_address, log in iter_wallet_transfer_logs(contract_address, api_key, user_addresses, network):
+            histories[user_address].append(parse_transfer_log(log))
+    except ExplorerError as e:
+        logging.error(f"Error fetching logs: {e}")
+
+    for records in histories.values():
+        # Filtered scans return sent and received logs one after the other
+        records.sort(key=lambda record: record['blockNumber'])
+    return histories
+
+def get_historical_mint_prices_via_api(contract_address, api_key, network='arbitrum', user_address=None):
+    if user_address:
+        return get_wallet_transfer_histories_via_api(contract_address, api_key, [user_address], network)[user_address]
+
+    historical_prices = []
+
+    try:
+        for log in iter_contract_logs(contract_address, api_key, network, {'topic0': TRANSFER_EVENT_TOPIC}):
+            historical_prices.append(parse_transfer_log(log))
+    except ExplorerError as e:
+        logging.error(f"Error fetching logs: {e}")
 
     return historical_prices
 
@@ -200,57 +347,31 @@ def get_current_redemption_price_via_api(contract_address, api_key, network='arb
     return current_redemption_price
 
 
+@cached('subgraph', errors=(SubgraphError,), fallback=dict)
 def get_token_composition_scraping(network='arbitrum'):
     """
     Fetch the latest token composition from the GMX stats dashboard using the API.
 
+    A failed query is never cached, so the last good composition keeps being
+    served instead of an empty one.
+
     Args:
         network (str): The network to query ('arbitrum' or 'avalanche').
 
     Returns:
         dict: A dictionary of token composition with token symbols and their weights.
     """
-    api_urls = {
-        'arbitrum': "https://subgraph.satsuma-prod.com/3b2ced13c8d9/gmx/gmx-arbitrum-stats/api",
-        'avalanche': "https://subgraph.satsuma-prod.com/3b2ced13c8d9/gmx/gmx-avalanche-stats/api"
-    }
+    latest_stats = get_latest_token_stats(network)
 
-    api_url = api_urls.get(network)
-    if not api_url:
-        raise ValueError(f"Unsupported network: {network}")
-
-    query = """
-    {
-      tokenStats(first: 1000, skip: 0, orderBy: timestamp, orderDirection: desc, where: {period: daily}) {
-        poolAmountUsd
-        timestamp
-        token
-      }
-    }
-    """
-    
-    response = requests.post(api_url, json={'query': query})
-    
-    if response.status_code == 200:
-        data = response.json().get('data', {}).get('tokenStats', [])
-        token_composition = {}
-        for item in data:
-            token = item['token']
-            pool_amount_usd = float(item['poolAmountUsd'])
-            if token in token_composition:
-                token_composition[token] += pool_amount_usd
-            else:
-                token_composition[token] = pool_amount_usd
-        
-        # Normalize the composition weights
-        total_amount = sum(token_composition.values())
-        for token in token_composition:
-            token_composition[token] /= total_amount
-
-        return token_composition
-    else:
-        print(f"Failed to retrieve data: {response.status_code}")
-        return {}
+    # Weight each token by its latest pool amount only
+    token_composition = {token: float(row['poolAmountUsd']) for token, row in latest_stats.items()}
+
+    # Normalize the composition weights
+    total_amount = sum(token_composition.values())
+    for token in token_composition:
+        token_composition[token] /= total_amount
+
+    return token_composition
 
 def get_open_positions(network='arbitrum'):
     """
@@ -344,6 +465,16 @@ def get_total_supply(contract):
         return 0
 
 
+GLP_STATS_QUERY = """
+{
+  glpStats(orderBy: id, orderDirection: desc, first: 1) {
+    aumInUsdg
+    glpSupply
+  }
+}
+"""
+
+@cached('subgraph')
 def fetch_glp_data(network='arbitrum'):
     """
     Fetch GLP AUM and supply from the subgraph API.
@@ -354,22 +485,20 @@ def fetch_glp_data(network='arbitrum'):
     Returns:
         dict: A dictionary with AUM, supply, and price.
     """
-    api_urls = {
-        'arbitrum': 'https://subgraph.satsuma-prod.com/3b2ced13c8d9/gmx/gmx-arbitrum-stats/api',
-        'avalanche': 'https://subgraph.satsuma-prod.com/3b2ced13c8d9/gmx/gmx-avalanche-stats/api'
-    }
+    return parse_glp_stats(query_subgraph(network, GLP_STATS_QUERY))
 
-    query = """
-    {
-      glpStats(orderBy: id, orderDirection: desc, first: 1) {
-        aumInUsdg
-        glpSupply
-      }
-    }
+
+def parse_glp_stats(data):
     """
-    
-    response = requests.post(api_urls[network], json={'query': query})
-    data = response.json().get('data', {}).get('glpStats', [])[0]
+    Parse the latest glpStats entry of a subgraph response.
+
+    Args:
+        data (dict): The 'data' member of the subgraph response.
+
+    Returns:
+        dict: A dictionary with AUM, supply, and price.
+    """
+    data = data.get('glpStats', [])[0]
 
     aum_in_usdg = float(data['aumInUsdg'])
     glp_supply = float(data['glpSupply'])
@@ -399,6 +528,83 @@ def get_user_glp_balance(contract, user_address):
         logging.error(f"Error fetching user GLP balance for {user_address}: {e}")
         return 0
 
+def build_balance_calls(contract, user_addresses):
+    """
+    Encode the totalSupply call and one balanceOf call per user for a multicall.
+
+    Args:
+        contract (Contract): The GLP contract instance.
+        user_addresses (list): The addresses of the users.
+
+    Returns:
+        tuple: The result keys, the ``(target, call_data)`` calls, and the errors
+        for addresses that could not be encoded.
+    """
+    keys = ['totalSupply']
+    calls = [(contract.address, contract.encode_abi('totalSupply'))]
+    errors = {}
+
+    for user_address in user_addresses:
+        try:
+            calls.append((contract.address, contract.encode_abi('balanceOf', args=[user_address])))
+            keys.append(user_address)
+        except Exception as e:
+            errors[user_address] = str(e)
+
+    return keys, calls, errors
+
+def collect_balance_results(contract, user_addresses, keys, results, errors):
+    """
+    Decode the multicall results produced for :func:`build_balance_calls`.
+
+    Args:
+        contract (Contract): The GLP contract instance.
+        user_addresses (list): The addresses of the users.
+        keys (list): The result keys returned by :func:`build_balance_calls`.
+        results (list): The ``(success, result)`` tuples returned by the multicall.
+        errors (dict): The errors collected so far, updated in place.
+
+    Returns:
+        dict: A dictionary with the total supply, the balances keyed by user address,
+        and an error message for every read that failed (keyed by 'totalSupply' or user address).
+    """
+    values = {}
+    for key, (success, result) in zip(keys, results):
+        if success:
+            try:
+                values[key] = contract.w3.codec.decode(['uint256'], result)[0] / (10 ** DECIMALS)
+                continue
+            except Exception as e:
+                result = f"could not decode return data: {e}"
+        errors[key] = result
+
+    for key, error in errors.items():
+        logging.error(f"Error fetching batched GLP read for {key}: {error}")
+
+    return {
+        'total_supply': values.get('totalSupply', 0),
+        'balances': {user_address: values.get(user_address, 0) for user_address in user_addresses},
+        'errors': errors
+    }
+
+def get_batched_glp_balances(contract, user_addresses, batch_size=DEFAULT_BATCH_SIZE, multicall_address=MULTICALL3_ADDRESS):
+    """
+    Fetch the total supply of GLP and the GLP balances of many users in batched multicalls.
+
+    Args:
+        contract (Contract): The GLP contract instance.
+        user_addresses (list): The addresses of the users.
+        batch_size (int): The maximum number of calls per multicall request.
+        multicall_address (str): The address of the Multicall3 contract.
+
+    Returns:
+        dict: A dictionary with the total supply, the balances keyed by user address,
+        and an error message for every read that failed (keyed by 'totalSupply' or user address).
+    """
+    keys, calls, errors = build_balance_calls(contract, user_addresses)
+    results = aggregate(contract.w3, calls, batch_size=batch_size, multicall_address=multicall_address)
+    return collect_balance_results(contract, user_addresses, keys, results, errors)
+
 def get_glp_transactions(contract_address, user_address, api_key, network='arbitrum'):
     """
     Fetch all GLP-related transactions for a given user.
@@ -410,83 +616,533 @@ def get_glp_transactions(contract_address, user_address, api_key, network='arbit
         network (str): The network to query ('arbitrum' or 'avalanche').
 
     Returns:
-        list: A list of transactions involving the user.
+        TransactionBatch: The transactions involving the user, stored as columns.
     """
-    transactions = []
-    base_url = {
-        'arbitrum': 'https://api.arbiscan.io/api',
-        'avalanche': 'https://api.snowtrace.io/api'
-    }.get(network)
+    # pyarrow is only needed here, so importing the monitor stays light
+    from .transactions import TransactionBatch
 
-    if not base_url:
-        raise ValueError(f"Unsupported network: {network}")
+    def records():
+        try:
+            yield from iter_token_transfers(contract_address, user_address, api_key, network)
+        except ExplorerError as e:
+            logging.error(f"Error fetching transactions: {e}")
+
+    return TransactionBatch.from_records(records())
+
+def get_market_snapshot(network, contract, total_supply, index=None):
+    """
+    Read the chain-wide values that every user's holdings are valued with.
+
+    The values are kept in the shared market data cache for the 'market' TTL,
+    so every tick, event poll and shard refresh within it reuses one read, and
+    concurrent calls for the same chain and contract are merged into one.
+
+    Args:
+        network (str): The network of the contract ('arbitrum' or 'avalanche').
+        contract (Contract): The GLP contract instance.
+        total_supply (float): The total supply read in the same tick.
+        index (MintLogIndex, optional): A persistent Mint log index, so each read only
+            scans the blocks added since the previous one. Without it the average
+            mint price is not computed, as that would rescan the chain's whole Mint history.
+
+    Returns:
+        dict: The 'total_supply', the subgraph 'glp_data' (None if it could not be read),
+        the 'average_mint_price' and the 'redemption_price' (both None without an index).
+    """
+    def load():
+        try:
+            glp_data = fetch_glp_data(network)
+        except Exception as e:
+            logging.error(f"Error fetching GLP data for {network}: {e}")
+            glp_data = None
+        if index is None:
+            average_mint_price = redemption_price = None
+        else:
+            average_mint_price, redemption_price = calculate_prices(contract.w3, contract, index)
+        return {'glp_data': glp_data, 'average_mint_price': average_mint_price, 'redemption_price': redemption_price}
+
+    market = market_data_cache.get_or_load(('market', network, contract.address), load, CACHE_TTLS['market'])
+    return dict(market, total_supply=total_supply)
+
+def attach_market_snapshots(contracts, snapshots, index=None):
+    """
+    Add a tick-scoped market snapshot to every chain's snapshot under 'market'.
+
+    The market is read once per chain, however many users the tick covers.
+    A chain whose market could not be read gets None.
+
+    Args:
+        contracts (dict): The GLP contract instances keyed by network.
+        snapshots (dict): The snapshots from :func:`get_batched_glp_balances`, updated in place.
+        index (MintLogIndex, optional): A persistent Mint log index.
+
+    Returns:
+        dict: The snapshots.
+    """
+    for network, contract in contracts.items():
+        try:
+            snapshots[network]['market'] = get_market_snapshot(network, contract, snapshots[network]['total_supply'], index)
+        except Exception as e:
+            logging.error(f"Error reading {network} market data: {e}")
+            snapshots[network]['market'] = None
+    return snapshots
+
+def log_user_holdings(user_address, arb_snapshot, avax_snapshot):
+    """
+    Log a user's GLP holdings, rewards, and fees from the per-chain snapshots of a tick.
+
+    Chain-wide values are read from each snapshot's 'market' entry (see
+    :func:`attach_market_snapshots`), so logging a user makes no requests.
+
+    Args:
+        user_address (str): The address of the user.
+        arb_snapshot (dict): The Arbitrum snapshot from :func:`get_batched_glp_balances`.
+        avax_snapshot (dict): The Avalanche snapshot from :func:`get_batched_glp_balances`.
+    """
+    for label, snapshot in (('ARB', arb_snapshot), ('AVAX', avax_snapshot)):
+        try:
+            user_balance = snapshot['balances'][user_address]
+            market = snapshot.get('market')
+            if not market or market['average_mint_price'] is None:
+                logging.info(f"{label} GLP - User: {user_address}, Balance: {user_balance}")
+                continue
+
+            # Calculate user's rewards (for simplicity, assuming rewards are proportional to balance)
+            user_rewards = user_balance * market['average_mint_price']
+
+            # Log user's holdings, rewards, and fees
+            logging.info(f"{label} GLP - User: {user_address}, Balance: {user_balance}, Rewards: {user_rewards}, Fees: {user_rewards * 0.01}")
+
+        except Exception as e:
+            logging.error(f"Error during monitoring for user {user_address}: {e}")
+
+def open_timeseries_store(config):
+    """
+    Open the tick store named by ``timeseries_path`` in the configuration.
+
+    Args:
+        config (dict): The configuration dictionary.
+
+    Returns:
+        TimeSeriesStore: The store, or None when no path is configured.
+    """
+    if not config.get('timeseries_path'):
+        return None
+    # pandas and pyarrow are only imported when ticks are recorded
+    from .timeseries import TimeSeriesStore
+    store = TimeSeriesStore(config['timeseries_path'])
+    # Buffered rows would otherwise be lost when the process exits between flushes
+    atexit.register(store.flush)
+    return store
+
+def open_mint_index(config):
+    """
+    Open the Mint log index named by ``mint_index_path`` in the configuration.
+
+    Args:
+        config (dict): The configuration dictionary.
+
+    Returns:
+        MintLogIndex: The index, or None when no path is configured.
+    """
+    if not config.get('mint_index_path'):
+        logging.warning("No mint_index_path is configured; the average mint price is not computed")
+        return None
+    return MintLogIndex(config['mint_index_path'])
+
+def record_tick(store, snapshots, user_addresses=None):
+    """
+    Append a tick's per-chain values and user balances to the time-series store.
+
+    Args:
+        store (TimeSeriesStore): The store, or None to record nothing.
+        snapshots (dict): The snapshots from :func:`get_batched_glp_balances`, keyed by network.
+        user_addresses (iterable, optional): Only record these users' balances.
+    """
+    if store is None:
+        return
+    timestamp = int(time.time())
+    for network, snapshot in snapshots.items():
+        if 'market' in snapshot:
+            glp_data = snapshot['market']['glp_data'] if snapshot['market'] else None
+        else:
+            try:
+                glp_data = fetch_glp_data(network)
+            except Exception as e:
+                logging.error(f"Error fetching GLP data for {network}: {e}")
+                glp_data = None
+        if user_addresses is not None:
+            snapshot = dict(snapshot, balances={user_address: snapshot['balances'][user_address] for user_address in user_addresses})
+        try:
+            store.record_snapshot(timestamp, network, snapshot, glp_data)
+        except Exception as e:
+            logging.error(f"Error recording {network} tick: {e}")
+
+def refresh_changed_balances(watcher, contract, snapshot, batch_size=DEFAULT_BATCH_SIZE, multicall_address=MULTICALL3_ADDRESS):
+    """
+    Re-read the balances of the watched addresses that appeared in new Transfer logs.
+
+    Args:
+        watcher (TransferWatcher): The watcher following the contract's Transfers.
+        contract (Contract): The GLP contract instance.
+        snapshot (dict): The chain's snapshot from :func:`get_batched_glp_balances`, updated in place.
+        batch_size (int): The maximum number of calls per multicall request.
+        multicall_address (str): The address of the Multicall3 contract.
+
+    Returns:
+        set: The addresses whose balance was re-read.
+    """
+    changed, supply_changed = watcher.poll()
+    if changed or supply_changed:
+        update = get_batched_glp_balances(contract, sorted(changed), batch_size, multicall_address)
+        snapshot['total_supply'] = update['total_supply']
+        snapshot['balances'].update(update['balances'])
+        for key in ['totalSupply', *changed]:
+            snapshot['errors'].pop(key, None)
+        snapshot['errors'].update(update['errors'])
+    return changed
+
+def watch_glp_events(contracts, user_addresses, interval=60, poll_interval=DEFAULT_POLL_INTERVAL,
+                     batch_size=DEFAULT_BATCH_SIZE, multicall_address=MULTICALL3_ADDRESS, store=None, index=None):
+    """
+    Monitor GLP holdings by following Transfer logs, with a slow full reconciliation.
+
+    Every ``poll_interval`` seconds each chain's filters are polled and only the
+    users that appear in new Transfer logs are re-read and logged. Every
+    ``interval`` seconds all users are re-read, which also repairs anything a
+    lost filter or a reorg may have missed.
+
+    Args:
+        contracts (dict): The GLP contract instances keyed by network ('arbitrum' and 'avalanche').
+        user_addresses (list): The addresses of the users.
+        interval (int): The time (in seconds) between full reconciliations.
+        poll_interval (float): The time (in seconds) between filter polls.
+        batch_size (int): The maximum number of calls per multicall request.
+        multicall_address (str): The address of the Multicall3 contract.
+        store (TimeSeriesStore, optional): Records every refresh.
+        index (MintLogIndex, optional): A persistent Mint log index for the market snapshots.
+    """
+    # Install the filters first so nothing mined during the first reconciliation is missed
+    watchers = {network: TransferWatcher(contract, user_addresses) for network, contract in contracts.items()}
+    next_reconciliation = 0
+
+    while True:
+        started = time.perf_counter()
+        if time.monotonic() >= next_reconciliation:
+            snapshots = {
+                network: get_batched_glp_balances(contract, user_addresses, batch_size, multicall_address)
+                for network, contract in contracts.items()
+            }
+            changed = set(user_addresses)
+            next_reconciliation = time.monotonic() + interval
+        else:
+            changed = set()
+            for network, watcher in watchers.items():
+                try:
+                    changed |= refresh_changed_balances(watcher, contracts[network], snapshots[network], batch_size, multicall_address)
+                except Exception as e:
+                    logging.error(f"Error polling {network} Transfer logs: {e}")
+
+        if changed:
+            attach_market_snapshots(contracts, snapshots, index)
+            for user_address in user_addresses:
+                if user_address in changed:
+                    log_user_holdings(user_address, snapshots['arbitrum'], snapshots['avalanche'])
+            record_tick(store, snapshots, changed)
+        observe_tick('events', time.perf_counter() - started)
+
+        time.sleep(poll_interval)
+
+def watch_glp_ledger(contracts, user_addresses, interval=60, poll_interval=DEFAULT_POLL_INTERVAL,
+                     batch_size=DEFAULT_BATCH_SIZE, multicall_address=MULTICALL3_ADDRESS, store=None, index=None,
+                     ledger_path=DEFAULT_LEDGER_PATH, drift_sample=DEFAULT_DRIFT_SAMPLE, save_interval=DEFAULT_SAVE_INTERVAL):
+    """
+    Monitor GLP holdings from a local balance ledger kept current by Transfer logs.
+
+    Balances are read once to seed each chain's :class:`BalanceLedger`. Every
+    ``poll_interval`` seconds the Transfer logs of the new blocks are applied
+    and only the users they touched are logged, so a poll costs requests in
+    proportion to on-chain activity rather than watchlist size. Every
+    ``interval`` seconds a random sample of ``drift_sample`` balances is
+    re-read from chain state and any drift is corrected.
 
-    params = {
-        'module': 'account',
-        'action': 'tokentx',
-        'address': user_address,
-        'contractaddress': contract_address,
-        'apikey': api_key
+    Args:
+        contracts (dict): The GLP contract instances keyed by network ('arbitrum' and 'avalanche').
+        user_addresses (list): The addresses of the users.
+        interval (int): The time (in seconds) between drift checks.
+        poll_interval (float): The time (in seconds) between ledger syncs.
+        batch_size (int): The maximum number of calls per multicall request.
+        multicall_address (str): The address of the Multicall3 contract.
+        store (TimeSeriesStore, optional): Records every refresh.
+        index (MintLogIndex, optional): A persistent Mint log index for the market snapshots.
+        ledger_path (str, optional): The directory the ledgers are persisted to, one JSON file per network.
+        drift_sample (int): The number of balances re-read per drift check.
+        save_interval (float): Seconds between ledger writes when only deltas were applied.
+    """
+    ledgers = {
+        network: BalanceLedger(contract, user_addresses, os.path.join(ledger_path, f'{network}.json') if ledger_path else None,
+                               save_interval=save_interval)
+        for network, contract in contracts.items()
     }
+    next_check = time.monotonic() + interval
 
-    response = requests.get(base_url, params=params)
-    data = response.json()
+    try:
+        while True:
+            started = time.perf_counter()
+            changed = set()
+            for network, ledger in ledgers.items():
+                try:
+                    changed |= ledger.sync(batch_size, multicall_address)
+                except Exception as e:
+                    logging.error(f"Error syncing {network} balance ledger: {e}")
+
+            if time.monotonic() >= next_check:
+                for network, ledger in ledgers.items():
+                    try:
+                        changed |= ledger.check_drift(drift_sample, batch_size, multicall_address)
+                    except Exception as e:
+                        logging.error(f"Error checking {network} balance ledger: {e}")
+                next_check = time.monotonic() + interval
+
+            if changed:
+                snapshots = {network: ledger.snapshot() for network, ledger in ledgers.items()}
+                attach_market_snapshots(contracts, snapshots, index)
+                for user_address in user_addresses:
+                    if user_address in changed:
+                        log_user_holdings(user_address, snapshots['arbitrum'], snapshots['avalanche'])
+                record_tick(store, snapshots, changed)
+            observe_tick('ledger', time.perf_counter() - started)
+
+            time.sleep(poll_interval)
+    finally:
+        # Deltas applied since the last write would otherwise be fetched again after a restart
+        for ledger in ledgers.values():
+            ledger.flush()
+
+def load_glp_contracts(config):
+    """
+    Connect to both chains and load their GLP contracts.
 
-    if data['status'] == '1':
-        for tx in data['result']:
-            tx['human_readable_date'] = datetime.utcfromtimestamp(int(tx['timeStamp'])).strftime('%Y-%m-%d %H:%M:%S')
-            tx['methodId'] = tx.get('methodId', 'N/A')  # Provide a default value if methodId is missing
-            transactions.append(tx)
-    else:
-        logging.error(f"Error fetching transactions: {data['message']}")
+    Args:
+        config (dict): The configuration dictionary.
+
+    Returns:
+        dict: The GLP contract instances keyed by network ('arbitrum' and 'avalanche').
+    """
+    from .web3_utils import setup_web3, load_contract
+
+    arb_web3 = setup_web3(config['arb_provider_url'], **config.get('rpc_failover', {}))
+    avax_web3 = setup_web3(config['avax_provider_url'], **config.get('rpc_failover', {}))
+    glp_abi = load_glp_abi()
+
+    return {
+        'arbitrum': load_contract(arb_web3, config['arb_glp_contract_address'], glp_abi),
+        'avalanche': load_contract(avax_web3, config['avax_glp_contract_address'], glp_abi)
+    }
+
+# Per-process state of the shard workers, set by init_shard_worker
+_shard_worker = {}
+
+def init_shard_worker(config, contracts=None, export_metrics=False):
+    """
+    Prepare the current process to run :func:`read_user_shard`.
+
+    Args:
+        config (dict): The configuration dictionary.
+        contracts (dict, optional): The GLP contracts keyed by network. Loaded from the
+            configuration when omitted, as process pool workers must.
+        export_metrics (bool): Hand the metrics recorded by each refresh back with its
+            result, as process pool workers must for them to be served.
+    """
+    _shard_worker['contracts'] = contracts or load_glp_contracts(config)
+    _shard_worker['batch_size'] = config.get('multicall_batch_size', DEFAULT_BATCH_SIZE)
+    _shard_worker['multicall_address'] = config.get('multicall_address', MULTICALL3_ADDRESS)
+    _shard_worker['export_metrics'] = export_metrics
+
+def shard_balances(user_addresses, snapshots):
+    """
+    Sum each user's GLP balance over the chains of a shard's snapshots.
+
+    Args:
+        user_addresses (list): The addresses of the shard.
+        snapshots (dict): The shard's snapshots from :func:`get_batched_glp_balances`, keyed by network.
+
+    Returns:
+        dict: Each user's GLP balance summed over the chains, keyed by address. Users
+        whose balance could not be read on some chain are left out, so a failed
+        read is not taken for a zero balance.
+    """
+    return {
+        user_address: sum(snapshot['balances'][user_address] for snapshot in snapshots.values())
+        for user_address in user_addresses
+        if not any(user_address in snapshot['errors'] for snapshot in snapshots.values())
+    }
+
+def read_user_shard(user_addresses):
+    """
+    Read the balances of one shard of users on every chain.
+
+    Market data is not read here: the process collecting the shards attaches
+    it (see :func:`monitor_glp_sharded`), so a tick costs one market read per
+    chain however many shards it has.
+
+    Args:
+        user_addresses (list): The addresses of the shard.
 
-    return transactions
+    Returns:
+        tuple: The shard's snapshots from :func:`get_batched_glp_balances`, keyed by
+        network, and the metric samples recorded since the last refresh (see
+        :meth:`MetricsRegistry.drain`), or None unless the worker exports its metrics.
+    """
+    snapshots = {
+        network: get_batched_glp_balances(contract, user_addresses, _shard_worker['batch_size'], _shard_worker['multicall_address'])
+        for network, contract in _shard_worker['contracts'].items()
+    }
+    metrics = REGISTRY.drain() if _shard_worker.get('export_metrics') else None
+    return snapshots, metrics
+
+def refresh_user_shard(user_addresses):
+    """
+    Read the holdings of one shard of users on every chain.
+
+    Args:
+        user_addresses (list): The addresses of the shard.
+
+    Returns:
+        dict: The balances of :func:`shard_balances`.
+    """
+    return shard_balances(user_addresses, read_user_shard(user_addresses)[0])
+
+def run_monitor_tick(contracts, user_addresses, batch_size=DEFAULT_BATCH_SIZE, multicall_address=MULTICALL3_ADDRESS, store=None,
+                     index=None):
+    """
+    Run one monitoring tick: read every chain in batches, read each chain's market once,
+    log each user, and record the tick.
+
+    Args:
+        contracts (dict): The GLP contract instances keyed by network ('arbitrum' and 'avalanche').
+        user_addresses (list): The addresses of the users.
+        batch_size (int): The maximum number of calls per multicall request.
+        multicall_address (str): The address of the Multicall3 contract.
+        store (TimeSeriesStore, optional): Records the tick.
+        index (MintLogIndex, optional): A persistent Mint log index for the market snapshots.
+
+    Returns:
+        dict: The snapshots from :func:`get_batched_glp_balances`, keyed by network,
+        each with its 'market' (see :func:`attach_market_snapshots`).
+    """
+    started = time.perf_counter()
+    # Read supply and every user's balance for each chain in a few batched calls
+    snapshots = {
+        network: get_batched_glp_balances(contract, user_addresses, batch_size, multicall_address)
+        for network, contract in contracts.items()
+    }
+    attach_market_snapshots(contracts, snapshots, index)
+
+    for user_address in user_addresses:
+        log_user_holdings(user_address, snapshots['arbitrum'], snapshots['avalanche'])
+    record_tick(store, snapshots)
+    observe_tick('interval', time.perf_counter() - started)
+    return snapshots
+
+def monitor_glp_sharded(config):
+    """
+    Monitor a large watchlist with the sharded, tiered scheduler.
+
+    The ``scheduler`` section of the configuration sets 'workers', 'use_processes',
+    'shard_size', 'tiers' and 'activity_window' (see :class:`ShardedScheduler`).
+    Shard snapshots are sent back to this process, which attaches each
+    chain's market (read at most once per 'market' cache TTL), logs the users
+    and records the tick, so the time-series store keeps a single writer with
+    either pool. Process pool workers also send back the metrics of their
+    upstream requests, which are merged into this process's registry.
+
+    Args:
+        config (dict): The configuration dictionary.
+    """
+    settings = config['scheduler']
+    workers = settings.get('workers', DEFAULT_WORKERS)
+    contracts = load_glp_contracts(config)
+    if settings.get('use_processes'):
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_shard_worker, initargs=(config, None, True))
+    else:
+        init_shard_worker(config, contracts)
+        executor = ThreadPoolExecutor(max_workers=workers)
+    store = open_timeseries_store(config)
+    index = open_mint_index(config)
+
+    def collect(result):
+        snapshots, metrics = result
+        if metrics:
+            REGISTRY.merge(metrics)
+        user_addresses = list(next(iter(snapshots.values()))['balances'])
+        attach_market_snapshots(contracts, snapshots, index)
+        for user_address in user_addresses:
+            log_user_holdings(user_address, snapshots['arbitrum'], snapshots['avalanche'])
+        record_tick(store, snapshots)
+        return shard_balances(user_addresses, snapshots)
+
+    scheduler = ShardedScheduler(
+        read_user_shard,
+        config['user_addresses'],
+        tiers=settings.get('tiers'),
+        shard_size=settings.get('shard_size', DEFAULT_SHARD_SIZE),
+        executor=executor,
+        activity_window=settings.get('activity_window', DEFAULT_ACTIVITY_WINDOW),
+        collect=collect
+    )
+    try:
+        scheduler.run_forever(settings.get('report_interval', 60))
+    finally:
+        if store:
+            store.flush()
 
 def monitor_glp(config, interval=60):
     """
     Monitor the user's GLP holdings, rewards, and fees.
 
+    With ``refresh_mode: events`` in the configuration, holdings are refreshed
+    from Transfer logs as they are mined and ``interval`` only paces the full
+    reconciliation (see :func:`watch_glp_events`). With ``refresh_mode: ledger``,
+    balances are kept in a local ledger updated from Transfer logs and
+    ``interval`` paces the sampled drift checks (see :func:`watch_glp_ledger`).
+    With a ``scheduler``
+    section, the watchlist is refreshed in tiered shards instead (see
+    :func:`monitor_glp_sharded`).
+
     Args:
         config (dict): The configuration dictionary.
         interval (int, optional): The time interval (in seconds) to refresh the data. Defaults to 60.
     """
-    from .web3_utils import setup_web3, load_contract
-    import json
+    if config.get('scheduler'):
+        monitor_glp_sharded(config)
+        return
 
-    arb_web3 = setup_web3(config['arb_provider_url'])
-    avax_web3 = setup_web3(config['avax_provider_url'])
+    contracts = load_glp_contracts(config)
 
-    with open('contracts/glp_abi.json', 'r') as abi_file:
-        glp_abi = json.load(abi_file)
+    batch_size = config.get('multicall_batch_size', DEFAULT_BATCH_SIZE)
+    multicall_address = config.get('multicall_address', MULTICALL3_ADDRESS)
+    store = open_timeseries_store(config)
+    index = open_mint_index(config)
 
-    arb_glp_contract = load_contract(arb_web3, config['arb_glp_contract_address'], glp_abi)
-    avax_glp_contract = load_contract(avax_web3, config['avax_glp_contract_address'], glp_abi)
-
-    while True:
-        for user_address in config['user_addresses']:
-            try:
-                # Fetch data from Arbitrum GLP contract
-                arb_glp_supply = get_total_supply(arb_glp_contract)
-                arb_user_balance = get_user_glp_balance(arb_glp_contract, user_address)
-                
-                # Fetch data from Avalanche GLP contract
-                avax_glp_supply = get_total_supply(avax_glp_contract)
-                avax_user_balance = get_user_glp_balance(avax_glp_contract, user_address)
-                
-                # Calculate prices for minting and redemption
-                arb_mint_price, arb_redemption_price = calculate_prices(arb_glp_supply)
-                avax_mint_price, avax_redemption_price = calculate_prices(avax_glp_supply)
-                
-                # Calculate user's rewards (for simplicity, assuming rewards are proportional to balance)
-                arb_user_rewards = arb_user_balance * arb_mint_price
-                avax_user_rewards = avax_user_balance * avax_mint_price
-                
-                # Log user's holdings, rewards, and fees
-                logging.info(f"ARB GLP - User: {user_address}, Balance: {arb_user_balance}, Rewards: {arb_user_rewards}, Fees: {arb_user_rewards * 0.01}")
-                logging.info(f"AVAX GLP - User: {user_address}, Balance: {avax_user_balance}, Rewards: {avax_user_rewards}, Fees: {avax_user_rewards * 0.01}")
-
-            except Exception as e:
-                logging.error(f"Error during monitoring for user {user_address}: {e}")
-        
-        # Wait for the specified interval before fetching the data again
-        time.sleep(interval)
+    try:
+        if config.get('refresh_mode') == 'events':
+            watch_glp_events(contracts, config['user_addresses'], interval,
+                             config.get('event_poll_interval', DEFAULT_POLL_INTERVAL), batch_size, multicall_address, store, index)
+            return
+
+        if config.get('refresh_mode') == 'ledger':
+            watch_glp_ledger(contracts, config['user_addresses'], interval,
+                             config.get('event_poll_interval', DEFAULT_POLL_INTERVAL), batch_size, multicall_address, store, index,
+                             config.get('ledger_path', DEFAULT_LEDGER_PATH), config.get('ledger_drift_sample', DEFAULT_DRIFT_SAMPLE),
+                             config.get('ledger_save_interval', DEFAULT_SAVE_INTERVAL))
+            return
+
+        while True:
+            run_monitor_tick(contracts, config['user_addresses'], batch_size, multicall_address, store, index)
+
+            # Wait for the specified interval before fetching the data again
+            time.sleep(interval)
+    finally:
+        if store:
+            store.flush()
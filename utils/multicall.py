@@ -0,0 +1,139 @@
+import asyncio
+import logging
+
+# Multicall3 is deployed at the same address on Arbitrum, Avalanche and most EVM chains.
+MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+
+# The block Multicall3 was deployed at, by chain id; state before it must be read without it
+MULTICALL3_DEPLOYMENT_BLOCKS = {
+    42161: 7654707,  # Arbitrum One
+    43114: 11907934,  # Avalanche C-Chain
+}
+
+DEFAULT_BATCH_SIZE = 500
+
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"}
+                ],
+                "internalType": "struct Multicall3.Call3[]",
+                "name": "calls",
+                "type": "tuple[]"
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"}
+                ],
+                "internalType": "struct Multicall3.Result[]",
+                "name": "returnData",
+                "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function"
+    }
+]
+
+
+def chunked(items, size):
+    """
+    Split a list into consecutive chunks of at most ``size`` items.
+
+    Args:
+        items (list): The items to split.
+        size (int): The maximum chunk size.
+
+    Returns:
+        generator: Lists of at most ``size`` items, in order.
+    """
+    if size < 1:
+        raise ValueError(f"Batch size must be positive, got {size}")
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _to_call3(chunk):
+    return [(target, True, call_data) for target, call_data in chunk]
+
+
+def _unpack_results(response):
+    results = []
+    for success, return_data in response:
+        if success:
+            results.append((True, return_data))
+        else:
+            results.append((False, f"call reverted: 0x{bytes(return_data).hex()}"))
+    return results
+
+
+def aggregate(web3, calls, batch_size=DEFAULT_BATCH_SIZE, multicall_address=MULTICALL3_ADDRESS, block_identifier='latest'):
+    """
+    Execute read-only calls through Multicall3 ``aggregate3`` in chunked batches.
+
+    Every call is sent with ``allowFailure`` set, so a reverting call does not
+    fail the rest of its batch. If a whole batch request fails, each call in it
+    reports the request error.
+
+    Args:
+        web3 (Web3): The Web3 instance.
+        calls (list): A list of ``(target, call_data)`` tuples.
+        batch_size (int): The maximum number of calls per ``eth_call``.
+        multicall_address (str): The address of the Multicall3 contract.
+        block_identifier (int or str): The block to execute the calls at.
+
+    Returns:
+        list: One ``(success, result)`` tuple per call, in order. ``result`` is the
+        raw return data on success and an error message otherwise.
+    """
+    multicall = web3.eth.contract(address=multicall_address, abi=MULTICALL3_ABI)
+    results = []
+
+    for chunk in chunked(calls, batch_size):
+        try:
+            response = multicall.functions.aggregate3(_to_call3(chunk)).call(block_identifier=block_identifier)
+        except Exception as e:
+            logging.error(f"Error executing multicall batch of {len(chunk)} calls: {e}")
+            results.extend((False, str(e)) for _ in chunk)
+            continue
+        results.extend(_unpack_results(response))
+
+    return results
+
+
+async def aggregate_async(web3, calls, semaphore, batch_size=DEFAULT_BATCH_SIZE, multicall_address=MULTICALL3_ADDRESS, block_identifier='latest'):
+    """
+    Async version of :func:`aggregate` that sends the chunks concurrently.
+
+    Args:
+        web3 (AsyncWeb3): The AsyncWeb3 instance.
+        calls (list): A list of ``(target, call_data)`` tuples.
+        semaphore (asyncio.Semaphore): Bounds the number of in-flight requests.
+        batch_size (int): The maximum number of calls per ``eth_call``.
+        multicall_address (str): The address of the Multicall3 contract.
+        block_identifier (int or str): The block to execute the calls at.
+
+    Returns:
+        list: One ``(success, result)`` tuple per call, in order.
+    """
+    multicall = web3.eth.contract(address=multicall_address, abi=MULTICALL3_ABI)
+
+    async def run_chunk(chunk):
+        async with semaphore:
+            try:
+                response = await multicall.functions.aggregate3(_to_call3(chunk)).call(block_identifier=block_identifier)
+            except Exception as e:
+                logging.error(f"Error executing multicall batch of {len(chunk)} calls: {e}")
+                return [(False, str(e)) for _ in chunk]
+        return _unpack_results(response)
+
+    chunk_results = await asyncio.gather(*(run_chunk(chunk) for chunk in chunked(calls, batch_size)))
+    return [result for chunk_result in chunk_results for result in chunk_result]
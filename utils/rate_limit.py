@@ -0,0 +1,110 @@
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+# Lower values are admitted first
+PRIORITY_INTERACTIVE = 0  # a person is waiting, e.g. a Streamlit lookup
+PRIORITY_MONITOR = 1  # background monitor refreshes
+PRIORITY_BACKFILL = 2  # bulk history scans that can wait
+
+_priority = contextvars.ContextVar('request_priority', default=PRIORITY_MONITOR)
+
+
+@contextmanager
+def request_priority(priority):
+    """
+    Send the outbound requests made inside the block with the given priority.
+
+    Args:
+        priority (int): PRIORITY_INTERACTIVE, PRIORITY_MONITOR or PRIORITY_BACKFILL.
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    """Return the priority of requests made in the current context."""
+    return _priority.get()
+
+
+class PriorityTokenBucket:
+    """
+    Token bucket for one host that admits waiting requests in priority order.
+
+    Tokens refill at ``rate`` per second up to ``burst``. Waiting requests
+    are queued by priority, then by arrival, and only the head of the queue
+    may take a token, so a backlog of background requests never delays an
+    interactive one by more than one token.
+
+    Args:
+        rate (float): The sustained number of requests per second.
+        burst (float, optional): The bucket size; defaults to one second of requests, at least 1.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds):
+        """
+        Admit no request for ``seconds``, e.g. after the host answered with Retry-After.
+        """
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+    def queued(self):
+        """Return the number of requests waiting for a token."""
+        with self._condition:
+            return len(self._queue)
+
+    def acquire(self, priority=None):
+        """
+        Wait for a token.
+
+        Args:
+            priority (int, optional): Defaults to the priority of the current context.
+
+        Returns:
+            float: The seconds spent waiting.
+        """
+        entry = (current_priority() if priority is None else priority, next(self._sequence))
+        started = time.monotonic()
+        with self._condition:
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    head = self._queue[0] == entry
+                    if now < self._paused_until:
+                        self._condition.wait(self._paused_until - now if head else None)
+                        continue
+                    if head and self._tokens >= 1:
+                        self._tokens -= 1
+                        heapq.heappop(self._queue)
+                        self._condition.notify_all()
+                        return now - started
+                    # Only the head waits for the refill; the others wait for it to leave
+                    self._condition.wait((1 - self._tokens) / self.rate if head else None)
+            except BaseException:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._condition.notify_all()
+                raise
@@ -0,0 +1,449 @@
+import csv
+import json
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from .explorer import ExplorerError, iter_wallet_transfer_logs
+from .monitor import calculate_wallet_exposure, fetch_glp_data, get_batched_glp_balances, get_glp_price_history
+from .multicall import DEFAULT_BATCH_SIZE, MULTICALL3_ADDRESS
+
+DEFAULT_CHUNK_SIZE = 1000  # addresses read, valued and written together
+DEFAULT_WORKERS = 4  # chunks in flight; bounds memory to about twice this many chunks
+SPOOL_BATCH_SIZE = 10000  # transfers inserted into the spool per transaction
+
+REPORT_COLUMNS = ['address', 'network', 'balance', 'value', 'exposure', 'average_cost', 'realized_pnl',
+                  'unrealized_pnl', 'error']
+
+REPORT_FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.parquet': 'parquet'}
+
+
+def read_addresses(path, log_invalid=True):
+    """
+    Stream the wallet addresses of a CSV or newline-delimited file.
+
+    A CSV file (``.csv``) is read from its 'address' column when its header has
+    one, otherwise from its first column. Blank lines and lines starting with
+    '#' are skipped, and invalid addresses are logged and skipped.
+
+    Args:
+        path (str): The path of the address file.
+        log_invalid (bool): Whether to log the invalid addresses.
+
+    Yields:
+        str: Checksum addresses, in file order.
+    """
+    from web3 import Web3
+
+    with open(path, 'r', newline='') as address_file:
+        if path.lower().endswith('.csv'):
+            rows = csv.reader(address_file)
+            header = next(rows, [])
+            names = [name.strip().lower() for name in header]
+            column = names.index('address') if 'address' in names else 0
+            if header and 'address' not in names and Web3.is_address(header[0].strip()):
+                # No header: the first row is already an address
+                rows = _prepend(header, rows)
+            values = (row[column] if len(row) > column else '' for row in rows)
+        else:
+            values = address_file
+
+        for value in values:
+            value = value.strip()
+            if not value or value.startswith('#'):
+                continue
+            if not Web3.is_address(value):
+                if log_invalid:
+                    logging.error(f"Skipping invalid address in {path}: {value}")
+                continue
+            yield Web3.to_checksum_address(value)
+
+
+def _prepend(row, rows):
+    yield row
+    yield from rows
+
+
+def iter_chunks(items, size):
+    """
+    Split an iterable into consecutive lists of at most ``size`` items without reading it all.
+    """
+    if size < 1:
+        raise ValueError(f"Chunk size must be positive, got {size}")
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class TransferSpool:
+    """
+    Temporary on-disk store of the signed GLP transfers of the reported wallets.
+
+    Each chain's Transfer logs are scanned once for the whole address list and
+    spooled to SQLite, so each chunk of wallets only loads its own transfers.
+
+    Args:
+        path (str, optional): The path of the SQLite database; a temporary file by default.
+    """
+
+    def __init__(self, path=None):
+        self._directory = None
+        if path is None:
+            self._directory = tempfile.TemporaryDirectory(prefix='glp-report-')
+            path = os.path.join(self._directory.name, 'transfers.sqlite')
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS transfers (
+                network TEXT NOT NULL,
+                wallet TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
+                block_number INTEGER NOT NULL,
+                amount TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS transfers_wallet ON transfers (network, wallet);
+        """)
+        self.complete = {}
+
+    def close(self):
+        self._connection.close()
+        if self._directory is not None:
+            self._directory.cleanup()
+
+    def _insert(self, rows):
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT INTO transfers VALUES (?, ?, ?, ?, ?)", rows)
+
+    def fill(self, network, contract_address, api_key, user_addresses):
+        """
+        Scan a chain's Transfer logs once and spool those of the given wallets.
+
+        Args:
+            network (str): The network to scan ('arbitrum' or 'avalanche').
+            contract_address (str): The GLP contract address.
+            api_key (str): The API key for the blockchain explorer.
+            user_addresses (iterable): The reported wallets.
+
+        Returns:
+            bool: Whether the scan completed. PnL is only reported for complete chains.
+        """
+        rows = []
+        try:
+            for user_address, log in iter_wallet_transfer_logs(contract_address, api_key, user_addresses, network):
+                wallet = user_address.lower()
+                amount = int(log['data'], 16)
+                # A log reaches a wallet as the sender or the receiver; self-transfers net to zero
+                if log['topics'][2][-40:].lower() != wallet[2:]:
+                    amount = -amount
+                elif log['topics'][1][-40:].lower() == wallet[2:]:
+                    amount = 0
+                rows.append((network, wallet, int(log['timeStamp'], 16), int(log['blockNumber'], 16), str(amount)))
+                if len(rows) >= SPOOL_BATCH_SIZE:
+                    self._insert(rows)
+                    rows = []
+            self._insert(rows)
+            self.complete[network] = True
+        except ExplorerError as e:
+            logging.error(f"Error scanning {network} transfers, PnL will not be reported for it: {e}")
+            self.complete[network] = False
+        return self.complete[network]
+
+    def transfers(self, network, user_addresses):
+        """
+        Load the spooled transfers of some wallets as engine rows.
+
+        Args:
+            network (str): The network.
+            user_addresses (list): The wallets.
+
+        Returns:
+            DataFrame: Rows with 'wallet', 'timeStamp', 'blockNumber' and 'amount' (signed wei).
+        """
+        import pandas as pd
+
+        wallets = [user_address.lower() for user_address in user_addresses]
+        rows = []
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(wallets), 500):
+                batch = wallets[start:start + 500]
+                rows.extend(self._connection.execute(
+                    f"SELECT wallet, timestamp, block_number, amount FROM transfers "
+                    f"WHERE network = ? AND wallet IN ({', '.join('?' * len(batch))})",
+                    [network] + batch
+                ).fetchall())
+        frame = pd.DataFrame(rows, columns=['wallet', 'timeStamp', 'blockNumber', 'amount'])
+        frame['timeStamp'] = frame['timeStamp'].astype('int64')
+        frame['amount'] = [int(amount) for amount in frame['amount']]
+        frame['amount'] = frame['amount'].astype(object)
+        return frame
+
+
+def load_report_market(network):
+    """
+    Read the market data every wallet of a chain is valued with, once per report.
+
+    Args:
+        network (str): The network ('arbitrum' or 'avalanche').
+
+    Returns:
+        dict: The GLP 'price', the USD 'exposure' of one GLP per token, and the
+        daily 'price_history' used to price transfers.
+    """
+    price_history = get_glp_price_history(network)
+    try:
+        price = fetch_glp_data(network)['price']
+    except Exception as e:
+        logging.error(f"Error fetching GLP data for {network}, using the last daily price: {e}")
+        price = price_history[-1][1] if price_history else 0
+    try:
+        exposure = calculate_wallet_exposure(1.0, network)
+    except Exception as e:
+        logging.error(f"Error calculating {network} exposure: {e}")
+        exposure = {}
+    return {'price': price, 'exposure': exposure, 'price_history': price_history}
+
+
+def _float_or_none(value):
+    return None if value is None or math.isnan(value) else float(value)
+
+
+def report_chunk(contracts, user_addresses, markets, spool=None, batch_size=DEFAULT_BATCH_SIZE,
+                 multicall_address=MULTICALL3_ADDRESS):
+    """
+    Value one chunk of wallets on every chain.
+
+    Args:
+        contracts (dict): The GLP contract instances keyed by network.
+        user_addresses (list): The wallets of the chunk.
+        markets (dict): The :func:`load_report_market` results keyed by network.
+        spool (TransferSpool, optional): The spooled transfers, for cost basis and PnL.
+        batch_size (int): The maximum number of calls per multicall request.
+        multicall_address (str): The address of the Multicall3 contract.
+
+    Returns:
+        list: One row per wallet and chain, with the ``REPORT_COLUMNS``.
+    """
+    chains = []
+    for network, contract in contracts.items():
+        snapshot = get_batched_glp_balances(contract, user_addresses, batch_size, multicall_address)
+        cost_basis = {}
+        if spool is not None and spool.complete.get(network):
+            from .cost_basis import compute_cost_basis, price_transfers
+            transfers = price_transfers(spool.transfers(network, user_addresses), markets[network]['price_history'])
+            cost_basis = compute_cost_basis(transfers, markets[network]['price']).to_dict('index')
+        chains.append((network, markets[network], snapshot, cost_basis))
+
+    rows = []
+    for user_address in user_addresses:
+        for network, market, snapshot, cost_basis in chains:
+            balance = snapshot['balances'][user_address]
+            position = cost_basis.get(user_address.lower(), {})
+            rows.append({
+                'address': user_address,
+                'network': network,
+                'balance': balance,
+                'value': balance * market['price'],
+                'exposure': json.dumps({token: balance * usd for token, usd in market['exposure'].items()}),
+                'average_cost': _float_or_none(position.get('average_cost')),
+                'realized_pnl': _float_or_none(position.get('realized_pnl')),
+                'unrealized_pnl': _float_or_none(position.get('unrealized_pnl')),
+                'error': snapshot['errors'].get(user_address) or snapshot['errors'].get('totalSupply')
+            })
+    return rows
+
+
+class ReportWriter:
+    """
+    Stream report rows to a CSV, NDJSON or Parquet file as they are produced.
+
+    Args:
+        path (str): The output path.
+        output_format (str, optional): 'csv', 'ndjson' or 'parquet'; inferred from the extension by default.
+    """
+
+    def __init__(self, path, output_format=None):
+        if output_format is None:
+            output_format = REPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+        if output_format not in ('csv', 'ndjson', 'parquet'):
+            raise ValueError(f"Unsupported report format for {path}: {output_format}")
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.output_format = output_format
+        self.rows = 0
+        self._file = None
+        self._writer = None
+        if output_format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            self._schema = pa.schema([
+                ('address', pa.string()), ('network', pa.string()), ('balance', pa.float64()), ('value', pa.float64()),
+                ('exposure', pa.string()), ('average_cost', pa.float64()), ('realized_pnl', pa.float64()),
+                ('unrealized_pnl', pa.float64()), ('error', pa.string())
+            ])
+            self._writer = pq.ParquetWriter(path, self._schema)
+        else:
+            self._file = open(path, 'w', newline='')
+            if output_format == 'csv':
+                self._writer = csv.DictWriter(self._file, fieldnames=REPORT_COLUMNS)
+                self._writer.writeheader()
+
+    def write(self, rows):
+        """Append rows; each call becomes one Parquet row group."""
+        if self.output_format == 'parquet':
+            import pyarrow as pa
+            self._writer.write_table(pa.Table.from_pylist(rows, schema=self._schema))
+        elif self.output_format == 'csv':
+            self._writer.writerows(rows)
+            self._file.flush()
+        else:
+            self._file.writelines(json.dumps(row) + '\n' for row in rows)
+            self._file.flush()
+        self.rows += len(rows)
+
+    def close(self):
+        if self.output_format == 'parquet':
+            self._writer.close()
+        else:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ReportProgress:
+    """
+    Log how many addresses a report has covered, its rate and the time left.
+
+    Args:
+        total (int, optional): The number of addresses, when known.
+        interval (float): The minimum seconds between progress lines.
+    """
+
+    def __init__(self, total=None, interval=5):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self._started = time.monotonic()
+        self._logged = 0
+
+    def update(self, count, force=False):
+        self.done += count
+        now = time.monotonic()
+        if not force and now - self._logged < self.interval:
+            return
+        self._logged = now
+        rate = self.done / max(now - self._started, 1e-9)
+        if self.total:
+            eta = (self.total - self.done) / rate if rate else float('inf')
+            logging.info(f"Reported {self.done}/{self.total} addresses ({self.done / self.total:.0%}, {rate:.0f}/s, {eta:.0f}s left)")
+        else:
+            logging.info(f"Reported {self.done} addresses ({rate:.0f}/s)")
+
+
+def run_report(contracts, addresses_path, output_path, output_format=None, api_key=None, contract_addresses=None,
+               pnl=True, chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE,
+               multicall_address=MULTICALL3_ADDRESS, markets=None):
+    """
+    Report the balance, value, exposure and PnL of every address of a file on every chain.
+
+    Market data is read once per chain and shared by every wallet. With
+    ``pnl``, each chain's Transfer logs are scanned once for the whole list
+    and spooled to disk. The addresses are then streamed in chunks: up to
+    ``workers`` chunks are read concurrently and written in file order as
+    they complete, so memory stays bounded by the chunks in flight whatever
+    the length of the list.
+
+    Args:
+        contracts (dict): The GLP contract instances keyed by network.
+        addresses_path (str): The CSV or newline-delimited address file.
+        output_path (str): The report file; see :class:`ReportWriter`.
+        output_format (str, optional): 'csv', 'ndjson' or 'parquet'.
+        api_key (str, optional): The explorer API key, for PnL.
+        contract_addresses (dict, optional): The GLP contract addresses whose Transfer logs
+            are scanned, keyed by network; defaults to the contracts' addresses.
+        pnl (bool): Whether to compute cost basis and PnL.
+        chunk_size (int): The addresses per chunk.
+        workers (int): The chunks read concurrently.
+        batch_size (int): The maximum number of calls per multicall request.
+        multicall_address (str): The address of the Multicall3 contract.
+        markets (dict, optional): Precomputed :func:`load_report_market` results keyed by network.
+
+    Returns:
+        int: The number of rows written.
+    """
+    total = sum(1 for _ in read_addresses(addresses_path, log_invalid=False))
+    if markets is None:
+        markets = {network: load_report_market(network) for network in contracts}
+
+    spool = None
+    if pnl:
+        spool = TransferSpool()
+        contract_addresses = contract_addresses or {network: contract.address for network, contract in contracts.items()}
+        for network in contracts:
+            spool.fill(network, contract_addresses[network], api_key, read_addresses(addresses_path, log_invalid=False))
+
+    progress = ReportProgress(total)
+    try:
+        with ReportWriter(output_path, output_format) as writer, ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+
+            def write_next():
+                chunk_size_done, future = pending.popleft()
+                writer.write(future.result())
+                progress.update(chunk_size_done)
+
+            for chunk in iter_chunks(read_addresses(addresses_path), chunk_size):
+                pending.append((len(chunk), executor.submit(
+                    report_chunk, contracts, chunk, markets, spool, batch_size, multicall_address)))
+                if len(pending) >= workers:
+                    write_next()
+            while pending:
+                write_next()
+            progress.update(0, force=True)
+            return writer.rows
+    finally:
+        if spool is not None:
+            spool.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    from .cache import configure_cache
+    from .config_loader import load_config
+    from .http_client import configure_http
+    from .monitor import load_glp_contracts
+
+    parser = argparse.ArgumentParser(description="Write the GLP balance, value, exposure and PnL of every address in a file.")
+    parser.add_argument('addresses', help="A CSV file with an 'address' column, or one address per line")
+    parser.add_argument('--output', required=True, help="A .csv, .ndjson or .parquet file")
+    parser.add_argument('--format', choices=['csv', 'ndjson', 'parquet'], help="Overrides the format of the output extension")
+    parser.add_argument('--no-pnl', action='store_true', help="Skip the Transfer log scans for cost basis and PnL")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--config', default='config.yaml')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    config = load_config(args.config)
+    configure_cache(config.get('cache_ttls'), config.get('cache_maxsize'))
+    configure_http(**config.get('http', {}))
+    run_report(
+        load_glp_contracts(config), args.addresses, args.output, args.format,
+        api_key=config.get('api_key'), pnl=not args.no_pnl, chunk_size=args.chunk_size, workers=args.workers,
+        batch_size=config.get('multicall_batch_size', DEFAULT_BATCH_SIZE),
+        multicall_address=config.get('multicall_address', MULTICALL3_ADDRESS)
+    )
@@ -0,0 +1,238 @@
+import contextvars
+import itertools
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+DEFAULT_HEDGE_DELAY = 0.5  # seconds before hedging while no latencies are known
+DEFAULT_MIN_HEDGE_DELAY = 0.05
+DEFAULT_MAX_HEDGE_DELAY = 2.0
+DEFAULT_HEDGE_QUANTILE = 0.9  # hedge requests slower than this share of recent ones
+DEFAULT_MAX_FAILURES = 3  # consecutive failures before an endpoint leaves the rotation
+DEFAULT_COOLDOWN = 30  # seconds an unhealthy endpoint stays out of the rotation
+DEFAULT_LATENCY_WEIGHT = 0.2  # weight of the newest sample in the latency average
+DEFAULT_WORKERS = 16
+LATENCY_WINDOW = 200  # recent latencies the hedge delay is computed from
+
+# Every live pool, for the metrics collector
+POOLS = weakref.WeakSet()
+
+# Numbers the pools, so their endpoints can be told apart without their URLs
+_pool_ids = itertools.count()
+
+
+class EndpointHealth:
+    """
+    Health of one endpoint: a moving latency average and its recent failures.
+
+    Args:
+        url (str): The endpoint URL.
+
+    Attributes:
+        host (str): The host and port of the URL. RPC URLs often carry an API key in
+            their path or credentials, so only this part is logged or exported.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.host = urlsplit(url).netloc.rpartition('@')[2]
+        self.latency = None
+        self.failures = 0
+        self.disabled_until = 0
+        self.requests = 0
+        self.errors = 0
+
+    def healthy(self, now):
+        return self.disabled_until <= now
+
+    def score(self):
+        """Lower is better: the average latency, doubled for every consecutive failure."""
+        return (self.latency or 0) * (2 ** self.failures)
+
+
+class EndpointPool:
+    """
+    Send each request to the best of several equivalent endpoints, hedged and with failover.
+
+    Endpoints are ranked by a moving average of their latency, penalized for
+    recent failures. A request goes to the best one; if it has not answered
+    after the hedge delay, a duplicate goes to the next one and whichever
+    answers first wins. A failed request moves on to the next endpoint right
+    away. The hedge delay follows a high quantile of recent latencies, so only
+    the slowest requests are duplicated.
+
+    An endpoint that fails ``max_failures`` times in a row leaves the rotation
+    for ``cooldown`` seconds, after which one request probes it again. When
+    every endpoint is out of the rotation, they are all tried anyway.
+
+    Requests that depend on state held by one node, such as filters, go
+    through :meth:`sticky_request` instead, which pins them to one endpoint.
+
+    Args:
+        urls (list): The endpoint URLs.
+        min_hedge_delay (float): The shortest hedge delay, in seconds.
+        max_hedge_delay (float): The longest hedge delay, in seconds.
+        hedge_quantile (float): The quantile of recent latencies used as the hedge delay.
+        max_failures (int): Consecutive failures before an endpoint leaves the rotation.
+        cooldown (float): Seconds an unhealthy endpoint stays out of the rotation.
+        workers (int): Threads sending requests, shared by every caller of the pool.
+    """
+
+    def __init__(self, urls, min_hedge_delay=DEFAULT_MIN_HEDGE_DELAY, max_hedge_delay=DEFAULT_MAX_HEDGE_DELAY,
+                 hedge_quantile=DEFAULT_HEDGE_QUANTILE, max_failures=DEFAULT_MAX_FAILURES, cooldown=DEFAULT_COOLDOWN,
+                 workers=DEFAULT_WORKERS):
+        if not urls:
+            raise ValueError("At least one endpoint URL is required")
+        self.id = next(_pool_ids)
+        self.endpoints = [EndpointHealth(url) for url in urls]
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.hedge_quantile = hedge_quantile
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.hedged = 0
+        self._sticky = None
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rpc-pool')
+        POOLS.add(self)
+
+    def ranked(self):
+        """
+        Return the endpoints to try, best first.
+
+        Returns:
+            list: The healthy endpoints by score, or every endpoint by the time
+            it left the rotation when none is healthy.
+        """
+        now = time.monotonic()
+        with self._lock:
+            healthy = [endpoint for endpoint in self.endpoints if endpoint.healthy(now)]
+            if healthy:
+                return sorted(healthy, key=EndpointHealth.score)
+            return sorted(self.endpoints, key=lambda endpoint: endpoint.disabled_until)
+
+    def hedge_delay(self):
+        """Return how long to wait for an answer before hedging, in seconds."""
+        with self._lock:
+            if not self._latencies:
+                return min(max(DEFAULT_HEDGE_DELAY, self.min_hedge_delay), self.max_hedge_delay)
+            latencies = sorted(self._latencies)
+        delay = latencies[min(int(len(latencies) * self.hedge_quantile), len(latencies) - 1)]
+        return min(max(delay, self.min_hedge_delay), self.max_hedge_delay)
+
+    def _send(self, send, endpoint):
+        # Recorded before the future completes, so the next ranking already sees it
+        started = time.monotonic()
+        try:
+            result = send(endpoint.url)
+        except Exception as e:
+            self._record(endpoint, time.monotonic() - started, e)
+            raise
+        self._record(endpoint, time.monotonic() - started)
+        return result
+
+    def _record(self, endpoint, seconds, error=None):
+        with self._lock:
+            endpoint.requests += 1
+            if error is None:
+                endpoint.failures = 0
+                endpoint.latency = seconds if endpoint.latency is None else (
+                    DEFAULT_LATENCY_WEIGHT * seconds + (1 - DEFAULT_LATENCY_WEIGHT) * endpoint.latency)
+                self._latencies.append(seconds)
+                return
+            endpoint.errors += 1
+            endpoint.failures += 1
+            if endpoint.failures >= self.max_failures:
+                endpoint.disabled_until = time.monotonic() + self.cooldown
+        if endpoint.failures >= self.max_failures:
+            logging.error(f"Removing {endpoint.host} from rotation for {self.cooldown}s after {endpoint.failures} failures: {error}")
+
+    def request(self, send):
+        """
+        Run ``send(url)`` against the endpoints until one succeeds.
+
+        Args:
+            send (callable): Sends the request to the given URL and returns the
+                result, raising on failure.
+
+        Returns:
+            object: The first successful result.
+
+        Raises:
+            Exception: The last endpoint's error, if every endpoint failed.
+        """
+        candidates = self.ranked()
+        pending = set()
+        last_error = None
+
+        def launch():
+            # Run in a copy of the caller's context so the request keeps its priority
+            context = contextvars.copy_context()
+            pending.add(self._executor.submit(context.run, self._send, send, candidates.pop(0)))
+
+        launch()
+        while pending:
+            done, _ = wait(pending, timeout=self.hedge_delay() if candidates else None, return_when=FIRST_COMPLETED)
+            if not done:
+                with self._lock:
+                    self.hedged += 1
+                launch()
+                continue
+            for future in done:
+                pending.discard(future)
+                if future.exception() is None:
+                    return future.result()
+                last_error = future.exception()
+            if candidates and not pending:
+                launch()
+
+        raise last_error
+
+    def sticky_request(self, send):
+        """
+        Run ``send(url)`` against the pinned endpoint, without hedging or failover.
+
+        The best endpoint is pinned when first needed. When a request to it
+        fails, the error is raised and the next request is pinned to the best
+        endpoint at that time, so the caller must recreate its node-side state
+        there (the event watcher reinstalls filters it finds missing).
+
+        Args:
+            send (callable): Sends the request to the given URL and returns the
+                result, raising on failure.
+
+        Returns:
+            object: The result.
+        """
+        with self._lock:
+            endpoint = self._sticky
+        if endpoint is None:
+            endpoint = self.ranked()[0]
+            with self._lock:
+                self._sticky = endpoint = self._sticky or endpoint
+        try:
+            return self._send(send, endpoint)
+        except Exception:
+            with self._lock:
+                if self._sticky is endpoint:
+                    self._sticky = None
+            raise
+
+    def stats(self):
+        """
+        Return the health of every endpoint.
+
+        Returns:
+            list: Dicts with the endpoint 'url', 'host', 'healthy', 'latency', 'failures',
+            'requests' and 'errors', in the order the URLs were given.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [{'url': endpoint.url, 'host': endpoint.host, 'healthy': endpoint.healthy(now), 'latency': endpoint.latency,
+                     'failures': endpoint.failures, 'requests': endpoint.requests, 'errors': endpoint.errors}
+                    for endpoint in self.endpoints]
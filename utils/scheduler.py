@@ -0,0 +1,238 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .metrics import REGISTRY, observe_tick, set_backlog
+
+DEFAULT_SHARD_SIZE = 500
+DEFAULT_WORKERS = 4
+
+# Checked top to bottom: an address joins the first tier its balance reaches
+DEFAULT_TIERS = [
+    {'name': 'large', 'min_balance': 10000, 'interval': 15},
+    {'name': 'medium', 'min_balance': 100, 'interval': 60},
+    {'name': 'small', 'min_balance': 0, 'interval': 600},
+]
+
+# Addresses whose balance changed this recently are refreshed with the first tier
+DEFAULT_ACTIVITY_WINDOW = 3600
+
+
+def _timed_refresh(refresh_shard, user_addresses):
+    # Runs in the worker, so the start time includes any wait for a free worker
+    started_at = time.time()
+    return started_at, refresh_shard(user_addresses)
+
+
+class Shard:
+    """
+    A slice of one tier's addresses that is refreshed as a unit.
+
+    Attributes:
+        key (tuple): ``(tier name, shard number)``.
+        user_addresses (list): The addresses of the shard.
+        interval (float): The refresh interval of the shard's tier.
+        next_due (float): When the shard should next start, as a ``time.time()`` value.
+        lag (float): How late the last refresh started, in seconds.
+        duration (float): How long the last refresh took, in seconds.
+        runs (int): The number of completed refreshes.
+        errors (int): The number of failed refreshes.
+    """
+
+    def __init__(self, key, user_addresses, interval, next_due):
+        self.key = key
+        self.user_addresses = user_addresses
+        self.interval = interval
+        self.next_due = next_due
+        self.lag = 0.0
+        self.duration = 0.0
+        self.runs = 0
+        self.errors = 0
+
+
+class ShardedScheduler:
+    """
+    Refresh a large watchlist in shards, with one refresh interval per tier.
+
+    Addresses are grouped into tiers by balance, with recently active addresses
+    promoted to the first tier, and every tier is split into shards of at most
+    ``shard_size`` addresses. Due shards run concurrently on the executor; each
+    refresh returns the new balances, which move addresses between tiers.
+    Addresses start in the last tier and are all due immediately.
+
+    Tick lag (how late a shard started against its schedule) is kept per
+    shard, so a growing lag shows that more workers are needed.
+
+    Args:
+        refresh_shard (callable): Called with a list of addresses on a worker; returns
+            their balances keyed by address. Addresses left out (e.g. failed reads) keep
+            their balance, activity and tier. Must be picklable for a process pool.
+        user_addresses (list): The addresses to monitor.
+        tiers (list, optional): Dicts with 'name', 'min_balance' and 'interval' (seconds),
+            from the highest balance down. Defaults to ``DEFAULT_TIERS``.
+        shard_size (int): The maximum number of addresses per shard.
+        executor (Executor, optional): Runs the refreshes. Defaults to a thread pool
+            of ``DEFAULT_WORKERS`` threads.
+        activity_window (float): How long (in seconds) a balance change keeps an
+            address in the first tier.
+        collect (callable, optional): Called in the scheduling thread with each refresh's
+            result; returns the balances. Lets a refresh hand more than balances back from
+            a worker process, e.g. the snapshots to record.
+    """
+
+    def __init__(self, refresh_shard, user_addresses, tiers=None, shard_size=DEFAULT_SHARD_SIZE, executor=None,
+                 activity_window=DEFAULT_ACTIVITY_WINDOW, collect=None):
+        if shard_size < 1:
+            raise ValueError("shard_size must be at least 1")
+        self.refresh_shard = refresh_shard
+        self.tiers = tiers or DEFAULT_TIERS
+        self.shard_size = shard_size
+        self.executor = executor or ThreadPoolExecutor(max_workers=DEFAULT_WORKERS)
+        self.activity_window = activity_window
+        self.collect = collect
+        self.balances = {}
+        self.last_active = {}
+        self.shards = {}
+        self._tier_of = {address: self.tiers[-1]['name'] for address in user_addresses}
+        self._in_flight = {}
+        self._rebuild(time.time(), initial=True)
+
+    def _tier_for(self, address, now):
+        if now - self.last_active.get(address, float('-inf')) <= self.activity_window:
+            return self.tiers[0]['name']
+        balance = self.balances.get(address, 0)
+        for tier in self.tiers:
+            if balance >= tier['min_balance']:
+                return tier['name']
+        return self.tiers[-1]['name']
+
+    def _rebuild(self, now, initial=False):
+        members = {tier['name']: [] for tier in self.tiers}
+        for address, tier_name in self._tier_of.items():
+            members[tier_name].append(address)
+
+        shards = {}
+        for tier in self.tiers:
+            addresses = sorted(members[tier['name']])
+            for number, start in enumerate(range(0, len(addresses), self.shard_size)):
+                key = (tier['name'], number)
+                previous = self.shards.get(key)
+                # Addresses reaching a new shard were just refreshed, so it waits one interval
+                next_due = previous.next_due if previous else (now if initial else now + tier['interval'])
+                shard = Shard(key, addresses[start:start + self.shard_size], tier['interval'], next_due)
+                if previous:
+                    shard.lag, shard.duration, shard.runs, shard.errors = \
+                        previous.lag, previous.duration, previous.runs, previous.errors
+                shards[key] = shard
+        self.shards = shards
+
+    def _complete(self, shard_key, due, future, now):
+        shard = self.shards.get(shard_key)
+        try:
+            started_at, balances = future.result()
+            if self.collect:
+                balances = self.collect(balances)
+        except Exception as e:
+            logging.error(f"Error refreshing shard {shard_key}: {e}")
+            if shard:
+                shard.errors += 1
+            return False
+
+        if shard:
+            shard.lag = max(0.0, started_at - due)
+            shard.duration = now - started_at
+            shard.runs += 1
+            observe_tick('sharded', shard.duration)
+            REGISTRY.set('glp_shard_lag_seconds', shard.lag, tier=shard_key[0])
+            if shard.lag > shard.interval:
+                logging.warning(f"Shard {shard_key} started {shard.lag:.1f}s late; add workers or enlarge shards")
+
+        moved = False
+        for address, balance in balances.items():
+            previous = self.balances.get(address)
+            if previous is not None and previous != balance:
+                self.last_active[address] = now
+            self.balances[address] = balance
+            tier_name = self._tier_for(address, now)
+            if address in self._tier_of and self._tier_of[address] != tier_name:
+                self._tier_of[address] = tier_name
+                moved = True
+        return moved
+
+    def tick(self, now=None):
+        """
+        Start every due shard that is not already running, then collect finished ones.
+
+        Args:
+            now (float, optional): The current ``time.time()``.
+
+        Returns:
+            int: The number of shards that finished.
+        """
+        now = time.time() if now is None else now
+        for key, shard in self.shards.items():
+            if key in self._in_flight or shard.next_due > now:
+                continue
+            future = self.executor.submit(_timed_refresh, self.refresh_shard, shard.user_addresses)
+            self._in_flight[key] = (future, shard.next_due)
+            # Keep the cadence, but do not queue up missed runs
+            shard.next_due = max(shard.next_due + shard.interval, now)
+
+        finished = 0
+        moved = False
+        for key, (future, due) in list(self._in_flight.items()):
+            if future.done():
+                del self._in_flight[key]
+                moved = self._complete(key, due, future, time.time()) or moved
+                finished += 1
+
+        if moved:
+            self._rebuild(now)
+        set_backlog('sharded', len(self._in_flight))
+        return finished
+
+    def next_due(self):
+        """Return the earliest ``next_due`` over all shards, or None without shards."""
+        return min((shard.next_due for shard in self.shards.values()), default=None)
+
+    def wait(self, timeout):
+        """
+        Block until a running shard finishes or ``timeout`` seconds pass.
+        """
+        futures = [future for future, _ in self._in_flight.values()]
+        if futures:
+            wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        elif timeout > 0:
+            time.sleep(timeout)
+
+    def run_forever(self, report_interval=60):
+        """
+        Keep refreshing shards as they fall due, logging every shard's lag periodically.
+
+        Args:
+            report_interval (float): The time (in seconds) between lag reports.
+        """
+        next_report = time.time() + report_interval
+        while True:
+            self.tick()
+            now = time.time()
+            if now >= next_report:
+                for key, stats in self.shard_stats().items():
+                    logging.info(f"Shard {key}: {stats['size']} addresses, lag {stats['lag']:.1f}s, "
+                                 f"duration {stats['duration']:.1f}s, errors {stats['errors']}")
+                next_report = now + report_interval
+            next_due = self.next_due()
+            self.wait(max(0.0, min(next_due, next_report) - now) if next_due is not None else 1.0)
+
+    def shard_stats(self):
+        """
+        Report the state of every shard.
+
+        Returns:
+            dict: Per shard key, the 'tier', 'size', 'lag', 'duration', 'runs' and 'errors'.
+        """
+        return {
+            key: {'tier': key[0], 'size': len(shard.user_addresses), 'lag': shard.lag,
+                  'duration': shard.duration, 'runs': shard.runs, 'errors': shard.errors}
+            for key, shard in self.shards.items()
+        }
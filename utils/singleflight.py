@@ -0,0 +1,67 @@
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Merge concurrent calls for the same key into one in-flight call.
+
+    The first caller of a key runs the function; callers arriving while it
+    runs wait for it and get the same result or exception. Nothing is kept
+    once the call finishes, so the next call after it runs again.
+
+    Attributes:
+        calls (int): The number of calls that ran the function.
+        shared (int): The number of calls served by another caller's run.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """
+        Run ``func()`` for a key, or wait for the run already in flight for it.
+
+        Args:
+            key (hashable): Identifies identical requests.
+            func (callable): Called without arguments to produce the result.
+
+        Returns:
+            object: The result of the run that served this call.
+        """
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
@@ -0,0 +1,146 @@
+import re
+
+from .constants import SUBGRAPH_URLS
+from .http_client import http_post
+from .metrics import track_call
+
+DEFAULT_PAGE_SIZE = 1000
+
+# How far back (in seconds) before the newest snapshot to look for each token's latest one
+DEFAULT_LOOKBACK = 7 * 24 * 60 * 60
+
+TOKEN_STAT_FIELDS = "id token poolAmountUsd timestamp"
+
+# The first field selected by a query, e.g. 'glpStats', names it in the metrics
+QUERY_ENTITY = re.compile(r'\{\s*(\w+)')
+
+
+class SubgraphError(Exception):
+    """Raised when the subgraph request fails or returns GraphQL errors."""
+
+
+def query_subgraph(network, query, variables=None):
+    """
+    Send a GraphQL query to the GMX stats subgraph of a network.
+
+    Args:
+        network (str): The network to query ('arbitrum' or 'avalanche').
+        query (str): The GraphQL query.
+        variables (dict, optional): The query variables.
+
+    Returns:
+        dict: The 'data' member of the response.
+
+    Raises:
+        ValueError: If the network is not supported.
+        SubgraphError: If the request fails or the response contains errors.
+    """
+    api_url = SUBGRAPH_URLS.get(network)
+    if not api_url:
+        raise ValueError(f"Unsupported network: {network}")
+
+    payload = {'query': query}
+    if variables:
+        payload['variables'] = variables
+
+    entity = QUERY_ENTITY.search(query)
+    with track_call('subgraph', entity.group(1) if entity else 'unknown'):
+        response = http_post(api_url, json=payload)
+        if response.status_code != 200:
+            raise SubgraphError(f"Failed to retrieve data: {response.status_code}")
+
+        body = response.json()
+        if body.get('errors'):
+            raise SubgraphError(f"Subgraph returned errors: {body['errors']}")
+        return body.get('data') or {}
+
+
+def iter_entities(network, entity, fields, where='', page_size=DEFAULT_PAGE_SIZE):
+    """
+    Stream every entity matching a filter, paginating with an ``id_gt`` cursor.
+
+    Unlike ``skip``, the cursor keeps each page an indexed lookup, and pages
+    are yielded as they arrive instead of being collected first.
+
+    Args:
+        network (str): The network to query ('arbitrum' or 'avalanche').
+        entity (str): The collection to query, e.g. 'tokenStats'.
+        fields (str): The fields to select. 'id' is always selected.
+        where (str): Extra GraphQL filter arguments, e.g. 'period: daily'.
+        page_size (int): The number of entities per request.
+
+    Yields:
+        dict: The entities in ascending ``id`` order.
+    """
+    if 'id' not in fields.split():
+        fields = f"id {fields}"
+    filters = f"id_gt: $cursor, {where}" if where else "id_gt: $cursor"
+    query = f"""
+    query ($cursor: ID!, $first: Int!) {{
+      {entity}(first: $first, orderBy: id, orderDirection: asc, where: {{{filters}}}) {{
+        {fields}
+      }}
+    }}
+    """
+
+    cursor = ""
+    while True:
+        page = query_subgraph(network, query, {'cursor': cursor, 'first': page_size}).get(entity, [])
+        yield from page
+        if len(page) < page_size:
+            return
+        cursor = page[-1]['id']
+
+
+def get_latest_timestamp(network, entity, where=''):
+    """
+    Return the timestamp of the most recent entity matching a filter.
+
+    Args:
+        network (str): The network to query ('arbitrum' or 'avalanche').
+        entity (str): The collection to query, e.g. 'tokenStats'.
+        where (str): Extra GraphQL filter arguments.
+
+    Returns:
+        int: The latest timestamp, or None if nothing matches.
+    """
+    filters = f", where: {{{where}}}" if where else ""
+    query = f"""
+    {{
+      {entity}(first: 1, orderBy: timestamp, orderDirection: desc{filters}) {{
+        timestamp
+      }}
+    }}
+    """
+    rows = query_subgraph(network, query).get(entity, [])
+    return int(rows[0]['timestamp']) if rows else None
+
+
+def get_latest_token_stats(network='arbitrum', period='daily', lookback=DEFAULT_LOOKBACK, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Fetch the latest tokenStats snapshot of every token in the pool.
+
+    Only snapshots from the last ``lookback`` seconds before the newest one are
+    downloaded, and of those only the most recent one per token is kept, so a
+    token without a row at the newest timestamp keeps its last snapshot.
+
+    Args:
+        network (str): The network to query ('arbitrum' or 'avalanche').
+        period (str): The snapshot period ('hourly', 'daily', ...).
+        lookback (int): How far (in seconds) before the newest snapshot to look for tokens.
+        page_size (int): The number of entities per request.
+
+    Returns:
+        dict: The latest snapshot of each token, keyed by token address.
+    """
+    latest_timestamp = get_latest_timestamp(network, 'tokenStats', f"period: {period}")
+    if latest_timestamp is None:
+        return {}
+
+    where = f"period: {period}, timestamp_gte: {latest_timestamp - lookback}"
+    latest = {}
+    for row in iter_entities(network, 'tokenStats', TOKEN_STAT_FIELDS, where, page_size):
+        current = latest.get(row['token'])
+        if current is None or int(row['timestamp']) > int(current['timestamp']):
+            latest[row['token']] = row
+    return latest
@@ -0,0 +1,387 @@
+import logging
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_STORE_PATH = 'data/timeseries'
+DEFAULT_SEGMENT_ROWS = 10000
+DEFAULT_FLUSH_INTERVAL = 300  # seconds buffered rows may wait for a flush
+DEFAULT_COMPACT_INTERVAL = 3600  # seconds between compactions of the closed days
+COMPACT_WINDOW = 86400  # segments are merged per UTC day, once no tick can fall in it any more
+READ_ATTEMPTS = 3  # listings retried when a compaction removes a listed segment
+
+# Key and value columns of every table; each row also has an integer 'timestamp' in seconds
+TABLES = {
+    'chains': {'keys': ['network'], 'values': ['total_supply', 'glp_price', 'aum']},
+    'balances': {'keys': ['network', 'address'], 'values': ['balance']},
+}
+
+# Bucket width in seconds of each precomputed rollup
+ROLLUPS = {'1m': 60, '1h': 3600, '1d': 86400}
+
+RAW = 'raw'
+
+
+def _segment_bounds(name):
+    first, last, _ = name.split('-', 2)
+    return int(first), int(last)
+
+
+def _segment_sequence(name):
+    """
+    Return the write sequence of a segment and whether it is a compacted one.
+
+    Segments are named ``<first>-<last>-<sequence>-<uuid>.parquet``, and the
+    segment that replaces a day's segments ``<first>-<last>-<sequence>-compacted.parquet``
+    with the highest sequence it includes. Segments written before sequences
+    were added count as sequence 0.
+    """
+    parts = name[:-len('.parquet')].split('-')
+    if len(parts) < 4:
+        return 0, False
+    return int(parts[2]), parts[3] == 'compacted'
+
+
+def _live_segments(names):
+    """
+    Drop the segments already merged into the newest compacted segment of their day.
+
+    A compacted segment is written before its inputs are removed, so a reader
+    listing the directory in between skips the inputs instead of counting
+    their rows twice. Segments written after the compaction are still read.
+    """
+    through = {}
+    for name in names:
+        sequence, compacted = _segment_sequence(name)
+        if compacted:
+            window = _segment_bounds(name)[0] // COMPACT_WINDOW
+            through[window] = max(through.get(window, -1), sequence)
+
+    live = []
+    for name in names:
+        sequence, compacted = _segment_sequence(name)
+        merged_through = through.get(_segment_bounds(name)[0] // COMPACT_WINDOW, -1)
+        if (sequence == merged_through) if compacted else (sequence > merged_through):
+            live.append(name)
+    return live
+
+
+def _filters(keys, filters):
+    unknown = set(filters) - set(keys)
+    if unknown:
+        raise ValueError(f"Unknown filter columns: {sorted(unknown)}")
+    return [(column, '==', value) for column, value in filters.items() if value is not None] or None
+
+
+def _merge_rollup_parts(table, frame):
+    """Merge rollup rows of the same bucket and key, e.g. from different flushes, into one."""
+    schema = TABLES[table]
+    keys = ['bucket'] + schema['keys']
+
+    # A bucket split across flushes opens with its earliest part and closes with its latest
+    opens = frame.sort_values('first_ts', kind='stable').groupby(keys, sort=True).agg(
+        first_ts=('first_ts', 'first'), **{f'{column}_open': (f'{column}_open', 'first') for column in schema['values']})
+    closes = frame.sort_values('last_ts', kind='stable').groupby(keys, sort=True).agg(
+        last_ts=('last_ts', 'last'), **{f'{column}_close': (f'{column}_close', 'last') for column in schema['values']})
+    aggregations = {'count': ('count', 'sum')}
+    for column in schema['values']:
+        aggregations.update({
+            f'{column}_high': (f'{column}_high', 'max'),
+            f'{column}_low': (f'{column}_low', 'min'),
+            f'{column}_sum': (f'{column}_sum', 'sum'),
+        })
+    totals = frame.groupby(keys, sort=True).agg(**aggregations)
+    return pd.concat([totals, opens, closes], axis=1).reset_index()
+
+
+class TimeSeriesStore:
+    """
+    Append-only, columnar store of monitor ticks in Parquet segments.
+
+    Rows are buffered and written as immutable segments under
+    ``<root>/<table>/raw`` once ``segment_rows`` rows are buffered or
+    ``flush_interval`` seconds have passed. Every flush also
+    writes rollup segments for each resolution in ``ROLLUPS``, holding per
+    bucket the open, high, low, close, sum and count of every value column.
+    A bucket split across flushes is merged when it is read, using the times
+    of each part's first and last tick. Segment file names carry their first
+    and last timestamps, so range queries only open the segments that overlap
+    the range. Every ``compact_interval`` seconds a background thread merges
+    the raw and rollup segments of each closed day into one segment per day
+    (see :meth:`compact`), so a long-running monitor does not leave one file
+    per flush behind and each compaction only rewrites the days that closed
+    since the last one.
+
+    The store has a single writer; :meth:`flush` before exiting so buffered
+    rows are not lost.
+
+    Args:
+        root (str): The directory of the store.
+        segment_rows (int): The number of buffered rows that triggers a flush.
+        flush_interval (float): The time (in seconds) after which buffered rows are flushed.
+        compact_interval (float, optional): The time (in seconds) between compactions;
+            None disables them.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_PATH, segment_rows=DEFAULT_SEGMENT_ROWS, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 compact_interval=DEFAULT_COMPACT_INTERVAL):
+        self.root = root
+        self.segment_rows = segment_rows
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self._last_flush = time.monotonic()
+        self._last_compact = time.monotonic()
+        self._compactor = None
+        self._sequence = 0
+        self._buffers = {table: [] for table in TABLES}
+        self._lock = threading.Lock()
+
+    def _directory(self, table, resolution):
+        return os.path.join(self.root, table, resolution)
+
+    def append(self, table, timestamp, rows):
+        """
+        Buffer the rows of one tick, flushing once the buffer is full or old enough.
+
+        Args:
+            table (str): 'chains' or 'balances'.
+            timestamp (int): The tick time, in seconds since the epoch.
+            rows (list): Dicts with the table's key and value columns.
+        """
+        schema = TABLES[table]
+        columns = schema['keys'] + schema['values']
+        with self._lock:
+            buffer = self._buffers[table]
+            buffer.extend(dict({column: row[column] for column in columns}, timestamp=int(timestamp)) for row in rows)
+            if len(buffer) >= self.segment_rows:
+                self._flush_table(table)
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                for name in TABLES:
+                    self._flush_table(name)
+            if self.compact_interval is not None and time.monotonic() - self._last_compact >= self.compact_interval \
+                    and not (self._compactor and self._compactor.is_alive()):
+                # Compaction reads and rewrites whole days, so it must not hold up the tick
+                self._last_compact = time.monotonic()
+                self._compactor = threading.Thread(target=self._compact_all, daemon=True, name='timeseries-compact')
+                self._compactor.start()
+
+    def record_snapshot(self, timestamp, network, snapshot, glp_data=None):
+        """
+        Record a chain snapshot from :func:`get_batched_glp_balances` and its balances.
+
+        Args:
+            timestamp (int): The tick time, in seconds since the epoch.
+            network (str): The network of the snapshot.
+            snapshot (dict): The snapshot, with 'total_supply' and 'balances'.
+            glp_data (dict, optional): The chain's GLP data from :func:`fetch_glp_data`.
+        """
+        glp_data = glp_data or {}
+        self.append('chains', timestamp, [{
+            'network': network,
+            'total_supply': float(snapshot['total_supply']),
+            'glp_price': float(glp_data.get('price', float('nan'))),
+            'aum': float(glp_data.get('aum_in_usdg', float('nan')))
+        }])
+        self.append('balances', timestamp, [
+            {'network': network, 'address': address, 'balance': float(balance)}
+            for address, balance in snapshot['balances'].items()
+        ])
+
+    def flush(self):
+        """Write every buffered row to new segments."""
+        with self._lock:
+            for table in TABLES:
+                self._flush_table(table)
+
+    def _write_segment(self, table, resolution, frame, first, last, sequence=None):
+        directory = self._directory(table, resolution)
+        os.makedirs(directory, exist_ok=True)
+        if sequence is None:
+            # Called with the lock held by append and flush
+            self._sequence = max(self._sequence + 1, time.time_ns())
+            name = f"{first:012d}-{last:012d}-{self._sequence:020d}-{uuid.uuid4().hex}.parquet"
+        else:
+            name = f"{first:012d}-{last:012d}-{sequence:020d}-compacted.parquet"
+        # Write under a temporary name so readers never see a partial segment
+        path = os.path.join(directory, name)
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def _flush_table(self, table):
+        self._last_flush = time.monotonic()
+        buffer = self._buffers[table]
+        if not buffer:
+            return
+        schema = TABLES[table]
+        frame = pd.DataFrame(buffer).sort_values('timestamp', kind='stable')
+        first, last = int(frame['timestamp'].iloc[0]), int(frame['timestamp'].iloc[-1])
+        self._write_segment(table, RAW, frame, first, last)
+
+        for resolution, width in ROLLUPS.items():
+            frame['bucket'] = frame['timestamp'] // width * width
+            aggregations = {'count': ('timestamp', 'size'), 'first_ts': ('timestamp', 'min'), 'last_ts': ('timestamp', 'max')}
+            for column in schema['values']:
+                aggregations.update({
+                    f'{column}_open': (column, 'first'),
+                    f'{column}_high': (column, 'max'),
+                    f'{column}_low': (column, 'min'),
+                    f'{column}_close': (column, 'last'),
+                    f'{column}_sum': (column, 'sum'),
+                })
+            rollup = frame.groupby(['bucket'] + schema['keys'], sort=True).agg(**aggregations).reset_index()
+            self._write_segment(table, resolution, rollup, first // width * width, last // width * width)
+
+        buffer.clear()
+
+    def _segments(self, table, resolution):
+        directory = self._directory(table, resolution)
+        if not os.path.isdir(directory):
+            return []
+        return _live_segments(sorted(name for name in os.listdir(directory) if name.endswith('.parquet')))
+
+    def _read_segments(self, table, resolution, names, conditions):
+        directory = self._directory(table, resolution)
+        frames = [pq.read_table(os.path.join(directory, name), filters=conditions or None).to_pandas() for name in names]
+        frames = [frame for frame in frames if len(frame)]
+        return pd.concat(frames, ignore_index=True) if frames else None
+
+    def _read(self, table, resolution, start, end, time_column, filters):
+        conditions = _filters(TABLES[table]['keys'], filters) or []
+        if start is not None:
+            conditions.append((time_column, '>=', start))
+        if end is not None:
+            conditions.append((time_column, '<', end))
+
+        for attempt in range(READ_ATTEMPTS):
+            names = []
+            for name in self._segments(table, resolution):
+                first, last = _segment_bounds(name)
+                if (start is not None and last < start) or (end is not None and first >= end):
+                    continue
+                names.append(name)
+            try:
+                return self._read_segments(table, resolution, names, conditions)
+            except FileNotFoundError:
+                # A compaction replaced listed segments; the new listing has their merged segment
+                if attempt == READ_ATTEMPTS - 1:
+                    raise
+
+    def query(self, table, start=None, end=None, **filters):
+        """
+        Read the raw ticks of a table in a time range.
+
+        Only written segments are read; call :meth:`flush` first to include buffered rows.
+
+        Args:
+            table (str): 'chains' or 'balances'.
+            start (int, optional): The first timestamp to include.
+            end (int, optional): The timestamp to stop before.
+            **filters: Equality filters on key columns, e.g. ``network='arbitrum'``.
+
+        Returns:
+            DataFrame: The matching rows ordered by timestamp.
+        """
+        schema = TABLES[table]
+        frame = self._read(table, RAW, start, end, 'timestamp', filters)
+        if frame is None:
+            return pd.DataFrame(columns=['timestamp'] + schema['keys'] + schema['values'])
+        return frame.sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+    def _merged_rollup(self, table, resolution, start=None, end=None, filters=None):
+        if resolution not in ROLLUPS:
+            raise ValueError(f"Unsupported resolution: {resolution}")
+        frame = self._read(table, resolution, start, end, 'bucket', filters or {})
+        return None if frame is None else _merge_rollup_parts(table, frame)
+
+    def rollup(self, table, resolution, start=None, end=None, **filters):
+        """
+        Read a precomputed rollup of a table in a time range.
+
+        Args:
+            table (str): 'chains' or 'balances'.
+            resolution (str): One of ``ROLLUPS``, e.g. '1h'.
+            start (int, optional): The first bucket to include.
+            end (int, optional): The bucket to stop before.
+            **filters: Equality filters on key columns, e.g. ``address='0x...'``.
+
+        Returns:
+            DataFrame: One row per bucket and key with 'count' and the open, high, low,
+            close and mean of every value column, ordered by bucket.
+        """
+        schema = TABLES[table]
+        stats = ['open', 'high', 'low', 'close', 'mean']
+        columns = ['bucket'] + schema['keys'] + ['count'] + [f'{column}_{stat}' for column in schema['values'] for stat in stats]
+
+        merged = self._merged_rollup(table, resolution, start, end, filters)
+        if merged is None:
+            return pd.DataFrame(columns=columns)
+        for column in schema['values']:
+            merged[f'{column}_mean'] = merged[f'{column}_sum'] / merged['count']
+        return merged[columns]
+
+    def closed_before(self):
+        """
+        Return the time before which no tick can be added any more.
+
+        Returns:
+            int: The oldest buffered timestamp, or the current time without buffered rows.
+        """
+        with self._lock:
+            # Ticks are appended in time order, so the first buffered row is the oldest
+            buffered = [row['timestamp'] for buffer in self._buffers.values() for row in buffer[:1]]
+        return min([int(time.time())] + buffered)
+
+    def compact(self, table, resolution, before=None):
+        """
+        Merge the segments of every closed day of a table and resolution into one per day.
+
+        Only days that ended before ``before`` are touched, and a day already
+        merged is only rewritten when segments were added to it since, so each
+        compaction costs in proportion to the days closed since the last one.
+        The merged segment is written before its inputs are removed, and
+        readers skip the inputs as soon as it exists (see :func:`_live_segments`),
+        so readers in other processes never see a tick twice or miss one.
+
+        Args:
+            table (str): 'chains' or 'balances'.
+            resolution (str): ``RAW`` or one of ``ROLLUPS``.
+            before (int, optional): Only merge days that end at or before this time.
+                Defaults to :meth:`closed_before`.
+        """
+        if before is None:
+            before = self.closed_before()
+        days = {}
+        for name in self._segments(table, resolution):
+            days.setdefault(_segment_bounds(name)[0] // COMPACT_WINDOW, []).append(name)
+
+        directory = self._directory(table, resolution)
+        for day, names in sorted(days.items()):
+            if (day + 1) * COMPACT_WINDOW > before or len(names) < 2:
+                continue
+            frame = self._read_segments(table, resolution, names, None)
+            if frame is None:
+                continue
+            if resolution == RAW:
+                frame = frame.sort_values('timestamp', kind='stable')
+            else:
+                frame = _merge_rollup_parts(table, frame)
+            bounds = [_segment_bounds(name) for name in names]
+            sequence = max(_segment_sequence(name)[0] for name in names)
+            self._write_segment(table, resolution, frame, min(first for first, _ in bounds), max(last for _, last in bounds), sequence)
+            for name in names:
+                if _segment_sequence(name) != (sequence, True):
+                    os.remove(os.path.join(directory, name))
+
+    def _compact_all(self):
+        before = self.closed_before()
+        for table in TABLES:
+            for resolution in [RAW, *ROLLUPS]:
+                try:
+                    self.compact(table, resolution, before)
+                except Exception as e:
+                    logging.error(f"Error compacting {table} {resolution} segments: {e}")
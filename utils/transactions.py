@@ -0,0 +1,194 @@
+import logging
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+
+from .constants import DECIMALS
+
+DEFAULT_CHUNK_SIZE = 10000  # explorer records converted to columns at a time
+
+# Explorer fields kept from each tokentx record; the other ~15 are dropped on arrival
+TRANSACTION_FIELDS = ('hash', 'from', 'to', 'value', 'timeStamp', 'blockNumber', 'methodId')
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Wei amounts overflow 64-bit integers, so they are stored as 76-digit decimals.
+# That covers every realistic token amount but not the whole uint256 range, so
+# larger values are rejected rather than letting Arrow wrap or fail the batch.
+VALUE_PRECISION = 76
+MAX_VALUE = 10 ** VALUE_PRECISION - 1
+
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('hash', pa.string()),
+        ('from', pa.string()),
+        ('to', pa.string()),
+        ('value', pa.decimal256(VALUE_PRECISION, 0)),
+        ('timeStamp', pa.int64()),
+        ('blockNumber', pa.int64()),
+        ('methodId', pa.dictionary(pa.int32(), pa.string())),
+    ])
+
+
+def parse_value(value):
+    """
+    Parse a wei amount, checking that it fits the 'value' column.
+
+    Args:
+        value (str or int): The amount in wei.
+
+    Returns:
+        int: The amount.
+
+    Raises:
+        ValueError: If the amount is not an integer between 0 and ``MAX_VALUE``.
+    """
+    amount = int(value)
+    if not 0 <= amount <= MAX_VALUE:
+        raise ValueError(f"amount {amount} is outside 0..10**{VALUE_PRECISION}-1")
+    return amount
+
+
+def _valid_records(records):
+    for record in records:
+        try:
+            yield record, parse_value(record['value'])
+        except (KeyError, TypeError, ValueError) as e:
+            logging.error(f"Skipping transaction {record.get('hash')} with an invalid value: {e}")
+
+
+def format_date(timestamp):
+    """
+    Format a Unix timestamp as a UTC date for display.
+    """
+    return datetime.utcfromtimestamp(timestamp).strftime(DATE_FORMAT)
+
+
+class TransactionBatch:
+    """
+    Columnar batch of GLP token transfers backed by an Arrow table.
+
+    Only the fields in ``TRANSACTION_FIELDS`` are kept. 'value' is parsed
+    once into exact integer wei (records whose value does not fit are logged
+    and skipped, see :func:`parse_value`), and 'timeStamp' and 'blockNumber' into
+    64-bit integers. Dates are only formatted when a row is read or displayed.
+
+    Rows can still be read as dicts, e.g. ``batch[0]['value']``, with a
+    'human_readable_date' formatted on access.
+
+    Args:
+        table (pyarrow.Table): A table with the schema of :func:`TransactionBatch.from_records`.
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    @classmethod
+    def from_records(cls, records, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Convert explorer ``tokentx`` records into a batch, a chunk at a time.
+
+        Args:
+            records (iterable): The explorer records; consumed lazily, so a stream
+                is never held as dicts in full.
+            chunk_size (int): The records converted to columns at a time.
+
+        Returns:
+            TransactionBatch: The batch, in record order.
+        """
+        import pyarrow as pa
+
+        schema = _schema()
+        records = _valid_records(records)
+        tables = []
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            values = [Decimal(value) for _, value in chunk]
+            chunk = [record for record, _ in chunk]
+            tables.append(pa.table({
+                'hash': pa.array([record.get('hash') for record in chunk], pa.string()),
+                'from': pa.array([record.get('from') for record in chunk], pa.string()),
+                'to': pa.array([record.get('to') for record in chunk], pa.string()),
+                'value': pa.array(values, pa.decimal256(VALUE_PRECISION, 0)),
+                'timeStamp': pa.array([int(record['timeStamp']) for record in chunk], pa.int64()),
+                'blockNumber': pa.array([int(record['blockNumber']) for record in chunk], pa.int64()),
+                # Provide a default value if methodId is missing
+                'methodId': pa.array([record.get('methodId', 'N/A') for record in chunk], pa.string()).dictionary_encode(),
+            }, schema=schema))
+        if not tables:
+            return cls(schema.empty_table())
+        return cls(pa.concat_tables(tables).combine_chunks())
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(f"Transaction {position} out of range for {len(self)} transactions")
+        row = {name: self.table.column(name)[position].as_py() for name in TRANSACTION_FIELDS}
+        row['value'] = int(row['value'])
+        row['human_readable_date'] = format_date(row['timeStamp'])
+        return row
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def __eq__(self, other):
+        return isinstance(other, TransactionBatch) and self.table.equals(other.table)
+
+    def values(self):
+        """
+        Return the exact amounts in wei.
+
+        Returns:
+            list: Python ints, in row order.
+        """
+        return [int(value) for value in self.table.column('value').to_pylist()]
+
+    def glp_values(self):
+        """
+        Return the amounts in GLP, for display.
+
+        Returns:
+            ndarray: float64 amounts, in row order.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        return pc.divide(self.table.column('value').cast(pa.float64()), float(10 ** DECIMALS)).to_numpy()
+
+    def is_incoming(self, address):
+        """
+        Return which transfers were received by an address.
+
+        Returns:
+            ndarray: Booleans, in row order.
+        """
+        import pyarrow.compute as pc
+        return pc.equal(pc.utf8_lower(self.table.column('to')), address.lower()).fill_null(False).to_numpy(zero_copy_only=False)
+
+    def is_outgoing(self, address):
+        """
+        Return which transfers were sent by an address.
+
+        Returns:
+            ndarray: Booleans, in row order.
+        """
+        import pyarrow.compute as pc
+        return pc.equal(pc.utf8_lower(self.table.column('from')), address.lower()).fill_null(False).to_numpy(zero_copy_only=False)
+
+    def to_pandas(self):
+        """
+        Hand the batch to pandas without copying it.
+
+        Returns:
+            DataFrame: One column per field, backed by the Arrow buffers (``pd.ArrowDtype``).
+        """
+        import pandas as pd
+        return self.table.to_pandas(types_mapper=pd.ArrowDtype)
@@ -1,29 +1,193 @@
-from web3 import Web3
-from web3.middleware import geth_poa_middleware
+import asyncio
+import contextvars
+from web3 import Web3, AsyncWeb3
+from web3.middleware import geth_poa_middleware, async_geth_poa_middleware
+from web3.providers.async_base import AsyncJSONBaseProvider
+from .http_client import http_post
+from .log_fetcher import RATE_LIMIT_MARKERS, is_range_error
+from .metrics import track_call
+from .rpc_pool import EndpointPool
 
-def setup_web3(provider_url):
+# Filters live on the node that created them, so these never hedge or fail over
+FILTER_METHODS = frozenset({
+    'eth_newFilter', 'eth_newBlockFilter', 'eth_newPendingTransactionFilter',
+    'eth_getFilterChanges', 'eth_getFilterLogs', 'eth_uninstallFilter',
+})
+
+# JSON-RPC errors that mean the endpoint, not the request, is at fault
+ENDPOINT_ERROR_CODES = frozenset({-32005, -32603})  # limit exceeded, internal error
+ENDPOINT_ERROR_MARKERS = RATE_LIMIT_MARKERS + ('capacity',)
+
+
+class RPCEndpointError(Exception):
+    """Raised for a JSON-RPC error response that should count against the endpoint."""
+
+    def __init__(self, response):
+        super().__init__(response['error'])
+        self.response = response
+
+
+def is_endpoint_error(error):
+    """
+    Check whether a JSON-RPC error means the endpoint is rate limited or failing.
+
+    Range errors of ``eth_getLogs`` share code -32005 with rate limits but are
+    answered the same by every endpoint, so they do not count.
+
+    Args:
+        error (dict): The 'error' member of a JSON-RPC response.
+
+    Returns:
+        bool: True if the request should go to another endpoint.
+    """
+    message = str(error.get('message', '')).lower() if isinstance(error, dict) else str(error).lower()
+    if is_range_error(message):
+        return False
+    code = error.get('code') if isinstance(error, dict) else None
+    return code in ENDPOINT_ERROR_CODES or any(marker in message for marker in ENDPOINT_ERROR_MARKERS)
+
+
+class PooledHTTPProvider(Web3.HTTPProvider):
+    """
+    HTTPProvider that sends every JSON-RPC request through the shared pooled session of its host,
+    from any thread, with the retry and backoff policy of ``utils.http_client``.
+    """
+
+    def make_request(self, method, params):
+        with track_call('rpc', method) as outcome:
+            request_data = self.encode_rpc_request(method, params)
+            response = http_post(self.endpoint_uri, data=request_data, **self.get_request_kwargs())
+            response.raise_for_status()
+            result = self.decode_rpc_response(response.content)
+            outcome['error'] = 'error' in result
+            return result
+
+
+class FailoverHTTPProvider(PooledHTTPProvider):
+    """
+    PooledHTTPProvider spread over several equivalent endpoints, with hedged requests and
+    failover (see :class:`utils.rpc_pool.EndpointPool`).
+
+    Args:
+        endpoint_uris (list): The endpoint URLs.
+        **pool_options: Passed to :class:`utils.rpc_pool.EndpointPool`.
+    """
+
+    def __init__(self, endpoint_uris, **pool_options):
+        super().__init__(endpoint_uris[0])
+        self.pool = EndpointPool(endpoint_uris, **pool_options)
+
+    def make_request(self, method, params):
+        with track_call('rpc', method) as outcome:
+            request_data = self.encode_rpc_request(method, params)
+
+            def send(url):
+                response = http_post(url, data=request_data, **self.get_request_kwargs())
+                response.raise_for_status()
+                result = self.decode_rpc_response(response.content)
+                # A rate-limited or failing node must not rank as healthy or win the hedge
+                if 'error' in result and is_endpoint_error(result['error']):
+                    raise RPCEndpointError(result)
+                return result
+
+            try:
+                if method in FILTER_METHODS:
+                    result = self.pool.sticky_request(send)
+                else:
+                    result = self.pool.request(send)
+            except RPCEndpointError as e:
+                # Every endpoint answered with an error; web3 raises it as usual
+                result = e.response
+            outcome['error'] = 'error' in result
+            return result
+
+
+class PooledAsyncHTTPProvider(AsyncJSONBaseProvider):
+    """
+    Async provider that hands every JSON-RPC request to a synchronous provider on a worker thread,
+    so async clients share the pooled sessions, per-host rate limits, retries, failover and metrics
+    of :func:`setup_web3`. The caller's request priority goes with the request.
+
+    Args:
+        provider (PooledHTTPProvider): The synchronous provider that sends the requests.
+    """
+
+    def __init__(self, provider):
+        super().__init__()
+        self.provider = provider
+        self.endpoint_uri = provider.endpoint_uri
+
+    async def make_request(self, method, params):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, contextvars.copy_context().run, self.provider.make_request, method, params)
+
+
+def make_provider(provider_url, **pool_options):
+    """
+    Build the synchronous provider for one URL or a list of equivalent URLs.
+
+    Args:
+        provider_url (str or list): The URL of the provider, or a list of equivalent
+            providers to hedge and fail over between.
+        **pool_options: Passed to :class:`utils.rpc_pool.EndpointPool` when several URLs are given.
+
+    Returns:
+        PooledHTTPProvider: The provider.
+    """
+    if isinstance(provider_url, str):
+        return PooledHTTPProvider(provider_url)
+    if len(provider_url) == 1:
+        return PooledHTTPProvider(provider_url[0])
+    return FailoverHTTPProvider(list(provider_url), **pool_options)
+
+
+def setup_web3(provider_url, **pool_options):
     """
     Setup Web3 instance with the given provider URL.
 
     Args:
-        provider_url (str): The URL of the provider.
+        provider_url (str or list): The URL of the provider, or a list of equivalent
+            providers to hedge and fail over between.
+        **pool_options: Passed to :class:`utils.rpc_pool.EndpointPool` when several URLs are given.
 
     Returns:
         Web3: An instance of Web3.
     """
-    web3 = Web3(Web3.HTTPProvider(provider_url))
+    web3 = Web3(make_provider(provider_url, **pool_options))
     
     # Add middleware for Proof of Authority networks
     web3.middleware_onion.inject(geth_poa_middleware, layer=0)
 
     return web3
 
+def setup_async_web3(provider_url, **pool_options):
+    """
+    Setup AsyncWeb3 instance with the given provider URL.
+
+    Requests go through the same pooled, rate-limited and failover stack as
+    :func:`setup_web3` (see :class:`PooledAsyncHTTPProvider`).
+
+    Args:
+        provider_url (str or list): The URL of the provider, or a list of equivalent
+            providers to hedge and fail over between.
+        **pool_options: Passed to :class:`utils.rpc_pool.EndpointPool` when several URLs are given.
+
+    Returns:
+        AsyncWeb3: An instance of AsyncWeb3.
+    """
+    web3 = AsyncWeb3(PooledAsyncHTTPProvider(make_provider(provider_url, **pool_options)))
+
+    # Add middleware for Proof of Authority networks
+    web3.middleware_onion.inject(async_geth_poa_middleware, layer=0)
+
+    return web3
+
 def load_contract(web3_instance, contract_address, abi):
     """
     Load a smart contract instance.
 
     Args:
-        web3_instance (Web3): A Web3 instance connected to the blockchain.
+        web3_instance (Web3 or AsyncWeb3): A Web3 instance connected to the blockchain.
         contract_address (str): The address of the contract.
         abi (list): The ABI of the contract.
 